@@ -4,9 +4,17 @@
 """
 import os
 import re
+import sys
 import argparse
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+# 复用 linkai 目录下的字幕解析器（单遍读取，兼容BOM/CRLF/GBK）和滚动字幕去重
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'linkai'))
+from subtitle_parser import parse_subtitle_file, FORMAT_SRT
+from caption_collapser import collapse_rolling_cues
+from token_counter import count_tokens
 
 
 class SrtToTextConverter:
@@ -22,7 +30,7 @@ class SrtToTextConverter:
         Args:
             merge_lines: 是否合并多行为段落
             add_punctuation: 是否在句尾添加标点
-            remove_duplicates: 是否去除重复的句子
+            remove_duplicates: 是否去除相邻字幕之间重复的内容（滚动字幕）
         """
         self.merge_lines = merge_lines
         self.add_punctuation = add_punctuation
@@ -38,63 +46,35 @@ class SrtToTextConverter:
         Returns:
             文本内容列表
         """
-        texts = []
+        return self.parse_srt_with_tokens(srt_path)[0]
+    
+    def parse_srt_with_tokens(self, srt_path: str) -> Tuple[List[str], int, int]:
+        """
+        解析SRT文件，同时统计滚动字幕去重前后的token数
         
+        Args:
+            srt_path: SRT文件路径
+            
+        Returns:
+            (文本内容列表, 去重前token数, 去重后token数)；不去重时两个token数都为0
+        """
         try:
-            with open(srt_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # 尝试其他编码
-            try:
-                with open(srt_path, 'r', encoding='gbk') as f:
-                    content = f.read()
-            except:
-                print(f"错误：无法读取文件 {srt_path}")
-                return []
-        
-        # 分割字幕块
-        blocks = content.strip().split('\n\n')
+            cues, _ = parse_subtitle_file(srt_path, FORMAT_SRT)
+        except (OSError, UnicodeError):
+            print(f"错误：无法读取文件 {srt_path}")
+            return [], 0, 0
         
-        for block in blocks:
-            lines = block.strip().split('\n')
-            
-            # 跳过空块
-            if not lines:
-                continue
-            
-            # SRT格式：
-            # 1. 序号
-            # 2. 时间戳
-            # 3. 字幕文本（可能多行）
-            
-            text_lines = []
-            for line in lines:
-                # 跳过序号（纯数字）
-                if line.strip().isdigit():
-                    continue
-                
-                # 跳过时间戳（包含 --> 的行）
-                if '-->' in line:
-                    continue
-                
-                # 跳过空行
-                if not line.strip():
-                    continue
-                
-                # 收集文本
-                text_lines.append(line.strip())
-            
-            # 合并文本行
-            if text_lines:
-                text = ' '.join(text_lines)
-                
-                # 清理多余空格
-                text = re.sub(r'\s+', ' ', text).strip()
-                
-                if text:
-                    texts.append(text)
+        texts = [' '.join(cue.lines) for cue in cues]
+        tokens_before = tokens_after = 0
+        # 去除滚动字幕在相邻条目间的重复（只在时间轴重叠或整行重复上一条时删除，普通字幕的正常重复会保留）
+        if self.remove_duplicates:
+            collapsed = collapse_rolling_cues(cues)
+            tokens_before, tokens_after = count_tokens('\n'.join(texts)), count_tokens('\n'.join(collapsed))
+            texts = collapsed
         
-        return texts
+        # 合并多行文本并清理多余空格
+        texts = [text for text in (re.sub(r'\s+', ' ', text).strip() for text in texts) if text]
+        return texts, tokens_before, tokens_after
     
     def process_texts(self, texts: List[str]) -> str:
         """
@@ -109,16 +89,6 @@ class SrtToTextConverter:
         if not texts:
             return ""
         
-        # 去除重复
-        if self.remove_duplicates:
-            seen = set()
-            unique_texts = []
-            for text in texts:
-                if text not in seen:
-                    seen.add(text)
-                    unique_texts.append(text)
-            texts = unique_texts
-        
         # 保持分行还是合并为段落
         if self.merge_lines:
             # 合并所有行为一个段落
@@ -143,101 +113,188 @@ class SrtToTextConverter:
             
             return '\n'.join(texts)
     
-    def convert_file(self, srt_path: str, output_path: str = None) -> bool:
+    def convert_to_text(self, srt_path: str, output_path: str) -> Tuple[int, int, int]:
         """
-        转换单个SRT文件为文本
+        转换单个SRT文件并写入输出（不打印，供批量转换的工作进程调用）
         
         Args:
             srt_path: SRT文件路径
-            output_path: 输出文件路径（可选）
+            output_path: 输出文件路径
             
         Returns:
-            是否成功
+            (输出字数, 去重前token数, 去重后token数)；没有有效文本时字数为0
+            
+        Raises:
+            OSError: 写入文件失败
         """
-        # 解析SRT
-        texts = self.parse_srt(srt_path)
-        
+        texts, tokens_before, tokens_after = self.parse_srt_with_tokens(srt_path)
         if not texts:
-            print(f"警告：{srt_path} 中没有找到有效文本")
-            return False
+            return 0, tokens_before, tokens_after
         
-        # 处理文本
         result = self.process_texts(texts)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(result)
+        return len(result), tokens_before, tokens_after
+    
+    def convert_file(self, srt_path: str, output_path: str = None) -> bool:
+        """
+        转换单个SRT文件为文本
         
+        Args:
+            srt_path: SRT文件路径
+            output_path: 输出文件路径（可选）
+            
+        Returns:
+            是否成功
+        """
         # 确定输出路径
         if output_path is None:
             # 默认：原文件名.txt
             srt_file = Path(srt_path)
             output_path = srt_file.parent / f"{srt_file.stem}.txt"
         
-        # 写入文件
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(result)
-            
-            print(f"[OK] 转换成功: {srt_path}")
-            print(f"     输出: {output_path}")
-            print(f"     字数: {len(result)}")
-            return True
-        
+            chars, tokens_before, tokens_after = self.convert_to_text(srt_path, output_path)
         except Exception as e:
             print(f"错误：写入文件失败 - {e}")
             return False
+        
+        if not chars:
+            print(f"警告：{srt_path} 中没有找到有效文本")
+            return False
+        
+        print(f"[OK] 转换成功: {srt_path}")
+        print(f"     输出: {output_path}")
+        print(f"     字数: {chars}")
+        print_dedup_tokens(tokens_before, tokens_after)
+        return True
+    
+    def plan_directory(self, directory: str, output_dir: str = None,
+                       recursive: bool = False, force: bool = False):
+        """
+        列出目录中需要转换的SRT文件
+        
+        Args:
+            directory: 输入目录
+            output_dir: 输出目录（可选，递归时保留子目录结构）
+            recursive: 是否包括子目录
+            force: 是否重新转换已是最新的输出
+            
+        Returns:
+            (待转换的 (SRT路径, 输出路径) 列表, 因输出已是最新而跳过的数量)
+        """
+        dir_path = Path(directory)
+        srt_files = sorted(dir_path.rglob('*.srt') if recursive else dir_path.glob('*.srt'))
+        
+        jobs = []
+        skipped = 0
+        for srt_file in srt_files:
+            if output_dir:
+                txt_file = Path(output_dir) / srt_file.parent.relative_to(dir_path) / f"{srt_file.stem}.txt"
+            else:
+                txt_file = srt_file.parent / f"{srt_file.stem}.txt"
+            
+            # 输出比字幕新时视为已转换（字幕重新下载后会自动重转）
+            if not force and txt_file.exists() and txt_file.stat().st_mtime >= srt_file.stat().st_mtime:
+                skipped += 1
+                continue
+            jobs.append((str(srt_file), str(txt_file)))
+        
+        return jobs, skipped
     
-    def convert_directory(self, directory: str, output_dir: str = None) -> dict:
+    def convert_directory(self, directory: str, output_dir: str = None,
+                          recursive: bool = False, workers: int = None,
+                          force: bool = False) -> dict:
         """
         批量转换目录中的所有SRT文件
         
         Args:
             directory: 输入目录
             output_dir: 输出目录（可选）
+            recursive: 是否包括子目录
+            workers: 进程数（默认CPU核数，1表示在当前进程中顺序转换）
+            force: 是否重新转换已是最新的输出
             
         Returns:
             统计信息
         """
-        dir_path = Path(directory)
+        stats = {'success': 0, 'failed': 0, 'skipped': 0, 'tokens_before': 0, 'tokens_after': 0}
         
-        if not dir_path.exists():
+        if not Path(directory).exists():
             print(f"错误：目录不存在 - {directory}")
-            return {'success': 0, 'failed': 0}
+            return stats
         
-        # 查找所有SRT文件
-        srt_files = list(dir_path.glob('*.srt'))
+        jobs, stats['skipped'] = self.plan_directory(directory, output_dir, recursive, force)
+        total = len(jobs) + stats['skipped']
         
-        if not srt_files:
+        if not total:
             print(f"警告：{directory} 中没有找到SRT文件")
-            return {'success': 0, 'failed': 0}
+            return stats
         
-        print(f"找到 {len(srt_files)} 个SRT文件")
+        print(f"找到 {total} 个SRT文件，待转换 {len(jobs)} 个，已是最新 {stats['skipped']} 个")
         print("=" * 60)
         
-        # 创建输出目录
-        if output_dir:
-            output_path = Path(output_dir)
-            output_path.mkdir(parents=True, exist_ok=True)
+        for _, txt_file in jobs:
+            Path(txt_file).parent.mkdir(parents=True, exist_ok=True)
         
-        # 批量转换
-        stats = {'success': 0, 'failed': 0}
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+        failures = []
         
-        for srt_file in srt_files:
-            # 确定输出文件路径
-            if output_dir:
-                txt_file = Path(output_dir) / f"{srt_file.stem}.txt"
-            else:
-                txt_file = srt_file.parent / f"{srt_file.stem}.txt"
-            
-            # 转换
-            if self.convert_file(str(srt_file), str(txt_file)):
-                stats['success'] += 1
-            else:
-                stats['failed'] += 1
-            
-            print()
+        if workers == 1:
+            results = map(_convert_job, [(self, srt_file, txt_file) for srt_file, txt_file in jobs])
+            failures = self._collect_results(results, jobs, stats)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # 每个任务都很小，按块分发以减少进程间通信开销
+                chunksize = max(1, len(jobs) // (workers * 8))
+                results = executor.map(_convert_job, [(self, srt_file, txt_file) for srt_file, txt_file in jobs],
+                                       chunksize=chunksize)
+                failures = self._collect_results(results, jobs, stats)
+        
+        print()
+        for srt_file, reason in failures:
+            print(f"[失败] {srt_file}: {reason}")
         
         print("=" * 60)
-        print(f"转换完成！成功: {stats['success']} | 失败: {stats['failed']}")
+        print(f"转换完成！成功: {stats['success']} | 跳过: {stats['skipped']} | 失败: {stats['failed']}")
+        print_dedup_tokens(stats['tokens_before'], stats['tokens_after'])
         
         return stats
+    
+    @staticmethod
+    def _collect_results(results, jobs, stats) -> list:
+        """汇总转换结果并刷新单行进度，返回失败列表"""
+        failures = []
+        for done, ((srt_file, _), (error, tokens_before, tokens_after)) in enumerate(zip(jobs, results), 1):
+            stats['tokens_before'] += tokens_before
+            stats['tokens_after'] += tokens_after
+            if error:
+                stats['failed'] += 1
+                failures.append((srt_file, error))
+            else:
+                stats['success'] += 1
+            print(f"\r进度: {done}/{len(jobs)} | 成功: {stats['success']} | 失败: {stats['failed']}",
+                  end='', flush=True)
+        return failures
+
+
+def _convert_job(job) -> Tuple[str, int, int]:
+    """工作进程入口：转换一个文件，返回 (失败原因（成功时为空字符串）, 去重前token数, 去重后token数)"""
+    converter, srt_file, txt_file = job
+    try:
+        chars, tokens_before, tokens_after = converter.convert_to_text(srt_file, txt_file)
+    except Exception as e:
+        return f"写入文件失败 - {e}", 0, 0
+    if not chars:
+        return "没有找到有效文本", tokens_before, tokens_after
+    return "", tokens_before, tokens_after
+
+
+def print_dedup_tokens(tokens_before: int, tokens_after: int):
+    """打印滚动字幕去重减少的token数（没有减少时不打印）"""
+    if tokens_after < tokens_before:
+        print(f"     滚动字幕去重: {tokens_before} → {tokens_after} token"
+              f"（减少 {(tokens_before - tokens_after) / tokens_before * 100:.1f}%）")
 
 
 def main():
@@ -259,6 +316,9 @@ def main():
   # 批量转换并输出到指定目录
   python srt_to_txt.py -d ./downloads -o ./texts
   
+  # 递归转换子目录，4个进程并行，已是最新的输出也重新转换
+  python srt_to_txt.py -d ./downloads -r -j 4 --force
+  
   # 保持分行（不合并段落）
   python srt_to_txt.py -f video.srt --no-merge
   
@@ -276,6 +336,19 @@ def main():
     parser.add_argument('-o', '--output',
                        help='输出文件/目录路径（默认：与输入同目录）')
     
+    parser.add_argument('-r', '--recursive',
+                       action='store_true',
+                       help='批量转换时包括子目录')
+    
+    parser.add_argument('-j', '--workers',
+                       type=int,
+                       default=None,
+                       help='批量转换的进程数（默认CPU核数）')
+    
+    parser.add_argument('--force',
+                       action='store_true',
+                       help='重新转换输出已是最新的文件（默认跳过）')
+    
     parser.add_argument('--merge',
                        action='store_true',
                        help='合并为段落（默认保持分行）')
@@ -286,7 +359,7 @@ def main():
     
     parser.add_argument('--keep-duplicates',
                        action='store_true',
-                       help='保留重复的句子')
+                       help='保留相邻字幕之间重复的内容')
     
     args = parser.parse_args()
     
@@ -305,8 +378,11 @@ def main():
     
     elif args.directory:
         # 批量转换
-        stats = converter.convert_directory(args.directory, args.output)
-        exit(0 if stats['success'] > 0 else 1)
+        stats = converter.convert_directory(args.directory, args.output,
+                                            recursive=args.recursive,
+                                            workers=args.workers,
+                                            force=args.force)
+        exit(0 if stats['success'] + stats['skipped'] > 0 else 1)
 
 
 if __name__ == '__main__':
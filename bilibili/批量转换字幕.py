@@ -2,7 +2,6 @@
 简易批量字幕转文本工具
 双击运行，自动处理当前目录及子目录下的所有SRT文件
 """
-import os
 from pathlib import Path
 from srt_to_txt import SrtToTextConverter
 
@@ -58,20 +57,6 @@ def main():
     print()
     print("=" * 70)
     
-    # 查找SRT文件
-    if recursive:
-        srt_files = list(target_dir.rglob('*.srt'))
-    else:
-        srt_files = list(target_dir.glob('*.srt'))
-    
-    if not srt_files:
-        print(f"未找到SRT文件")
-        input("\n按回车键退出...")
-        return
-    
-    print(f"找到 {len(srt_files)} 个SRT文件")
-    print()
-    
     # 配置选项
     print("转换选项：")
     merge = input("是否合并为段落？(y/N): ").strip().lower() == 'y'  # 默认不合并
@@ -88,26 +73,8 @@ def main():
         remove_duplicates=True
     )
     
-    # 批量转换
-    success = 0
-    failed = 0
-    
-    for idx, srt_file in enumerate(srt_files, 1):
-        print(f"\n[{idx}/{len(srt_files)}] {srt_file.name}")
-        
-        # 输出到同目录
-        txt_file = srt_file.parent / f"{srt_file.stem}.txt"
-        
-        if converter.convert_file(str(srt_file), str(txt_file)):
-            success += 1
-        else:
-            failed += 1
-    
-    print()
-    print("=" * 70)
-    print(f"转换完成！")
-    print(f"成功: {success} | 失败: {failed}")
-    print("=" * 70)
+    # 批量转换（多进程并行，输出到同目录，已是最新的输出自动跳过）
+    converter.convert_directory(str(target_dir), recursive=recursive)
     
     input("\n按回车键退出...")
 
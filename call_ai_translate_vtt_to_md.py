@@ -1,11 +1,17 @@
 import os
+import sys
+import argparse
 import requests
 import json
-import webvtt
 import tiktoken
 import time
 import re
-import tempfile
+
+# 复用 linkai 目录下的响应缓存、字幕解析器和滚动字幕去重
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linkai'))
+from response_cache import ResponseCache, make_cache_key
+from subtitle_parser import parse_subtitle_file, FORMAT_VTT
+from caption_collapser import collapse_cues_and_report
 
 # --- 1. 配置区 ---
 
@@ -16,6 +22,13 @@ API_URL = 'http://127.0.0.1:1234/v1/chat/completions'
 # 【优化点1】: 尝试一个更大的分片值，您可以根据测试结果调整这个数字
 MAX_TOKENS_PER_CHUNK = 2500  # 建议从 2500 开始测试
 
+# 相同片段不重复请求模型（--no-cache 关闭）
+USE_RESPONSE_CACHE = True
+_response_cache = None
+
+# 合并YouTube滚动字幕在相邻条目间重复的内容（--no-dedup 关闭）
+DEDUP_CAPTIONS = True
+
 # 【优化点2】: 使用能合并段落的新版Prompt
 SYSTEM_PROMPT = """
 你是一位顶级的翻译家和内容编辑。
@@ -43,65 +56,13 @@ def get_tokenizer():
         return None
 
 def parse_vtt_file(file_path):
+    """解析VTT文件，一遍读取开头的时间戳信息和全部字幕，返回 (字幕条目列表, 时间戳信息)"""
     try:
-        # 先读取文件内容，检查是否有时间戳信息
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 提取时间戳信息
-        timestamp_info = extract_timestamp_info(content)
-        
-        # 如果文件开头有时间戳信息，需要找到实际的VTT内容开始位置
-        if content.startswith('# 视频发布时间:'):
-            # 找到"WEBVTT"的位置
-            webvtt_start = content.find('WEBVTT')
-            if webvtt_start == -1:
-                print(f"在文件 {os.path.basename(file_path)} 中找不到WEBVTT标记")
-                return None, None
-            
-            # 提取纯VTT内容
-            vtt_content = content[webvtt_start:]
-            
-            # 创建临时文件来让webvtt库解析
-            import tempfile
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.vtt', delete=False, encoding='utf-8') as temp_file:
-                temp_file.write(vtt_content)
-                temp_file_path = temp_file.name
-            
-            try:
-                captions = webvtt.read(temp_file_path)
-                full_text = "\n".join([caption.text.strip() for caption in captions])
-                return full_text, timestamp_info
-            finally:
-                # 清理临时文件
-                os.unlink(temp_file_path)
-        else:
-            # 原始格式，直接解析
-            captions = webvtt.read(file_path)
-            full_text = "\n".join([caption.text.strip() for caption in captions])
-            return full_text, None
-            
+        return parse_subtitle_file(file_path, FORMAT_VTT)
     except Exception as e:
         print(f"解析VTT文件 {os.path.basename(file_path)} 时出错: {e}")
         return None, None
 
-def extract_timestamp_info(content):
-    """从VTT文件内容中提取时间戳信息"""
-    timestamp_info = {}
-    lines = content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if line.startswith('# 视频发布时间:'):
-            timestamp_info['publish_date'] = line.replace('# 视频发布时间:', '').strip()
-        elif line.startswith('# 视频标题:'):
-            timestamp_info['title'] = line.replace('# 视频标题:', '').strip()
-        elif line.startswith('WEBVTT'):
-            # 到达VTT内容开始，停止解析时间戳信息
-            break
-    
-    return timestamp_info if timestamp_info else None
-
 def split_text_into_chunks(text, tokenizer):
     if not tokenizer:
         print("Tokenizer 不可用，无法进行分片。将尝试一次性处理。")
@@ -133,6 +94,17 @@ def clean_model_output(raw_text):
     cleaned_text = re.sub(r'^\s*<think>.*?</think>\s*', '', raw_text, flags=re.DOTALL)
     return cleaned_text
 
+def get_response_cache():
+    """获取响应缓存，关闭或无法打开时返回None"""
+    global _response_cache, USE_RESPONSE_CACHE
+    if _response_cache is None and USE_RESPONSE_CACHE:
+        try:
+            _response_cache = ResponseCache()
+        except Exception as e:
+            print(f"无法打开响应缓存，本次运行不使用缓存: {e}")
+            USE_RESPONSE_CACHE = False
+    return _response_cache
+
 def process_chunk_with_llm(text_chunk):
     headers = {"Content-Type": "application/json"}
     payload = {
@@ -144,12 +116,25 @@ def process_chunk_with_llm(text_chunk):
         "temperature": 0.7,
         "stream": False
     }
+
+    cache = get_response_cache()
+    cache_key = None
+    if cache is not None:
+        # 本地模型统一叫 local-model，把接口地址也算进缓存键
+        cache_key = make_cache_key(f"{API_URL}#{payload['model']}", payload['temperature'], payload['messages'])
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("命中响应缓存，跳过模型调用。")
+            return cached
+
     try:
         response = requests.post(API_URL, headers=headers, data=json.dumps(payload), timeout=300)
         response.raise_for_status()
         response_json = response.json()
         raw_output_text = response_json['choices'][0]['message']['content']
         cleaned_output_text = clean_model_output(raw_output_text)
+        if cache is not None:
+            cache.put(cache_key, payload['model'], cleaned_output_text)
         return cleaned_output_text
     except requests.exceptions.Timeout:
         print(f"调用API时超时！(超过300秒)")
@@ -163,16 +148,22 @@ def process_single_file(vtt_file_path, tokenizer):
     print(f"\n--- 正在处理文件: {filename} ---")
     
     result = parse_vtt_file(vtt_file_path)
-    if not result or not result[0]:
+    if not result or not any(cue.lines for cue in result[0] or ()):
         return
     
-    english_text, timestamp_info = result
+    cues, timestamp_info = result
     
     # 显示时间戳信息（如果有的话）
     if timestamp_info:
         print(f"发布时间: {timestamp_info.get('publish_date', '未知')}")
         print(f"视频标题: {timestamp_info.get('title', '未知')}")
 
+    # 合并滚动字幕在相邻条目间重复的内容（时间轴重叠的条目还会删掉首尾重叠的部分），再进行分片
+    if DEDUP_CAPTIONS:
+        english_text, _, _ = collapse_cues_and_report(cues)
+    else:
+        english_text = "\n".join("\n".join(cue.lines) for cue in cues)
+
     chunks = split_text_into_chunks(english_text, tokenizer)
     
     processed_chunks = []
@@ -214,6 +205,14 @@ publish_date: {timestamp_info.get('publish_date', '未知日期')}
 
 # --- 3. 主程序入口 ---
 def main():
+    global USE_RESPONSE_CACHE, DEDUP_CAPTIONS
+    parser = argparse.ArgumentParser(description='VTT字幕翻译为中文Markdown（本地模型）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用响应缓存，所有片段都调用模型')
+    parser.add_argument('--no-dedup', action='store_true', help='不合并滚动字幕在相邻条目间重复的内容')
+    args = parser.parse_args()
+    USE_RESPONSE_CACHE = not args.no_cache
+    DEDUP_CAPTIONS = not args.no_dedup
+
     if not os.path.isdir(VTT_FOLDER_PATH):
         print(f"错误：输入文件夹路径不存在 -> {VTT_FOLDER_PATH}")
         return
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 密钥管理器
+在内存中维护密钥状态，并让多个处理器进程安全地共享同一份 api_keys.txt / deprecated_apikeys.txt
+
+功能特点：
+- 内存状态：启动时读取一次密钥文件，之后只在文件发生变化时重新读取
+- 跨进程文件锁：读写密钥文件前先锁定 api_keys.txt.lock（Windows用msvcrt，其他系统用fcntl）
+- 原子写入：先写同目录临时文件再 os.replace 替换，中途退出也不会留下半截文件
+- 进程间共享：其他进程废弃的密钥会在 refresh() 时同步过来，不会重复使用已知无积分的密钥
+
+使用方法：
+    manager = ApiKeyManager()
+    keys = manager.load()
+    manager.retire(dead_key)         # 406时调用：加锁、重新读取、原子写回两个文件
+    removed = manager.refresh()      # 同步其他进程的修改，返回已被移除的密钥
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# API密钥文件
+API_KEYS_FILE = "api_keys.txt"
+DEPRECATED_KEYS_FILE = "deprecated_apikeys.txt"
+
+def read_key_file(path):
+    """读取密钥文件，文件不存在时返回空列表"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def atomic_write_lines(path, lines):
+    """原子写入：写入同目录临时文件后用 os.replace 替换目标文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+@contextmanager
+def file_lock(lock_path):
+    """跨进程排他锁（阻塞直到获得锁）"""
+    with open(lock_path, 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class ApiKeyManager:
+    """维护可用/废弃密钥的内存状态，并负责加锁与原子持久化"""
+
+    def __init__(self, keys_file=API_KEYS_FILE, deprecated_file=DEPRECATED_KEYS_FILE):
+        """
+        初始化密钥管理器
+
+        Args:
+            keys_file: 可用密钥文件路径
+            deprecated_file: 废弃密钥文件路径
+        """
+        self.keys_file = keys_file
+        self.deprecated_file = deprecated_file
+        self.lock_path = f"{keys_file}.lock"
+        self.active_keys = []
+        self.deprecated_keys = []
+        self._file_state = None
+        self._lock = threading.Lock()
+
+    def _stat_keys_file(self):
+        """密钥文件的(mtime, size)，用于判断其他进程是否修改过"""
+        try:
+            stat = os.stat(self.keys_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read_files(self):
+        """在持有文件锁的前提下读取两个密钥文件到内存"""
+        deprecated = read_key_file(self.deprecated_file)
+        deprecated_set = set(deprecated)
+        self.deprecated_keys = deprecated
+        self.active_keys = [key for key in dict.fromkeys(read_key_file(self.keys_file))
+                            if key not in deprecated_set]
+        self._file_state = self._stat_keys_file()
+
+    def load(self):
+        """加载密钥文件，返回可用密钥列表"""
+        with self._lock, file_lock(self.lock_path):
+            if not os.path.exists(self.keys_file):
+                print(f"❌ 错误：找不到API密钥文件 {self.keys_file}")
+            self._read_files()
+            return list(self.active_keys)
+
+    def refresh(self):
+        """
+        同步其他进程对密钥文件的修改（文件未变化时不读取内容）
+
+        Returns:
+            (removed, added): 被移除的密钥列表、新增的密钥列表
+        """
+        with self._lock:
+            if self._stat_keys_file() == self._file_state:
+                return [], []
+            old_keys = list(self.active_keys)
+            with file_lock(self.lock_path):
+                self._read_files()
+            new_set = set(self.active_keys)
+            old_set = set(old_keys)
+            removed = [key for key in old_keys if key not in new_set]
+            added = [key for key in self.active_keys if key not in old_set]
+            return removed, added
+
+    def retire(self, api_key):
+        """
+        废弃积分耗尽的密钥：加锁后以磁盘上的最新内容为准，原子写回两个文件
+
+        Returns:
+            是否由本进程完成废弃（已被其他进程废弃时返回False）
+        """
+        with self._lock, file_lock(self.lock_path):
+            self._read_files()
+            already_deprecated = api_key in self.deprecated_keys
+
+            if not already_deprecated:
+                # 先写废弃文件再写可用文件，中途退出也不会丢失密钥
+                self.deprecated_keys.append(api_key)
+                atomic_write_lines(self.deprecated_file, self.deprecated_keys)
+                print(f"🗑️  已将无积分的API密钥移动到 {self.deprecated_file}")
+
+            if api_key in self.active_keys or api_key in read_key_file(self.keys_file):
+                self.active_keys = [key for key in self.active_keys if key != api_key]
+                atomic_write_lines(self.keys_file, self.active_keys)
+
+            self._file_state = self._stat_keys_file()
+            return not already_deprecated
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 密钥池
+把并发请求分摊到 api_keys.txt 中的所有密钥上，而不是始终只用第一个密钥
+
+功能特点：
+- 多密钥并行：每次请求选择当前在途请求最少的密钥，吞吐量随密钥数量增长
+- 单密钥并发上限：每个密钥同时最多承载 max_in_flight 个请求，超出时排队等待
+- 按需废弃：只有密钥真正返回406（积分不足）时才移动到 deprecated_apikeys.txt
+- 进程间同步：通过 ApiKeyManager 定期同步其他进程废弃或新增的密钥，读取密钥文件时不持有密钥池的锁
+
+使用方法：
+    manager = ApiKeyManager()
+    pool = ApiKeyPool(manager.load(), max_in_flight=2, manager=manager)
+    api_key = pool.acquire()         # asyncio中使用 pool.try_acquire(refresh=False)，满载时返回None
+                                     # 并在线程中调用 pool.refresh()（见 linkai_async.acquire_key）
+    try:
+        ...  # 发送请求，遇到406时调用 pool.retire(api_key)
+    finally:
+        pool.release(api_key)
+"""
+
+import time
+import threading
+
+# 每个密钥默认的并发上限
+DEFAULT_MAX_IN_FLIGHT = 2
+
+# 与密钥文件同步的最短间隔（秒）
+REFRESH_INTERVAL = 5
+
+class ApiKeyPool:
+    """按在途请求数分配API密钥的线程安全密钥池"""
+
+    def __init__(self, keys, max_in_flight=DEFAULT_MAX_IN_FLIGHT, manager=None):
+        """
+        初始化密钥池
+
+        Args:
+            keys: 可用的API密钥列表（按api_keys.txt中的顺序）
+            max_in_flight: 每个密钥同时在途的最大请求数
+            manager: ApiKeyManager实例，负责持久化和进程间同步（可选，None时只在内存中废弃）
+        """
+        self.manager = manager
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.keys = list(dict.fromkeys(keys))
+        self.in_flight = {key: 0 for key in self.keys}
+        self.request_counts = {key: 0 for key in self.keys}
+        self.retired = []
+        self._next_index = 0
+        self._last_refresh = time.monotonic()
+        self._cond = threading.Condition()
+
+    @property
+    def capacity(self):
+        """所有可用密钥的总并发上限"""
+        with self._cond:
+            return len(self.keys) * self.max_in_flight
+
+    def __len__(self):
+        with self._cond:
+            return len(self.keys)
+
+    def refresh_due(self):
+        """距离上次与密钥文件同步是否已超过 REFRESH_INTERVAL"""
+        return self.manager is not None and time.monotonic() - self._last_refresh >= REFRESH_INTERVAL
+
+    def refresh(self):
+        """
+        同步其他进程对密钥文件的修改（距离上次同步不足 REFRESH_INTERVAL 时直接返回）
+
+        读取密钥文件要加跨进程文件锁，这一步在密钥池的锁之外进行，不阻塞其他线程取还密钥；
+        asyncio执行路径在线程中调用本方法，避免阻塞事件循环
+        """
+        with self._cond:
+            if not self.refresh_due():
+                return
+            self._last_refresh = time.monotonic()
+
+        removed, added = self.manager.refresh()
+        if not (removed or added):
+            return
+
+        with self._cond:
+            self._apply_changes(removed, added)
+            self._cond.notify_all()
+
+    def _apply_changes(self, removed, added):
+        """在持有锁的前提下应用其他进程废弃或新增的密钥"""
+        for key in removed:
+            if key in self.keys:
+                self.keys.remove(key)
+                self.retired.append(key)
+                print(f"🔄 API密钥 {key[:20]}... 已被其他进程废弃")
+        for key in added:
+            if key not in self.keys and key not in self.retired:
+                self.keys.append(key)
+                self.in_flight.setdefault(key, 0)
+                self.request_counts.setdefault(key, 0)
+                print(f"🔑 发现新增API密钥 {key[:20]}...")
+        self._next_index = 0
+
+    def _pick_key(self, exclude):
+        """选择在途请求最少且未满的密钥，相同负载时轮询"""
+        best_key = None
+        count = len(self.keys)
+        for offset in range(count):
+            key = self.keys[(self._next_index + offset) % count]
+            if key in exclude or self.in_flight[key] >= self.max_in_flight:
+                continue
+            if best_key is None or self.in_flight[key] < self.in_flight[best_key]:
+                best_key = key
+        if best_key is not None:
+            self._next_index = (self.keys.index(best_key) + 1) % count
+        return best_key
+
+    def acquire(self, exclude=(), timeout=None):
+        """
+        获取一个密钥，所有密钥都满载时阻塞等待
+
+        Args:
+            exclude: 本次不希望使用的密钥（例如刚失败的密钥）
+            timeout: 最长等待秒数，None表示一直等待
+
+        Returns:
+            密钥字符串；没有任何可用密钥或等待超时时返回None
+        """
+        exclude = set(exclude or ())
+        while True:
+            self.refresh()
+            with self._cond:
+                key = self._try_acquire_locked(exclude)
+                if key is not None or not self.keys:
+                    return key
+
+                if not self._cond.wait(timeout):
+                    return None
+
+    def try_acquire(self, exclude=(), refresh=True):
+        """
+        不阻塞地获取一个密钥（供asyncio执行路径和对冲请求使用）
+
+        Args:
+            exclude: 本次不希望使用的密钥
+            refresh: 是否先与密钥文件同步；在事件循环中调用时传False，改为在线程中调用 refresh()
+
+        Returns:
+            密钥字符串；所有密钥都满载或没有可用密钥时返回None（用 len(pool) 区分两种情况）
+        """
+        if refresh:
+            self.refresh()
+        with self._cond:
+            return self._try_acquire_locked(set(exclude or ()))
+
+    def _try_acquire_locked(self, exclude):
+        """在持有锁的前提下尝试占用一个密钥"""
+        if not any(key not in exclude for key in self.keys):
+            # 只剩被排除的密钥时退而求其次，总比没有密钥可用好
+            exclude = set()
+
+        key = self._pick_key(exclude)
+        if key is not None:
+            self.in_flight[key] += 1
+            self.request_counts[key] += 1
+        return key
+
+    def release(self, api_key):
+        """请求结束后归还密钥"""
+        with self._cond:
+            if api_key in self.in_flight and self.in_flight[api_key] > 0:
+                self.in_flight[api_key] -= 1
+            self._cond.notify_all()
+
+    def retire(self, api_key):
+        """
+        废弃积分耗尽的密钥：从池中移除，移动到废弃文件并更新api_keys.txt
+
+        Returns:
+            是否由本次调用完成废弃（重复废弃同一密钥时返回False）
+        """
+        with self._cond:
+            if api_key not in self.keys:
+                return False
+            self.keys.remove(api_key)
+            self.retired.append(api_key)
+            self._next_index = 0
+            remaining = list(self.keys)
+            self._cond.notify_all()
+
+        if self.manager is not None:
+            self.manager.retire(api_key)
+
+        print(f"🔄 API密钥 {api_key[:20]}... 积分不足，已废弃，剩余 {len(remaining)} 个可用密钥")
+        return True
+
+    def print_stats(self):
+        """打印各密钥的请求分布"""
+        with self._cond:
+            counts = dict(self.request_counts)
+            retired = set(self.retired)
+        if not counts:
+            return
+
+        print(f"\n🔑 API密钥使用统计:")
+        for key, count in counts.items():
+            status = "已废弃" if key in retired else "可用"
+            print(f"  {key[:20]}...: {count} 次请求（{status}）")
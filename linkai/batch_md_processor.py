@@ -10,7 +10,10 @@
 - 智能API密钥管理：自动从api_keys.txt读取密钥，积分不足时自动切换
 - 支持断点续传，避免重复处理
 - 可控制处理范围（起始序号到结束序号）
-- 智能重试机制处理API异常
+- 智能重试机制处理API异常：按错误类型限制重试次数，指数退避 + 随机抖动，遵守 Retry-After
+- 自适应限速：由速率限制器控制请求节奏（--rps / --tpm），被限流时自动降速，取代固定的随机延时
+- 短文章打包：--pack-tokens 把多篇短文章合并成一次请求，回复按分隔符拆回各文件，拆分失败时逐篇重试
+- 并发处理：--workers N 同时保持N个文件（打包时为N组）在处理中；--async 时为事件循环中的并发数
 - 详细的处理统计和进度报告
 
 使用方法：
@@ -18,6 +21,14 @@ python batch_md_processor.py wechat_huibenmamahaitong           # 处理所有
 python batch_md_processor.py wechat_huibenmamahaitong --start 10 --end 50    # 处理第10-50篇
 python batch_md_processor.py wechat_huibenmamahaitong --count 20              # 处理前20篇
 python batch_md_processor.py wechat_huibenmamahaitong --skip-existing         # 跳过已处理的文件
+python batch_md_processor.py wechat_huibenmamahaitong --rps 0.5 --tpm 60000   # 自定义速率限制
+python batch_md_processor.py wechat_huibenmamahaitong --no-cache              # 不使用响应缓存
+python batch_md_processor.py wechat_huibenmamahaitong --stream                # 流式模式：边生成边写入 .md.part
+python batch_md_processor.py wechat_huibenmamahaitong --workers 4             # 并发处理，同时进行4个API请求
+python batch_md_processor.py wechat_huibenmamahaitong --async                 # asyncio模式（需要aiohttp）
+python batch_md_processor.py wechat_huibenmamahaitong --report ../reports/run1 # 运行报告写入 run1.json 和 run1.csv
+python batch_md_processor.py wechat_huibenmamahaitong --hedge              # 超过p95耗时未返回的请求用其他密钥重发
+python batch_md_processor.py wechat_huibenmamahaitong --pack-tokens 3000      # 短文章打包，每个请求最多合并3000 token的输入
 
 输出结构：
 - 输入：wechat_huibenmamahaitong/001_2015-06-01_文章标题.md
@@ -29,22 +40,26 @@ import sys
 import glob
 import re
 import argparse
-import time
 from pathlib import Path
 from datetime import datetime
 import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 导入API相关模块
 sys.path.append(str(Path(__file__).parent))
-from batch_vtt_to_md import (
-    load_api_keys, get_next_api_key, switch_to_next_api_key, 
-    call_linkai_api, current_api_key
-)
+import linkai_client
+import linkai_async
+from batch_vtt_to_md import MODEL
+from rate_limiter import DEFAULT_REQUESTS_PER_SECOND, DEFAULT_TOKENS_PER_MINUTE
+from hedging import DEFAULT_MAX_EXTRA_FRACTION
+from token_counter import count_tokens
+from request_packer import plan_packs, format_packed_input, DEFAULT_PACK_TOKENS
+from text_reader import read_text
 
 # 配置参数
 DEFAULT_MAX_BATCH = 10000
-DEFAULT_DELAY = (3, 8)  # 请求间隔范围（秒）
-MAX_RETRIES = 3
+DEFAULT_WORKERS = 1  # 默认并发数（1表示逐篇串行处理）
 
 # 处理提示词
 PROCESSING_PROMPT = """你是一位专业的内容编辑和育儿专家。请将用户提供的文章转换为流畅、自然的简体中文文章。
@@ -66,18 +81,27 @@ PROCESSING_PROMPT = """你是一位专业的内容编辑和育儿专家。请将
 直接输出整理后的文章内容，不要添加任何解释或标记。"""
 
 class MarkdownProcessor:
-    def __init__(self, input_folder, output_folder=None, delay_range=DEFAULT_DELAY):
+    def __init__(self, input_folder, output_folder=None, stream=False, async_mode=False, pack_tokens=0,
+                 workers=DEFAULT_WORKERS):
         """
         初始化Markdown处理器
         
+        请求节奏由 linkai_client 的速率限制器统一控制（见 linkai_client.configure_rate_limit）
+        
         Args:
             input_folder: 输入文件夹路径
             output_folder: 输出文件夹路径（可选）
-            delay_range: 请求间隔范围（秒）
+            stream: 是否使用流式模式（边生成边写入 .md.part 文件）
+            async_mode: 是否使用asyncio执行路径（需要aiohttp）
+            pack_tokens: 短文章打包的每请求token预算，0表示不打包
+            workers: 同时处理的文件数（打包时为组数），asyncio模式下为事件循环中的并发数
         """
         self.input_folder = input_folder
         self.output_folder = output_folder or f"{input_folder}_result"
-        self.delay_range = delay_range
+        self.stream = stream
+        self.async_mode = async_mode
+        self.pack_tokens = pack_tokens
+        self.workers = max(1, workers)
         
         # 统计信息
         self.stats = {
@@ -111,9 +135,7 @@ class MarkdownProcessor:
     def read_md_content(self, file_path):
         """读取Markdown文件内容"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return content
+            return read_text(file_path)
         except Exception as e:
             self.logger.error(f"读取文件失败 {file_path}: {e}")
             return None
@@ -148,19 +170,36 @@ class MarkdownProcessor:
             self.logger.error(f"解析Markdown内容失败: {e}")
             return "未知标题", md_content
     
-    def process_content_with_ai(self, title, content):
-        """使用AI处理文章内容"""
+    def build_messages(self, title, content):
+        """构建请求消息"""
+        user_content = f"标题：{title}\n\n内容：\n{content}"
+        
+        return [
+            {"role": "system", "content": PROCESSING_PROMPT},
+            {"role": "user", "content": user_content}
+        ]
+    
+    def build_packed_messages(self, jobs):
+        """构建打包请求消息：多篇短文章放进同一条用户消息，用编号分隔符区分"""
+        sections = [f"标题：{job['title']}\n\n内容：\n{job['article_content']}" for job in jobs]
+        user_content = f"请分别整理以下 {len(jobs)} 篇文章：\n\n{format_packed_input(sections)}"
+        
+        return [
+            {"role": "system", "content": PROCESSING_PROMPT},
+            {"role": "user", "content": user_content}
+        ]
+    
+    def build_job_messages(self, job):
+        """构建单篇文章的请求消息（打包拆分失败时逐篇回退使用）"""
+        return self.build_messages(job['title'], job['article_content'])
+    
+    def process_content_with_ai(self, title, content, stream_to=None):
+        """使用AI处理文章内容（stream_to 为流式模式下接收内容的 .md.part 文件路径）"""
         try:
-            # 构建消息
-            user_content = f"标题：{title}\n\n内容：\n{content}"
-            
-            messages = [
-                {"role": "system", "content": PROCESSING_PROMPT},
-                {"role": "user", "content": user_content}
-            ]
+            messages = self.build_messages(title, content)
             
             # 调用API
-            result = call_linkai_api(messages)
+            result = linkai_client.call_linkai_api(messages, model=MODEL, stream_to=stream_to)
             return result
             
         except Exception as e:
@@ -192,88 +231,226 @@ class MarkdownProcessor:
             self.logger.error(f"创建处理后的Markdown失败: {e}")
             return f"# {title}\n\n{processed_content}"
     
-    def save_processed_file(self, output_path, content):
-        """保存处理后的文件"""
+    def save_processed_file(self, output_path, content, part_path=None):
+        """保存处理后的文件（流式模式下用最终内容替换 .md.part 文件）"""
         try:
             # 确保输出目录存在
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if part_path:
+                linkai_client.finalize_part_file(part_path, output_path, content)
+            else:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
             return True
             
         except Exception as e:
             self.logger.error(f"保存文件失败 {output_path}: {e}")
             return False
     
+    def prepare_file(self, file_path):
+        """
+        读取并解析单个文件
+        
+        Returns:
+            (状态, 任务信息)：状态为 'skipped'/'failed' 时无需继续处理，为None时任务信息可用
+        """
+        filename = os.path.basename(file_path)
+        file_number = self.extract_file_number(filename)
+        output_path = os.path.join(self.output_folder, filename)
+        
+        print(f"\n📄 处理第 {file_number} 篇: {filename[:50]}...")
+        
+        # 检查文件是否已存在（断点续传）
+        if os.path.exists(output_path):
+            print(f"    ✅ 文件已存在，跳过: {filename}")
+            return 'skipped', None
+        
+        # 读取原始内容
+        original_content = self.read_md_content(file_path)
+        if not original_content:
+            print(f"    ❌ 读取文件失败")
+            return 'failed', None
+        
+        # 提取文章内容
+        title, article_content = self.extract_article_content(original_content)
+        
+        if not article_content.strip():
+            print(f"    ⚠️  文章内容为空，跳过处理")
+            return 'skipped', None
+        
+        # 流式模式下先写入 .md.part，完成后再重命名
+        part_path = None
+        if self.stream:
+            os.makedirs(self.output_folder, exist_ok=True)
+            part_path = f"{output_path}.part"
+        
+        return None, {
+            'filename': filename,
+            'output_path': output_path,
+            'part_path': part_path,
+            'original_content': original_content,
+            'title': title,
+            'article_content': article_content
+        }
+    
+    def finish_file(self, job, processed_content):
+        """根据AI处理结果生成并保存文件，返回 'success' 或 'failed'"""
+        if not processed_content:
+            print(f"    ❌ AI处理失败")
+            return 'failed'
+        
+        # 创建新的Markdown内容
+        new_md_content = self.create_processed_md(job['original_content'], job['title'], processed_content)
+        
+        # 保存文件
+        if self.save_processed_file(job['output_path'], new_md_content, part_path=job['part_path']):
+            print(f"    ✅ 处理完成: {job['filename']}")
+            return 'success'
+        else:
+            print(f"    ❌ 保存失败")
+            return 'failed'
+    
     def process_single_file(self, file_path):
         """处理单个文件"""
         try:
-            filename = os.path.basename(file_path)
-            file_number = self.extract_file_number(filename)
-            output_path = os.path.join(self.output_folder, filename)
-            
-            print(f"\n📄 处理第 {file_number} 篇: {filename[:50]}...")
-            
-            # 检查文件是否已存在（断点续传）
-            if os.path.exists(output_path):
-                print(f"    ✅ 文件已存在，跳过: {filename}")
-                return 'skipped'
-            
-            # 读取原始内容
-            original_content = self.read_md_content(file_path)
-            if not original_content:
-                print(f"    ❌ 读取文件失败")
-                return 'failed'
+            status, job = self.prepare_file(file_path)
+            if status:
+                return status
             
-            # 提取文章内容
-            title, article_content = self.extract_article_content(original_content)
+            # 使用AI处理内容（重试和退避由 linkai_client 的重试策略负责）
+            print(f"    🤖 AI处理中...")
+            processed_content = self.process_content_with_ai(
+                job['title'], job['article_content'], stream_to=job['part_path'])
             
-            if not article_content.strip():
-                print(f"    ⚠️  文章内容为空，跳过处理")
-                return 'skipped'
+            return self.finish_file(job, processed_content)
+                
+        except Exception as e:
+            print(f"    ❌ 处理异常: {e}")
+            return 'failed'
+    
+    async def process_single_file_async(self, file_path):
+        """处理单个文件（asyncio版本：文件读写在线程中执行，API请求在事件循环中等待）"""
+        try:
+            status, job = await asyncio.to_thread(self.prepare_file, file_path)
+            if status:
+                return status
             
-            # 使用AI处理内容（带重试）
-            processed_content = None
-            for attempt in range(MAX_RETRIES):
-                try:
-                    print(f"    🤖 AI处理中...")
-                    processed_content = self.process_content_with_ai(title, article_content)
-                    if processed_content:
-                        break
-                    elif attempt < MAX_RETRIES - 1:
-                        print(f"    🔄 第 {attempt + 1} 次重试...")
-                        time.sleep(3)
-                except Exception as e:
-                    if attempt < MAX_RETRIES - 1:
-                        print(f"    🔄 重试中... ({attempt + 1}/{MAX_RETRIES}): {e}")
-                        time.sleep(3)
-                    else:
-                        print(f"    ❌ 重试失败: {e}")
+            print(f"    🤖 AI处理中...")
+            processed_content = await linkai_async.call_linkai_api_async(
+                self.build_messages(job['title'], job['article_content']),
+                model=MODEL, stream_to=job['part_path'])
             
-            if not processed_content:
-                print(f"    ❌ AI处理失败")
-                return 'failed'
+            return await asyncio.to_thread(self.finish_file, job, processed_content)
+                
+        except Exception as e:
+            print(f"    ❌ 处理异常: {e}")
+            return 'failed'
+    
+    def plan_groups(self, file_paths):
+        """打包模式：读取所有文件，把短文章按token预算分组（长文章单独成组），跳过或失败的文件直接计入统计"""
+        jobs = []
+        for file_path in file_paths:
+            status, job = self.prepare_file(file_path)
+            if status:
+                self.record_result(status)
+            else:
+                jobs.append(job)
+        
+        groups = plan_packs([count_tokens(job['article_content']) for job in jobs], max_tokens=self.pack_tokens)
+        groups = [[jobs[index] for index in group] for group in groups]
+        packed = [jobs for jobs in groups if len(jobs) > 1]
+        print(f"\n📦 打包模式：{sum(len(jobs) for jobs in packed)} 篇短文章合并为 {len(packed)} 个请求，"
+              f"共 {len(groups)} 个请求")
+        return groups
+    
+    def process_group(self, jobs):
+        """处理一组文章，返回每篇的结果：单篇按普通方式处理（可流式），多篇打包为一次请求"""
+        try:
+            if len(jobs) == 1:
+                job = jobs[0]
+                print(f"\n    🤖 AI处理中: {job['filename'][:50]}...")
+                processed_content = self.process_content_with_ai(
+                    job['title'], job['article_content'], stream_to=job['part_path'])
+                return [self.finish_file(job, processed_content)]
             
-            # 创建新的Markdown内容
-            new_md_content = self.create_processed_md(original_content, title, processed_content)
+            print(f"\n    📦 打包处理 {len(jobs)} 篇短文章...")
+            results = linkai_client.call_linkai_api_packed(
+                self.build_packed_messages, self.build_job_messages, jobs, model=MODEL)
+            return [self.finish_file(job, content) for job, content in zip(jobs, results)]
+                
+        except Exception as e:
+            print(f"    ❌ 处理异常: {e}")
+            return ['failed'] * len(jobs)
+    
+    async def process_group_async(self, jobs):
+        """处理一组文章（asyncio版本），返回每篇的结果"""
+        try:
+            if len(jobs) == 1:
+                job = jobs[0]
+                print(f"\n    🤖 AI处理中: {job['filename'][:50]}...")
+                processed_content = await linkai_async.call_linkai_api_async(
+                    self.build_job_messages(job), model=MODEL, stream_to=job['part_path'])
+                return [await asyncio.to_thread(self.finish_file, job, processed_content)]
             
-            # 保存文件
-            if self.save_processed_file(output_path, new_md_content):
-                print(f"    ✅ 处理完成: {filename}")
-                return 'success'
-            else:
-                print(f"    ❌ 保存失败")
-                return 'failed'
+            print(f"\n    📦 打包处理 {len(jobs)} 篇短文章...")
+            results = await linkai_async.call_linkai_api_packed_async(
+                self.build_packed_messages, self.build_job_messages, jobs, model=MODEL)
+            return [await asyncio.to_thread(self.finish_file, job, content)
+                    for job, content in zip(jobs, results)]
                 
         except Exception as e:
             print(f"    ❌ 处理异常: {e}")
-            return 'failed'
+            return ['failed'] * len(jobs)
+    
+    async def process_groups_async(self, groups):
+        """在单个事件循环中同时处理多组文章"""
+        async for jobs, results, error in linkai_async.as_completed_limited(
+                self.process_group_async, groups, self.workers):
+            if error:
+                print(f"    ❌ 处理异常: {error}")
+                results = ['failed'] * len(jobs)
+            for result in results:
+                self.record_result(result)
+    
+    def record_result(self, result):
+        """更新统计"""
+        self.stats['total_processed'] += 1
+        if result == 'success':
+            self.stats['success_count'] += 1
+        elif result == 'failed':
+            self.stats['failed_count'] += 1
+        elif result == 'skipped':
+            self.stats['skipped_count'] += 1
+    
+    async def process_files_async(self, file_paths):
+        """在单个事件循环中同时处理多个文件"""
+        async for file_path, result, error in linkai_async.as_completed_limited(
+                self.process_single_file_async, file_paths, self.workers):
+            if error:
+                print(f"    ❌ 处理异常: {os.path.basename(file_path)}: {error}")
+                result = 'failed'
+            self.record_result(result)
+    
+    def process_groups_concurrently(self, groups):
+        """用线程池同时处理多组文章（统计在主线程中更新）"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.process_group, jobs): jobs for jobs in groups}
+            for future in as_completed(futures):
+                for result in future.result():
+                    self.record_result(result)
     
-    def get_random_delay(self):
-        """获取随机延时"""
-        import random
-        return random.uniform(self.delay_range[0], self.delay_range[1])
+    def process_files_concurrently(self, file_paths):
+        """用线程池同时处理多个文件（统计在主线程中更新）"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.process_single_file, file_path): file_path for file_path in file_paths}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"    ❌ 处理异常: {os.path.basename(futures[future])}: {e}")
+                    result = 'failed'
+                self.record_result(result)
     
     def process_files(self, start_num=None, end_num=None, count=None, skip_existing=True):
         """批量处理文件"""
@@ -319,23 +496,27 @@ class MarkdownProcessor:
         # 开始处理
         self.stats['start_time'] = datetime.now()
         
-        for i, file_path in enumerate(filtered_files):
-            result = self.process_single_file(file_path)
-            
-            # 更新统计
-            self.stats['total_processed'] += 1
-            if result == 'success':
-                self.stats['success_count'] += 1
-            elif result == 'failed':
-                self.stats['failed_count'] += 1
-            elif result == 'skipped':
-                self.stats['skipped_count'] += 1
-            
-            # 延时避免频繁请求
-            if i < len(filtered_files) - 1:  # 最后一个不需要延时
-                delay = self.get_random_delay()
-                print(f"    ⏰ 等待 {delay:.1f} 秒...")
-                time.sleep(delay)
+        if self.pack_tokens:
+            groups = self.plan_groups(filtered_files)
+            if self.async_mode:
+                print(f"⚡ asyncio模式：同时处理最多 {self.workers} 组")
+                linkai_async.run(self.process_groups_async(groups))
+            elif self.workers > 1:
+                print(f"⚡ 并发模式：同时处理 {self.workers} 组")
+                self.process_groups_concurrently(groups)
+            else:
+                for jobs in groups:
+                    for result in self.process_group(jobs):
+                        self.record_result(result)
+        elif self.async_mode:
+            print(f"⚡ asyncio模式：同时处理最多 {self.workers} 个文件")
+            linkai_async.run(self.process_files_async(filtered_files))
+        elif self.workers > 1:
+            print(f"⚡ 并发模式：同时处理 {self.workers} 个文件")
+            self.process_files_concurrently(filtered_files)
+        else:
+            for i, file_path in enumerate(filtered_files):
+                self.record_result(self.process_single_file(file_path))
         
         # 显示统计结果
         self.print_statistics()
@@ -367,38 +548,61 @@ def main():
     parser.add_argument('--start', type=int, help='起始序号')
     parser.add_argument('--end', type=int, help='结束序号')
     parser.add_argument('--count', type=int, help='处理文件数量')
-    parser.add_argument('--delay', type=str, default='3,8', 
-                       help='请求延时范围（秒），格式: min,max（默认: 3,8）')
+    parser.add_argument('--rps', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                       help=f'每秒请求数上限（默认：{DEFAULT_REQUESTS_PER_SECOND}，限流时自动降速）')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TOKENS_PER_MINUTE,
+                       help=f'每分钟token上限（默认：{DEFAULT_TOKENS_PER_MINUTE}，0表示不限制）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用响应缓存，所有请求都调用API')
+    parser.add_argument('--stream', action='store_true',
+                       help='流式模式：边生成边写入 .md.part 文件，使用空闲超时代替总超时')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'并发处理的文件数量（默认：{DEFAULT_WORKERS}，即逐篇串行处理）')
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                       help=f'使用asyncio执行（需要aiohttp），--workers 为同时处理的文件数，默认 {linkai_async.DEFAULT_ASYNC_CONCURRENCY}')
     parser.add_argument('--skip-existing', action='store_true', 
                        help='跳过已存在的文件（默认开启）')
+    parser.add_argument('--pack-tokens', type=int, nargs='?', const=DEFAULT_PACK_TOKENS, default=0,
+                       help=f'把多篇短文章打包成一次请求，每个请求的输入token预算（只写 --pack-tokens 时为 {DEFAULT_PACK_TOKENS}，默认不打包）')
+    parser.add_argument('--report', type=str, default=None,
+                       help='运行报告路径前缀，生成 <前缀>.json 和 <前缀>.csv（默认：linkai_reports/batch_md_processor_时间）')
+    parser.add_argument('--credit-rates', type=str, default=None,
+                       help='积分单价文件（默认：credit_rates.json，不存在时只统计token）')
+    parser.add_argument('--hedge', type=float, nargs='?', const=DEFAULT_MAX_EXTRA_FRACTION, default=0,
+                       help=f'对冲请求：超过p95耗时未返回时用其他密钥重发，参数为对冲请求占比上限（只写 --hedge 时为 {DEFAULT_MAX_EXTRA_FRACTION}，默认关闭）')
     
     args = parser.parse_args()
+    workers = max(1, args.workers)
+    if args.async_mode and not linkai_async.AIOHTTP_AVAILABLE:
+        print("⚠️  未安装aiohttp（pip install aiohttp），改用同步模式")
+        args.async_mode = False
+    if args.async_mode and workers == 1:
+        workers = linkai_async.DEFAULT_ASYNC_CONCURRENCY
     
     # 检查输入文件夹是否存在
     if not os.path.exists(args.input_folder):
         print(f"❌ 输入文件夹不存在: {args.input_folder}")
         sys.exit(1)
     
-    # 解析延时参数
-    try:
-        delay_min, delay_max = map(float, args.delay.split(','))
-        delay_range = (delay_min, delay_max)
-    except:
-        delay_range = DEFAULT_DELAY
-        print(f"⚠️  延时参数格式错误，使用默认值: {DEFAULT_DELAY}")
-    
-    # 初始化API密钥
-    global current_api_key
-    current_api_key = get_next_api_key()
-    if not current_api_key:
+    # 初始化速率限制和API密钥
+    linkai_client.configure_rate_limit(args.rps, args.tpm)
+    linkai_client.configure_cache(enabled=not args.no_cache)
+    linkai_client.configure_hedging(args.hedge)
+    linkai_client.configure_telemetry(args.credit_rates)
+    if not linkai_client.init_key_pool():
         print("❌ 错误：没有可用的API密钥，请检查 api_keys.txt 文件")
         sys.exit(1)
+    # 连接池不小于并发数和密钥池容量
+    linkai_client.configure_pool(max(workers, linkai_client.key_pool.capacity))
     
     # 创建处理器实例
     processor = MarkdownProcessor(
         input_folder=args.input_folder,
         output_folder=args.output,
-        delay_range=delay_range
+        stream=args.stream,
+        async_mode=args.async_mode,
+        pack_tokens=max(0, args.pack_tokens),
+        workers=workers
     )
     
     # 开始处理
@@ -411,6 +615,13 @@ def main():
         )
         
         if success:
+            linkai_client.print_retry_stats()
+            linkai_client.print_http_stats()
+            linkai_client.rate_limiter.print_stats()
+            linkai_client.hedge_policy.print_stats()
+            if linkai_client.response_cache:
+                linkai_client.response_cache.print_stats()
+            linkai_client.write_run_report("batch_md_processor", args.report)
             print("\n🎉 处理完成！")
         else:
             print("\n❌ 处理失败！")
@@ -7,11 +7,17 @@ TXT到Markdown的通用批量处理器
 功能特点：
 - 通用主题识别：支持科技、教育、生活、商业、投资理财、职场、文化、健康医疗、新闻时事等9大分类
 - 智能内容分析：根据内容特征自动分类（教程指南、经验分享、评测推荐等）
-- 智能API密钥管理：自动从api_keys.txt读取密钥，积分不足时自动切换
-- 智能重试机制：API超时或连接失败时自动重试，406错误自动切换密钥
+- 智能API密钥管理：自动从api_keys.txt读取密钥，并发请求分摊到所有密钥，积分不足时自动废弃
+- 连接复用：通过 linkai_client 共享keep-alive连接池，减少重复握手
+- 智能重试机制：按错误类型分别限制重试次数，指数退避 + 随机抖动，遵守服务端 Retry-After，406错误自动切换密钥
 - 详细错误统计：记录各种错误类型和重试次数
 - 增强的错误处理：区分超时、连接错误、积分不足等不同问题
 - 多编码支持：自动检测UTF-8、GBK、GB2312等多种文件编码
+- 并发处理：--workers N 同时保持N个文件在处理中，适合大批量积压
+- asyncio模式：--async 在单个事件循环中同时等待大量请求，文件读写交给线程执行
+- 长文本分片：超长文本按段落切成多个片段并发请求，按原顺序拼接，不再因单个请求过大而超时
+- 短文本打包：--pack-tokens 把多篇短文本合并成一次请求，共用一份系统提示词，回复按分隔符拆回各文件
+- 文本预处理：发送前在本地去掉口头语、合并空白和重复标点、繁体转简体，打印每个文件和整次运行节省的token数
 
 默认路径：
 - 输入目录：../output_result（与VTT处理器共用同一目录）
@@ -21,10 +27,21 @@ TXT到Markdown的通用批量处理器
 python batch_txt_to_md.py           # 处理output_result目录下所有TXT文件
 python batch_txt_to_md.py 5         # 只处理前5个TXT文件
 python batch_txt_to_md.py --input ../my_folder --output ../my_output  # 自定义目录
+python batch_txt_to_md.py --workers 4  # 并发处理，同时进行4个API请求
+python batch_txt_to_md.py --workers 8 --per-key 2  # 8个并发请求分摊到各个密钥，每个密钥最多2个
+python batch_txt_to_md.py --workers 8 --rps 4 --tpm 200000  # 每秒最多4个请求、每分钟最多20万token
+python batch_txt_to_md.py --no-cache  # 不使用响应缓存（默认会复用相同请求的历史结果）
+python batch_txt_to_md.py --stream    # 流式模式：边生成边写入 .md.part，超时不丢失已生成内容
+python batch_txt_to_md.py --async      # asyncio模式（需要aiohttp），单进程同时处理大量文件
+python batch_txt_to_md.py --chunk-tokens 4000  # 超过4000 token的长文本按段落分片并发处理
+python batch_txt_to_md.py --report ../reports/run1  # 运行报告写入 ../reports/run1.json 和 .csv
+python batch_txt_to_md.py --workers 8 --hedge  # 超过p95耗时未返回的请求用其他密钥重发（最多5%）
+python batch_txt_to_md.py --pack-tokens 3000  # 短文本打包，每个请求最多合并3000 token的输入
+python batch_txt_to_md.py --normalize fillers,t2s  # 发送前去口头语和繁转简（all 表示全部步骤，默认不预处理）
 
 配置参数：
-- 最大重试次数：3次
-- 重试间隔：5秒
+- 重试策略：超时/连接/5xx错误最多重试2次，429最多重试5次，退避时间指数增长并随机抖动（见 retry_policy.py）
+- 请求节奏：自适应速率限制（--rps 每秒请求数上限，--tpm 每分钟token上限），429/5xx/超时自动降速
 - API超时时间：120秒
 - 主题标签数量：最多3个
 
@@ -34,22 +51,29 @@ https://docs.link-ai.tech/platform/funds/price
 import os
 import sys
 import glob
-import requests
 import json
-import time
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 import argparse
-
-# LinkAI API 配置
-BASE_URL = "https://api.link-ai.tech/v1"
-CHAT_URL = f"{BASE_URL}/chat/completions"
-
-# API密钥管理
-API_KEYS_FILE = "api_keys.txt"
-DEPRECATED_KEYS_FILE = "deprecated_apikeys.txt"
-current_api_key = None
+import asyncio
+
+# 导入API相关模块
+sys.path.append(str(Path(__file__).parent))
+import linkai_client
+import linkai_async
+from api_key_pool import DEFAULT_MAX_IN_FLIGHT
+from rate_limiter import DEFAULT_REQUESTS_PER_SECOND, DEFAULT_TOKENS_PER_MINUTE
+from hedging import DEFAULT_MAX_EXTRA_FRACTION
+from telemetry import estimate_seconds_per_call
+from token_counter import count_tokens
+from request_packer import plan_packs, format_packed_input, DEFAULT_PACK_TOKENS
+from text_reader import read_text, detect_encoding
+from text_normalizer import TextNormalizer, parse_steps, ALL_STEPS
+
+# LinkAI 模型配置
+MODEL = "LinkAI-4.1-nano"
 
 # 文件路径配置
 TXT_FOLDER = r'../output_result'  # TXT文件输入目录（与VTT文件共用）
@@ -57,21 +81,11 @@ MD_FOLDER = r'../output_result_md_linkai'  # MD文件输出目录（与VTT处理
 
 # 处理配置
 BATCH_SIZE = 5  # 每批处理的文件数量
-DELAY_BETWEEN_REQUESTS = 1  # 请求间隔（秒）
-BATCH_DELAY = 3  # 批次间隔（秒）
-
-# 重试配置
-MAX_RETRIES = 3  # 最大重试次数
-RETRY_DELAY = 5  # 重试间隔（秒）
-API_TIMEOUT = 120  # API超时时间（秒）
-
-# 全局统计变量
-retry_stats = {
-    'total_retries': 0,
-    'timeout_errors': 0,
-    'connection_errors': 0,
-    'other_errors': 0
-}
+DEFAULT_WORKERS = 1  # 默认并发数（1表示按批次串行处理）
+STREAM_MODE = False  # 流式模式（--stream）
+CHUNK_TOKENS = linkai_client.MAX_INPUT_TOKENS  # 单次请求的输入token上限，超过时分片（--chunk-tokens）
+PACK_TOKENS = 0  # 短文本打包的每请求token预算，0表示不打包（--pack-tokens）
+NORMALIZER = TextNormalizer()  # 发送前的文本预处理（默认关闭，--normalize 选择步骤）
 
 # 系统提示词
 SYSTEM_PROMPT = """你是一位专业的内容编辑和公众号大V,频道名称是MoonClub。请将用户提供的文本转换为流畅、自然的简体中文文章。
@@ -112,170 +126,6 @@ SYSTEM_PROMPT = """你是一位专业的内容编辑和公众号大V,频道名
 
 规则：输出一篇可以直接发布到微信公众号的文章，不要超过2500字，要符合公众号的风格和规则，里面不要出现欢迎收听这种明显的问题，不要添加任何解释或标记。"""
 
-def load_api_keys():
-    """加载API密钥列表"""
-    try:
-        with open(API_KEYS_FILE, 'r', encoding='utf-8') as f:
-            keys = [line.strip() for line in f if line.strip()]
-        return keys
-    except FileNotFoundError:
-        print(f"❌ 错误：找不到API密钥文件 {API_KEYS_FILE}")
-        return []
-
-def save_api_keys(keys):
-    """保存API密钥列表"""
-    with open(API_KEYS_FILE, 'w', encoding='utf-8') as f:
-        for key in keys:
-            f.write(key + '\n')
-
-def move_key_to_deprecated(api_key):
-    """将无积分的API密钥移动到废弃文件"""
-    try:
-        # 读取现有的废弃密钥
-        deprecated_keys = []
-        if os.path.exists(DEPRECATED_KEYS_FILE):
-            with open(DEPRECATED_KEYS_FILE, 'r', encoding='utf-8') as f:
-                deprecated_keys = [line.strip() for line in f if line.strip()]
-        
-        # 添加新的废弃密钥
-        if api_key not in deprecated_keys:
-            deprecated_keys.append(api_key)
-            with open(DEPRECATED_KEYS_FILE, 'w', encoding='utf-8') as f:
-                for key in deprecated_keys:
-                    f.write(key + '\n')
-            print(f"🗑️  已将无积分的API密钥移动到 {DEPRECATED_KEYS_FILE}")
-    except Exception as e:
-        print(f"⚠️  移动废弃密钥时出错: {e}")
-
-def get_next_api_key():
-    """获取下一个可用的API密钥"""
-    global current_api_key
-    
-    api_keys = load_api_keys()
-    if not api_keys:
-        print("❌ 错误：没有可用的API密钥")
-        return None
-    
-    current_api_key = api_keys[0]
-    print(f"🔑 使用API密钥: {current_api_key[:20]}...")
-    return current_api_key
-
-def switch_to_next_api_key():
-    """切换到下一个API密钥"""
-    global current_api_key
-    
-    api_keys = load_api_keys()
-    if not api_keys:
-        print("❌ 错误：没有可用的API密钥")
-        return None
-    
-    if current_api_key and current_api_key in api_keys:
-        # 移动当前密钥到废弃文件
-        move_key_to_deprecated(current_api_key)
-        
-        # 从可用密钥列表中移除
-        api_keys.remove(current_api_key)
-        save_api_keys(api_keys)
-        
-        print(f"🔄 API密钥 {current_api_key[:20]}... 积分不足，切换到下一个")
-    
-    if api_keys:
-        current_api_key = api_keys[0]
-        print(f"🔑 切换到新的API密钥: {current_api_key[:20]}...")
-        return current_api_key
-    else:
-        print("❌ 错误：所有API密钥都已用完积分")
-        current_api_key = None
-        return None
-
-def call_linkai_api(messages, retry_count=0):
-    """调用LinkAI API，带重试机制和自动密钥切换"""
-    global current_api_key
-    
-    # 确保有可用的API密钥
-    if not current_api_key:
-        current_api_key = get_next_api_key()
-        if not current_api_key:
-            return None
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {current_api_key}"
-    }
-    
-    body = {
-        "messages": messages,
-        "stream": False,
-        "temperature": 0.3,
-        "model": "LinkAI-4.1-nano"
-    }
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            if attempt > 0:
-                retry_stats['total_retries'] += 1
-                print(f"    🔄 第 {attempt + 1} 次重试...")
-                time.sleep(RETRY_DELAY)
-            
-            response = requests.post(CHAT_URL, json=body, headers=headers, timeout=API_TIMEOUT)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if 'choices' in result and len(result['choices']) > 0:
-                    if attempt > 0:
-                        print(f"    ✅ 重试成功！")
-                    return result['choices'][0]['message']['content']
-                else:
-                    print(f"    ❌ API响应格式异常: {result}")
-                    if attempt == MAX_RETRIES - 1:
-                        retry_stats['other_errors'] += 1
-                        return None
-                    continue
-            elif response.status_code == 406:
-                print(f"    💳 API密钥积分不足 (406错误)")
-                # 切换到下一个API密钥
-                new_key = switch_to_next_api_key()
-                if new_key:
-                    # 更新请求头中的密钥
-                    headers["Authorization"] = f"Bearer {new_key}"
-                    print(f"    🔄 已切换API密钥，重新尝试...")
-                    continue
-                else:
-                    print(f"    ❌ 所有API密钥都已用完积分")
-                    retry_stats['other_errors'] += 1
-                    return None
-            else:
-                print(f"    ❌ API调用失败: {response.status_code}")
-                print(f"    错误信息: {response.text}")
-                if attempt == MAX_RETRIES - 1:
-                    retry_stats['other_errors'] += 1
-                    return None
-                continue
-                
-        except requests.exceptions.Timeout:
-            retry_stats['timeout_errors'] += 1
-            print(f"    ⏰ API超时 (超过{API_TIMEOUT}秒)")
-            if attempt == MAX_RETRIES - 1:
-                print(f"    ❌ 已重试 {MAX_RETRIES} 次，仍然超时，跳过此文件")
-                return None
-            continue
-        except requests.exceptions.ConnectionError:
-            retry_stats['connection_errors'] += 1
-            print(f"    🌐 网络连接错误")
-            if attempt == MAX_RETRIES - 1:
-                print(f"    ❌ 已重试 {MAX_RETRIES} 次，仍然连接失败，跳过此文件")
-                return None
-            continue
-        except Exception as e:
-            retry_stats['other_errors'] += 1
-            print(f"    ❌ API调用异常: {e}")
-            if attempt == MAX_RETRIES - 1:
-                print(f"    ❌ 已重试 {MAX_RETRIES} 次，仍然失败，跳过此文件")
-                return None
-            continue
-    
-    return None
-
 def extract_date_from_filename(filename):
     """从文件名中提取日期"""
     # 匹配 YYYY-MM-DD 格式
@@ -292,24 +142,59 @@ def extract_date_from_filename(filename):
     
     return datetime.now().strftime('%Y年%m月%d日')
 
-def process_text_with_ai(text, title, publish_date):
-    """使用AI处理文本，转换为高质量的简体中文文章"""
+def build_messages(text, title, publish_date, index=1, total=1):
+    """构造请求消息；长文本分片时说明当前是第几部分"""
+    part_note = ""
+    if total > 1:
+        part_note = f"\n（这是完整文本的第 {index}/{total} 部分，请只整理这一部分，不要添加开头总结或结尾总结）\n"
+
     user_prompt = f"""请将以下文本内容转换为高质量的简体中文文章：
 
 标题：{title}
 发布时间：{publish_date}
-
+{part_note}
 文本内容：
 {text}
 
 请按照要求输出整理后的文章内容。"""
 
-    messages = [
+    return [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt}
     ]
+
+def build_packed_messages(jobs):
+    """构造打包请求：多篇短文本放进同一条用户消息，用编号分隔符区分"""
+    sections = [f"""标题：{job['title']}
+发布时间：{job['publish_date']}
+
+文本内容：
+{job['text']}""" for job in jobs]
+
+    user_prompt = f"""请将以下 {len(jobs)} 篇文本内容分别转换为高质量的简体中文文章：
+
+{format_packed_input(sections)}"""
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def build_job_messages(job):
+    """构造单个文件的请求消息（打包拆分失败时逐篇回退使用）"""
+    return build_messages(job['text'], job['title'], job['publish_date'])
+
+def process_text_with_ai(text, title, publish_date, stream_to=None):
+    """使用AI处理文本，转换为高质量的简体中文文章
     
-    return call_linkai_api(messages)
+    超过 CHUNK_TOKENS 的长文本按段落分片，各片段并发请求后按顺序拼接
+    
+    Args:
+        stream_to: 流式模式下接收内容的 .md.part 文件路径（分片时不使用流式）
+    """
+    return linkai_client.call_linkai_api_chunked(
+        lambda chunk, index, total: build_messages(chunk, title, publish_date, index, total),
+        text, model=MODEL, max_tokens=CHUNK_TOKENS, stream_to=stream_to)
 
 def extract_key_topics(title, content):
     """提取关键主题"""
@@ -351,65 +236,74 @@ def extract_key_topics(title, content):
     return topics[:3]  # 最多返回3个主题标签
 
 def read_txt_file(txt_file_path):
-    """读取TXT文件内容，自动检测编码"""
-    encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16', 'ascii']
-    
-    for encoding in encodings:
-        try:
-            with open(txt_file_path, 'r', encoding=encoding) as f:
-                content = f.read()
-            return content
-        except (UnicodeDecodeError, UnicodeError):
-            continue
-        except Exception as e:
-            print(f"  ⚠️ 读取文件时出错（编码：{encoding}）: {e}")
-            continue
-    
-    print(f"  ❌ 无法识别文件编码")
+    """读取TXT文件内容，自动检测编码（只读取和解码一次）"""
+    try:
+        return read_text(txt_file_path)
+    except UnicodeError:
+        print(f"  ❌ 无法识别文件编码（检测结果：{detect_encoding(txt_file_path)}）")
+    except Exception as e:
+        print(f"  ⚠️ 读取文件时出错: {e}")
     return None
 
-def process_single_txt_file(txt_file_path):
-    """处理单个TXT文件"""
-    try:
-        filename = os.path.basename(txt_file_path)
-        print(f"📝 处理: {filename}")
-        
-        # 读取TXT文件
-        text = read_txt_file(txt_file_path)
-        if not text:
-            print(f"  ❌ TXT读取失败")
-            return False
-        
-        # 文本太短，跳过
-        if len(text.strip()) < 100:
-            print(f"  ⚠️ 文本内容过短（少于100字符），跳过")
-            return False
-        
-        # 从文件名提取标题和日期
-        base_name = os.path.splitext(filename)[0]
-        title = base_name
-        publish_date = extract_date_from_filename(filename)
-        
-        # 如果文本开头有明显的标题（单独一行，比较短），则使用它
-        lines = text.strip().split('\n')
-        if lines and len(lines[0]) < 100 and len(lines[0]) > 5:
-            potential_title = lines[0].strip()
-            if not potential_title.startswith('#'):
-                title = potential_title
-        
-        # 使用AI处理内容
-        print(f"  🤖 调用AI处理内容...")
-        processed_content = process_text_with_ai(text, title, publish_date)
-        
-        if not processed_content:
-            print(f"  ❌ AI处理最终失败，跳过此文件")
-            return False
-        
-        # 提取主题
-        topics = extract_key_topics(title, processed_content)
-        
-        # 生成最终的MD内容
-        md_content = f"""---
+def prepare_txt_job(txt_file_path):
+    """读取TXT文件并准备处理所需的信息，无需处理时返回None"""
+    filename = os.path.basename(txt_file_path)
+    print(f"📝 处理: {filename}")
+    
+    # 读取TXT文件
+    text = read_txt_file(txt_file_path)
+    if not text:
+        print(f"  ❌ TXT读取失败")
+        return None
+    
+    # 本地完成去口头语、空白标点整理和繁转简，减少发送的token
+    text = NORMALIZER.normalize_and_report(text)
+    
+    # 文本太短，跳过
+    if len(text.strip()) < 100:
+        print(f"  ⚠️ 文本内容过短（少于100字符），跳过")
+        return None
+    
+    # 从文件名提取标题和日期
+    base_name = os.path.splitext(filename)[0]
+    title = base_name
+    publish_date = extract_date_from_filename(filename)
+    
+    # 如果文本开头有明显的标题（单独一行，比较短），则使用它
+    lines = text.strip().split('\n')
+    if lines and len(lines[0]) < 100 and len(lines[0]) > 5:
+        potential_title = lines[0].strip()
+        if not potential_title.startswith('#'):
+            title = potential_title
+    
+    # 输出路径（流式模式下先写入 .md.part，完成后再重命名）
+    md_filename = f"{os.path.splitext(filename)[0]}.md"
+    md_file_path = os.path.join(MD_FOLDER, md_filename)
+    part_file_path = f"{md_file_path}.part" if STREAM_MODE else None
+    
+    print(f"  🤖 调用AI处理内容{'（流式）' if STREAM_MODE else ''}...")
+    return {
+        'text': text,
+        'title': title,
+        'publish_date': publish_date,
+        'md_file_path': md_file_path,
+        'part_file_path': part_file_path
+    }
+
+def save_txt_result(job, processed_content):
+    """根据AI处理结果生成并保存MD文件"""
+    if not processed_content:
+        print(f"  ❌ AI处理最终失败，跳过此文件")
+        return False
+    
+    title = job['title']
+    publish_date = job['publish_date']
+    
+    # 提取主题
+    topics = extract_key_topics(title, processed_content)
+    
+    # 生成最终的MD内容
+    md_content = f"""---
 title: {title}
 publish_date: {publish_date}
 topics: {', '.join(topics)}
@@ -431,16 +325,46 @@ processed_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 *本文由LinkAI智能助手整理发布，内容仅供参考*
 """
+    
+    # 保存MD文件
+    if job['part_file_path']:
+        linkai_client.finalize_part_file(job['part_file_path'], job['md_file_path'], md_content)
+    else:
+        with open(job['md_file_path'], 'w', encoding='utf-8') as f:
+            f.write(md_content)
+    
+    print(f"  ✅ 完成: {len(processed_content)}字符")
+    return True
+
+def process_single_txt_file(txt_file_path):
+    """处理单个TXT文件"""
+    try:
+        job = prepare_txt_job(txt_file_path)
+        if not job:
+            return False
         
-        # 保存MD文件
-        md_filename = f"{os.path.splitext(filename)[0]}.md"
-        md_file_path = os.path.join(MD_FOLDER, md_filename)
+        # 使用AI处理内容
+        processed_content = process_text_with_ai(job['text'], job['title'], job['publish_date'],
+                                                 stream_to=job['part_file_path'])
+        return save_txt_result(job, processed_content)
         
-        with open(md_file_path, 'w', encoding='utf-8') as f:
-            f.write(md_content)
+    except Exception as e:
+        print(f"  ❌ 处理出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+async def process_single_txt_file_async(txt_file_path):
+    """处理单个TXT文件（asyncio版本：文件读写在线程中执行，API请求在事件循环中等待）"""
+    try:
+        job = await asyncio.to_thread(prepare_txt_job, txt_file_path)
+        if not job:
+            return False
         
-        print(f"  ✅ 完成: {len(processed_content)}字符")
-        return True
+        processed_content = await linkai_async.call_linkai_api_chunked_async(
+            lambda chunk, index, total: build_messages(chunk, job['title'], job['publish_date'], index, total),
+            job['text'], model=MODEL, max_tokens=CHUNK_TOKENS, stream_to=job['part_file_path'])
+        return await asyncio.to_thread(save_txt_result, job, processed_content)
         
     except Exception as e:
         print(f"  ❌ 处理出错: {e}")
@@ -448,9 +372,165 @@ processed_at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         traceback.print_exc()
         return False
 
+def plan_txt_groups(files_to_process):
+    """打包模式：读取所有文件，把短文本按 PACK_TOKENS 预算分组（长文本单独成组）
+
+    Returns:
+        job分组列表；读取失败或内容过短的文件不在其中
+    """
+    jobs = [job for job in map(prepare_txt_job, files_to_process) if job]
+    groups = plan_packs([count_tokens(job['text']) for job in jobs], max_tokens=PACK_TOKENS)
+    return [[jobs[index] for index in group] for group in groups]
+
+def describe_group(jobs):
+    names = ', '.join(os.path.basename(job['md_file_path']) for job in jobs)
+    print(f"📦 打包 {len(jobs)} 篇短文本为一次请求: {names}")
+
+def process_txt_group(jobs):
+    """处理一组文件，返回成功数量：单篇按普通方式处理（可分片、可流式），多篇打包为一次请求"""
+    try:
+        if len(jobs) == 1:
+            job = jobs[0]
+            processed_content = process_text_with_ai(job['text'], job['title'], job['publish_date'],
+                                                     stream_to=job['part_file_path'])
+            return int(save_txt_result(job, processed_content))
+
+        describe_group(jobs)
+        results = linkai_client.call_linkai_api_packed(build_packed_messages, build_job_messages, jobs, model=MODEL)
+        return sum(save_txt_result(job, content) for job, content in zip(jobs, results))
+
+    except Exception as e:
+        print(f"  ❌ 处理出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return 0
+
+async def process_txt_group_async(jobs):
+    """处理一组文件（asyncio版本），返回成功数量"""
+    try:
+        if len(jobs) == 1:
+            job = jobs[0]
+            processed_content = await linkai_async.call_linkai_api_chunked_async(
+                lambda chunk, index, total: build_messages(chunk, job['title'], job['publish_date'], index, total),
+                job['text'], model=MODEL, max_tokens=CHUNK_TOKENS, stream_to=job['part_file_path'])
+            return int(await asyncio.to_thread(save_txt_result, job, processed_content))
+
+        describe_group(jobs)
+        results = await linkai_async.call_linkai_api_packed_async(
+            build_packed_messages, build_job_messages, jobs, model=MODEL)
+        return sum([await asyncio.to_thread(save_txt_result, job, content)
+                    for job, content in zip(jobs, results)])
+
+    except Exception as e:
+        print(f"  ❌ 处理出错: {e}")
+        import traceback
+        traceback.print_exc()
+        return 0
+
+def process_groups_concurrently(groups, total_files, workers, start_time):
+    """打包模式下用线程池并发处理各组，同时保持最多workers个请求在进行中
+
+    Returns:
+        成功处理的文件数量
+    """
+    success_count = 0
+    done_count = 0
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_txt_group, jobs): jobs for jobs in groups}
+        
+        for future in as_completed(futures):
+            success_count += future.result()
+            done_count += len(futures[future])
+            
+            # 显示进度
+            progress = done_count / total_files * 100
+            elapsed_time = (datetime.now() - start_time).total_seconds() / 60
+            print(f"  📊 进度: {progress:.1f}% ({done_count}/{total_files}) | 用时: {elapsed_time:.1f}分钟")
+    
+    return success_count
+
+async def process_groups_async(groups, total_files, concurrency, start_time):
+    """打包模式下在单个事件循环中处理各组
+
+    Returns:
+        成功处理的文件数量
+    """
+    success_count = 0
+    done_count = 0
+    
+    async for jobs, result, error in linkai_async.as_completed_limited(
+            process_txt_group_async, groups, concurrency):
+        done_count += len(jobs)
+        if error:
+            print(f"  ❌ 处理出错: {error}")
+        else:
+            success_count += result
+        
+        # 显示进度
+        progress = done_count / total_files * 100
+        elapsed_time = (datetime.now() - start_time).total_seconds() / 60
+        print(f"  📊 进度: {progress:.1f}% ({done_count}/{total_files}) | 用时: {elapsed_time:.1f}分钟")
+    
+    return success_count
+
+def process_files_concurrently(files_to_process, workers, start_time):
+    """使用线程池并发处理文件，同时保持最多workers个请求在进行中
+    
+    Returns:
+        成功处理的文件数量
+    """
+    success_count = 0
+    done_count = 0
+    total_files = len(files_to_process)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_single_txt_file, txt_file): txt_file
+                   for txt_file in files_to_process}
+        
+        for future in as_completed(futures):
+            done_count += 1
+            try:
+                if future.result():
+                    success_count += 1
+            except Exception as e:
+                print(f"  ❌ 处理出错: {os.path.basename(futures[future])}: {e}")
+            
+            # 显示进度
+            progress = done_count / total_files * 100
+            elapsed_time = (datetime.now() - start_time).total_seconds() / 60
+            print(f"  📊 进度: {progress:.1f}% ({done_count}/{total_files}) | 用时: {elapsed_time:.1f}分钟")
+    
+    return success_count
+
+async def process_files_async(files_to_process, concurrency, start_time):
+    """在单个事件循环中处理文件，同时保持最多concurrency个文件在处理中
+    
+    Returns:
+        成功处理的文件数量
+    """
+    success_count = 0
+    done_count = 0
+    total_files = len(files_to_process)
+    
+    async for txt_file, result, error in linkai_async.as_completed_limited(
+            process_single_txt_file_async, files_to_process, concurrency):
+        done_count += 1
+        if error:
+            print(f"  ❌ 处理出错: {os.path.basename(txt_file)}: {error}")
+        elif result:
+            success_count += 1
+        
+        # 显示进度
+        progress = done_count / total_files * 100
+        elapsed_time = (datetime.now() - start_time).total_seconds() / 60
+        print(f"  📊 进度: {progress:.1f}% ({done_count}/{total_files}) | 用时: {elapsed_time:.1f}分钟")
+    
+    return success_count
+
 def main():
     """主函数"""
-    global TXT_FOLDER, MD_FOLDER, current_api_key
+    global TXT_FOLDER, MD_FOLDER, STREAM_MODE, CHUNK_TOKENS, PACK_TOKENS, NORMALIZER
     
     parser = argparse.ArgumentParser(description='TXT到Markdown批量处理器')
     parser.add_argument('count', type=int, nargs='?', default=0, 
@@ -459,19 +539,61 @@ def main():
                        help=f'输入目录（默认：{TXT_FOLDER}）')
     parser.add_argument('--output', type=str, default=MD_FOLDER,
                        help=f'输出目录（默认：{MD_FOLDER}）')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'并发处理的文件数量（默认：{DEFAULT_WORKERS}，即按批次串行处理）')
+    parser.add_argument('--per-key', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                       help=f'每个API密钥同时在途的最大请求数（默认：{DEFAULT_MAX_IN_FLIGHT}）')
+    parser.add_argument('--rps', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                       help=f'每秒请求数上限（默认：{DEFAULT_REQUESTS_PER_SECOND}，限流时自动降速）')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TOKENS_PER_MINUTE,
+                       help=f'每分钟token上限（默认：{DEFAULT_TOKENS_PER_MINUTE}，0表示不限制）')
+    parser.add_argument('--normalize', type=parse_steps, default=(), metavar='STEPS',
+                       help=f'发送前的文本预处理步骤，逗号分隔（{",".join(ALL_STEPS)}，all 表示全部；默认不预处理）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不使用响应缓存，所有请求都调用API')
+    parser.add_argument('--stream', action='store_true',
+                       help='流式模式：边生成边写入 .md.part 文件，使用空闲超时代替总超时')
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                       help=f'使用asyncio执行（需要aiohttp），--workers 为同时处理的文件数，默认 {linkai_async.DEFAULT_ASYNC_CONCURRENCY}')
+    parser.add_argument('--chunk-tokens', type=int, default=CHUNK_TOKENS,
+                       help=f'单次请求的输入token上限，超过时按段落分片并发处理（默认：{CHUNK_TOKENS}）')
+    parser.add_argument('--pack-tokens', type=int, nargs='?', const=DEFAULT_PACK_TOKENS, default=0,
+                       help=f'把多篇短文本打包成一次请求，每个请求的输入token预算（只写 --pack-tokens 时为 {DEFAULT_PACK_TOKENS}，默认不打包）')
+    parser.add_argument('--report', type=str, default=None,
+                       help='运行报告路径前缀，生成 <前缀>.json 和 <前缀>.csv（默认：linkai_reports/batch_txt_to_md_时间）')
+    parser.add_argument('--credit-rates', type=str, default=None,
+                       help='积分单价文件（默认：credit_rates.json，不存在时只统计token）')
+    parser.add_argument('--hedge', type=float, nargs='?', const=DEFAULT_MAX_EXTRA_FRACTION, default=0,
+                       help=f'对冲请求：超过p95耗时未返回时用其他密钥重发，参数为对冲请求占比上限（只写 --hedge 时为 {DEFAULT_MAX_EXTRA_FRACTION}，默认关闭）')
     
     args = parser.parse_args()
+    workers = max(1, args.workers)
+    if args.async_mode and not linkai_async.AIOHTTP_AVAILABLE:
+        print("⚠️  未安装aiohttp（pip install aiohttp），改用同步模式")
+        args.async_mode = False
+    if args.async_mode and workers == 1:
+        workers = linkai_async.DEFAULT_ASYNC_CONCURRENCY
     process_count = args.count
     
     # 更新文件夹路径
     TXT_FOLDER = args.input
     MD_FOLDER = args.output
     
-    # 初始化API密钥
-    current_api_key = get_next_api_key()
-    if not current_api_key:
+    # 初始化API密钥、连接池和速率限制
+    linkai_client.configure_rate_limit(args.rps, args.tpm)
+    linkai_client.configure_cache(enabled=not args.no_cache)
+    linkai_client.configure_hedging(args.hedge)
+    linkai_client.configure_telemetry(args.credit_rates)
+    STREAM_MODE = args.stream
+    CHUNK_TOKENS = max(500, args.chunk_tokens)
+    PACK_TOKENS = max(0, args.pack_tokens)
+    NORMALIZER = TextNormalizer(args.normalize)
+    key_count = linkai_client.init_key_pool(max_in_flight=args.per_key)
+    if not key_count:
         print("❌ 错误：没有可用的API密钥，请检查 api_keys.txt 文件")
         return
+    # 长文本分片可能同时占满所有密钥的并发额度，连接池不小于密钥池容量
+    linkai_client.configure_pool(max(workers, linkai_client.key_pool.capacity))
     
     start_time = datetime.now()
     print("=== TXT到Markdown批量处理器 ===")
@@ -520,10 +642,20 @@ def main():
         files_to_process = unprocessed_files[:process_count]
         print(f"🎯 限量处理模式：处理前 {len(files_to_process)} 个文件")
     
-    # 预估时间
-    estimated_time = len(files_to_process) * 20 / 60
+    # 打包模式：先读取所有文件，把短文本分组
+    groups = None
+    api_calls = len(files_to_process)
+    if PACK_TOKENS:
+        print(f"\n📦 打包模式：短文本按每请求 {PACK_TOKENS} token 合并")
+        groups = plan_txt_groups(files_to_process)
+        api_calls = len(groups)
+        packed_files = sum(len(jobs) for jobs in groups if len(jobs) > 1)
+        print(f"📦 {packed_files} 篇短文本合并为 {sum(1 for jobs in groups if len(jobs) > 1)} 个请求")
+    
+    # 预估时间（单次调用耗时取最近一次运行报告的中位延迟）
+    estimated_time = api_calls * estimate_seconds_per_call() / 60 / workers
     print(f"预估处理时间：约 {estimated_time:.1f} 分钟")
-    print(f"API调用次数：{len(files_to_process)} 次")
+    print(f"API调用次数：{api_calls} 次")
     
     # 开始处理
     print(f"\n🚀 开始处理...")
@@ -531,30 +663,36 @@ def main():
     success_count = 0
     total_files = len(files_to_process)
     
-    for i in range(0, total_files, BATCH_SIZE):
-        batch_files = files_to_process[i:i+BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        total_batches = (total_files + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        print(f"\n🔄 批次 {batch_num}/{total_batches} (文件 {i+1}-{min(i+BATCH_SIZE, total_files)})")
-        
-        for j, txt_file in enumerate(batch_files):
-            if process_single_txt_file(txt_file):
-                success_count += 1
+    if groups is not None and args.async_mode:
+        print(f"⚡ asyncio模式：同时进行最多 {workers} 个请求")
+        success_count = linkai_async.run(process_groups_async(groups, total_files, workers, start_time))
+    elif groups is not None:
+        success_count = process_groups_concurrently(groups, total_files, workers, start_time)
+    elif args.async_mode:
+        print(f"⚡ asyncio模式：同时处理最多 {workers} 个文件")
+        success_count = linkai_async.run(process_files_async(files_to_process, workers, start_time))
+    elif workers > 1:
+        print(f"⚡ 并发模式：同时处理 {workers} 个文件")
+        key_capacity = key_count * max(1, args.per_key)
+        if workers > key_capacity:
+            print(f"💡 提示：{key_count} 个密钥最多支持 {key_capacity} 个并发请求，多出的任务会排队等待")
+        success_count = process_files_concurrently(files_to_process, workers, start_time)
+    else:
+        for i in range(0, total_files, BATCH_SIZE):
+            batch_files = files_to_process[i:i+BATCH_SIZE]
+            batch_num = i // BATCH_SIZE + 1
+            total_batches = (total_files + BATCH_SIZE - 1) // BATCH_SIZE
             
-            # 请求间隔
-            if j < len(batch_files) - 1:
-                time.sleep(DELAY_BETWEEN_REQUESTS)
-        
-        # 显示进度
-        progress = (i + len(batch_files)) / total_files * 100
-        elapsed_time = (datetime.now() - start_time).total_seconds() / 60
-        print(f"  📊 进度: {progress:.1f}% ({i + len(batch_files)}/{total_files}) | 用时: {elapsed_time:.1f}分钟")
-        
-        # 批次间隔
-        if i + BATCH_SIZE < total_files:
-            print(f"  💤 休息 {BATCH_DELAY} 秒...")
-            time.sleep(BATCH_DELAY)
+            print(f"\n🔄 批次 {batch_num}/{total_batches} (文件 {i+1}-{min(i+BATCH_SIZE, total_files)})")
+            
+            for j, txt_file in enumerate(batch_files):
+                if process_single_txt_file(txt_file):
+                    success_count += 1
+            
+            # 显示进度
+            progress = (i + len(batch_files)) / total_files * 100
+            elapsed_time = (datetime.now() - start_time).total_seconds() / 60
+            print(f"  📊 进度: {progress:.1f}% ({i + len(batch_files)}/{total_files}) | 用时: {elapsed_time:.1f}分钟")
     
     end_time = datetime.now()
     total_time = (end_time - start_time).total_seconds() / 60
@@ -565,14 +703,15 @@ def main():
     print(f"⏱️ 总用时: {total_time:.1f} 分钟")
     
     # 显示重试统计
-    if retry_stats['total_retries'] > 0:
-        print(f"\n📊 重试统计:")
-        print(f"  🔄 总重试次数: {retry_stats['total_retries']}")
-        print(f"  ⏰ 超时错误: {retry_stats['timeout_errors']}")
-        print(f"  🌐 连接错误: {retry_stats['connection_errors']}")
-        print(f"  ❓ 其他错误: {retry_stats['other_errors']}")
-    else:
-        print(f"🎉 所有API调用一次成功，无需重试！")
+    linkai_client.print_retry_stats()
+    linkai_client.print_http_stats()
+    linkai_client.rate_limiter.print_stats()
+    linkai_client.hedge_policy.print_stats()
+    NORMALIZER.print_stats()
+    if linkai_client.response_cache:
+        linkai_client.response_cache.print_stats()
+    linkai_client.get_key_pool().print_stats()
+    linkai_client.write_run_report("batch_txt_to_md", args.report)
     
     print(f"\n📁 输出目录: {MD_FOLDER}")
     print(f"结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合集文章随机读取
+merge_md_files.py 在每个合集旁边写一个偏移表（合集文件名.offsets.json），记录每篇文章的字节偏移、长度、标题、日期和来源文件；
+读取时按偏移表对 mmap 后的合集直接切片，取一篇文章不需要扫描整个合集
+
+功能特点：
+- 偏移表：每篇文章从 "## 序号. 文件名" 小标题开始、到文章末尾的分隔线之前结束，记录目录中的序号（空文章或读取失败被跳过时序号不连续）
+- O(1)读取：按目录序号或来源文件名查表后直接切片，只有被访问的页会从磁盘读入
+- 一致性检查：偏移表记录合集的字节数，合集被改动或重新生成后与偏移表不符时报错
+- 原子写入：偏移表先写 .part 再重命名
+
+使用方法：
+    from bundle_reader import BundleReader
+    with BundleReader("合集_2019-10-31_至_2019-12-27_22篇.md") as bundle:
+        len(bundle), bundle.articles[0]['index'], bundle.articles[0]['title']
+        text = bundle.article(3)                    # 第3篇（与目录中的序号一致）
+        text = bundle.article_by_source("301_2019-12-03_亲子共读中要不要提问？怎样提问呢？.md")
+
+    python bundle_reader.py 合集_xxx.md             # 列出文章
+    python bundle_reader.py 合集_xxx.md 3           # 打印第3篇
+"""
+
+import os
+import json
+import mmap
+import argparse
+
+OFFSETS_SUFFIX = '.offsets.json'
+OFFSETS_VERSION = 2  # 偏移表格式变化时递增
+
+def offsets_path(bundle_path):
+    """合集对应的偏移表路径"""
+    return bundle_path + OFFSETS_SUFFIX
+
+def save_offsets(bundle_path, articles, size):
+    """
+    原子写入偏移表
+
+    Args:
+        articles: [{'index'（目录序号）, 'title', 'date', 'source', 'offset', 'length'}]，按合集中的顺序
+        size: 合集的字节数
+    """
+    path = offsets_path(bundle_path)
+    part_path = f"{path}.part"
+    with open(part_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': OFFSETS_VERSION,
+            'bundle': os.path.basename(bundle_path),
+            'size': size,
+            'articles': articles,
+        }, f, ensure_ascii=False, indent=1)
+    os.replace(part_path, path)
+
+def load_offsets(bundle_path):
+    """
+    读取偏移表
+
+    Raises:
+        OSError: 偏移表不存在
+        ValueError: 偏移表格式或版本不符
+    """
+    with open(offsets_path(bundle_path), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or data.get('version') != OFFSETS_VERSION:
+        raise ValueError(f"偏移表版本不符: {offsets_path(bundle_path)}（请重新运行 merge_md_files.py -e --full）")
+    return data
+
+def has_current_offsets(bundle_path):
+    """合集旁边是否有当前版本的偏移表（没有或版本不符时需要重新生成合集）"""
+    try:
+        load_offsets(bundle_path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+class BundleReader:
+    """按偏移表从合集中读取单篇文章"""
+
+    def __init__(self, bundle_path):
+        """
+        Raises:
+            OSError: 合集或偏移表不存在
+            ValueError: 偏移表与合集不一致（合集在生成后被改动）
+        """
+        self.path = bundle_path
+        data = load_offsets(bundle_path)
+        self.articles = data['articles']
+        self._by_index = {article['index']: article for article in self.articles}
+        self._by_source = {article['source']: article for article in self.articles}
+
+        self._file = open(bundle_path, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size != data['size']:
+                raise ValueError(f"合集大小 {size} 与偏移表记录的 {data['size']} 不符: {bundle_path}")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __len__(self):
+        return len(self.articles)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def article_bytes(self, index):
+        """
+        目录序号为 index 的文章的原始字节
+
+        Raises:
+            IndexError: 合集中没有该序号的文章（序号不存在，或该文章合并时被跳过）
+        """
+        article = self._by_index.get(index)
+        if article is None:
+            raise IndexError(f"合集中没有序号为 {index} 的文章（共 {len(self.articles)} 篇）")
+        return self._mmap[article['offset']:article['offset'] + article['length']]
+
+    def article(self, index):
+        """目录序号为 index 的文章的文本（从 "## 序号. 文件名" 小标题开始）"""
+        return self.article_bytes(index).decode('utf-8')
+
+    def article_by_source(self, source):
+        """
+        按来源文件名读取文章
+
+        Raises:
+            KeyError: 合集中没有该文件
+        """
+        return self.article(self._by_source[source]['index'])
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='按偏移表读取合集中的单篇文章')
+    parser.add_argument('bundle', help='合集文件路径')
+    parser.add_argument('index', type=int, nargs='?', help='文章的目录序号（不指定时列出全部文章）')
+
+    args = parser.parse_args()
+    try:
+        bundle = BundleReader(args.bundle)
+    except (OSError, ValueError) as e:
+        print(f"❌ 无法打开合集: {e}")
+        return
+
+    with bundle:
+        if args.index is None:
+            print(f"📚 {os.path.basename(args.bundle)}: {len(bundle)} 篇文章")
+            for article in bundle.articles:
+                print(f"{article['index']:>4}. [{article['date'] or '未知日期'}] {article['title']}  "
+                      f"({article['source']}, {article['length']} 字节 @ {article['offset']})")
+        else:
+            try:
+                print(bundle.article(args.index))
+            except IndexError as e:
+                print(f"❌ {e}")
+
+if __name__ == "__main__":
+    main()
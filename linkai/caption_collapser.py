@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动字幕去重
+YouTube自动字幕是"滚动"显示的：每句话会在相邻的两三条字幕里重复出现，直接拼接会让发给LLM的token接近翻倍
+
+只在有滚动证据时删除内容，普通字幕中正常重复的词句不受影响：
+- 前缀重复：新的一行以上一行（原文或去重后的输出）的全部内容开头，删掉这部分；与上一行完全相同时整行删除
+- 时间重叠：字幕条目的时间轴与上一条重叠时（见 collapse_rolling_cues），新条目开头与上一条输出末尾重叠的部分也删除
+
+功能特点：
+- 按词比较：英文等按空白切词，中日韩文字按单字，比较时忽略大小写和词尾标点
+- 最短重叠：部分重叠少于 min_overlap 个词时视为巧合，不做删除（与上一行完全相同时除外）
+
+使用方法：
+    from caption_collapser import collapse_caption_text, collapse_and_report, collapse_rolling_cues, collapse_cues_and_report
+    text = collapse_caption_text(raw_text)              # 按行去重（只用前缀重复规则）
+    text, before, after = collapse_and_report(raw_text)  # 同时打印token减少量
+    lines = collapse_rolling_cues(cues)                  # 字幕条目（subtitle_parser.Cue）去重，可利用时间轴
+    text, before, after = collapse_cues_and_report(cues)  # 按字幕条目去重并打印token减少量（有时间轴时优先使用）
+"""
+
+import re
+
+from token_counter import count_tokens
+
+MIN_OVERLAP_UNITS = 3  # 部分重叠至少多少个词才删除
+
+_CJK_CHARS = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af'  # 假名、汉字、韩文按单字比较
+_UNIT_PATTERN = re.compile(rf'[{_CJK_CHARS}]|[^\s{_CJK_CHARS}]+')
+_PUNCTUATION = ',.!?;:，。！？；：、…"\'“”‘’()（）-'
+
+def _units(line):
+    """把一行切成 (比较用的词, 在原行中的起始位置)"""
+    return [(match.group().lower().strip(_PUNCTUATION) or match.group(), match.start())
+            for match in _UNIT_PATTERN.finditer(line)]
+
+def _starts_with(words, prefix):
+    """words 是否以 prefix 的全部词开头"""
+    return bool(prefix) and words[:len(prefix)] == prefix
+
+def _overlap(tail, words, min_overlap):
+    """tail 的后缀与 words 的前缀最长重叠的词数，不足 min_overlap 时返回0"""
+    for size in range(min(len(tail), len(words)), min_overlap - 1, -1):
+        if tail[-size:] == words[:size]:
+            return size
+    return 0
+
+def _repeated_prefix(words, previous_line, previous_output, min_overlap):
+    """
+    新的一行开头重复了上一行全部内容时，返回要删掉的词数
+
+    与上一行原文完全相同时整行删除（不论长短）；只是以上一行开头时，上一行至少要有 min_overlap 个词
+    """
+    if words == previous_line:
+        return len(words)
+    skip = 0
+    for prefix in (previous_line, previous_output):
+        if len(prefix) >= min_overlap and _starts_with(words, prefix):
+            skip = max(skip, len(prefix))
+    return skip
+
+def _timestamp_seconds(timestamp):
+    """时间轴文本（"00:01:02.500"、"01:02,500"）转换为秒数，无法解析时为None"""
+    try:
+        seconds = 0.0
+        for part in timestamp.replace(',', '.').split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+def _collapse(items, min_overlap):
+    """
+    items: [(行文本, 是否与上一条时间重叠)]
+
+    Returns:
+        去重后的行列表
+    """
+    output = []
+    previous_line = []  # 上一行原文的词
+    previous_output = []  # 上一行去重后输出的词
+
+    for line, overlapping in items:
+        line = line.strip()
+        if not line:
+            continue
+        units = _units(line)
+        words = [word for word, _ in units]
+
+        skip = _repeated_prefix(words, previous_line, previous_output, min_overlap)
+        if overlapping and not skip:
+            skip = _overlap(previous_output, words, min_overlap)
+        previous_line = words
+
+        if skip >= len(words):
+            continue
+        if skip:
+            line = line[units[skip][1]:]
+            words = words[skip:]
+
+        output.append(line)
+        previous_output = words
+
+    return output
+
+def collapse_rolling_captions(lines, min_overlap=MIN_OVERLAP_UNITS):
+    """
+    去掉滚动字幕中重复上一行的内容（没有时间轴，只按前缀重复判断）
+
+    Args:
+        lines: 按时间顺序的字幕文本行
+        min_overlap: 部分重复至少多少个词才删除
+
+    Returns:
+        去重后的行列表（保留原有的行内文字，只删掉重复的部分）
+    """
+    return _collapse(((line, False) for line in lines), min_overlap)
+
+def collapse_rolling_cues(cues, min_overlap=MIN_OVERLAP_UNITS):
+    """
+    按字幕条目去重：除前缀重复外，时间轴与上一条重叠的条目还会删掉与上一条输出末尾重叠的部分
+
+    Args:
+        cues: subtitle_parser.Cue 列表（多行文本合并为一行）
+
+    Returns:
+        去重后的行列表（每个保留的条目一行）
+    """
+    items = []
+    previous_end = None
+    for cue in cues:
+        start, end = _timestamp_seconds(cue.start), _timestamp_seconds(cue.end)
+        overlapping = start is not None and previous_end is not None and start < previous_end
+        items.append((' '.join(cue.lines), overlapping))
+        previous_end = end
+    return _collapse(items, min_overlap)
+
+def collapse_caption_text(text, min_overlap=MIN_OVERLAP_UNITS):
+    """按行去重整段字幕文本"""
+    return '\n'.join(collapse_rolling_captions(text.split('\n'), min_overlap))
+
+def _report(text, collapsed):
+    """打印去重前后的token数，返回 (去重前token数, 去重后token数)"""
+    before, after = count_tokens(text), count_tokens(collapsed)
+    if after < before:
+        print(f"  🧹 滚动字幕去重: {before} → {after} token（减少 {(before - after) / before * 100:.1f}%）")
+    return before, after
+
+def collapse_and_report(text, min_overlap=MIN_OVERLAP_UNITS):
+    """
+    按行去重并打印token减少量
+
+    Returns:
+        (去重后的文本, 去重前token数, 去重后token数)
+    """
+    collapsed = collapse_caption_text(text, min_overlap)
+    return (collapsed, *_report(text, collapsed))
+
+def collapse_cues_and_report(cues, min_overlap=MIN_OVERLAP_UNITS):
+    """
+    按字幕条目去重（见 collapse_rolling_cues）并打印token减少量
+
+    Returns:
+        (去重后的文本（每个保留的条目一行）, 去重前token数, 去重后token数)
+    """
+    text = '\n'.join(' '.join(cue.lines) for cue in cues if cue.lines)
+    collapsed = '\n'.join(collapse_rolling_cues(cues, min_overlap))
+    return (collapsed, *_report(text, collapsed))
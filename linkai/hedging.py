@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 对冲请求策略
+少数请求会卡到接近超时才返回，拖长整批处理的总耗时；对冲请求在原请求耗时超过历史p95后，
+用另一个密钥再发一份相同的请求，谁先成功返回就用谁的结果
+
+功能特点：
+- 动态阈值：按最近成功请求的耗时计算p95，样本不足 MIN_SAMPLES 时不对冲
+- 额外请求上限：对冲请求数不超过主请求数的 max_extra_fraction，避免放大负载和积分消耗
+- 只对非流式请求生效：流式请求边生成边写入 .md.part，无法同时接收两份
+- 统计：对冲次数、对冲胜出次数、因预算或没有空闲密钥而放弃的次数
+
+使用方法：
+    policy = HedgePolicy(max_extra_fraction=0.05)
+    delay = policy.hedge_delay()          # None 表示本次不对冲
+    if delay is not None and not done_within(delay) and policy.try_start_hedge():
+        ...  # 用另一个密钥发出对冲请求，取先成功的结果
+        policy.record_winner(hedge_won=True)
+    policy.record_latency(seconds)         # 每个成功请求的耗时
+"""
+
+import math
+import threading
+from collections import deque
+
+# 对冲配置
+DEFAULT_MAX_EXTRA_FRACTION = 0.05  # 对冲请求数占主请求数的比例上限
+HEDGE_PERCENTILE = 95  # 超过该百分位耗时仍未返回时发出对冲请求
+MIN_SAMPLES = 20  # 至少积累多少个成功请求的耗时后才开始对冲
+LATENCY_WINDOW = 500  # 计算百分位时使用最近多少个样本
+MIN_HEDGE_DELAY = 5.0  # 对冲等待时间下限（秒），避免对本来就很快的请求做对冲
+
+class HedgePolicy:
+    """对冲请求的触发阈值、额外请求预算与统计（线程安全）"""
+
+    def __init__(self, max_extra_fraction=DEFAULT_MAX_EXTRA_FRACTION, percentile=HEDGE_PERCENTILE,
+                 min_samples=MIN_SAMPLES, min_delay=MIN_HEDGE_DELAY):
+        """
+        Args:
+            max_extra_fraction: 对冲请求数 / 主请求数 的上限，0表示关闭对冲
+            percentile: 触发对冲的耗时百分位
+            min_samples: 开始对冲前需要的最少耗时样本数
+            min_delay: 对冲等待时间下限（秒）
+        """
+        self.max_extra_fraction = max(0.0, float(max_extra_fraction))
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'primary_requests': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'primary_wins': 0,
+            'skipped_budget': 0,
+            'skipped_no_key': 0
+        }
+
+    @property
+    def enabled(self):
+        return self.max_extra_fraction > 0
+
+    def record_latency(self, seconds):
+        """记录一个成功请求的耗时"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self):
+        """
+        记一次主请求，并返回它在多少秒后仍未返回时应发出对冲请求
+
+        Returns:
+            秒数；对冲关闭或样本不足时返回None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.stats['primary_requests'] += 1
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        rank = max(1, math.ceil(self.percentile / 100 * len(latencies)))
+        return max(self.min_delay, latencies[rank - 1])
+
+    def try_start_hedge(self):
+        """在额外请求预算内占用一次对冲名额，超出预算时返回False"""
+        with self._lock:
+            if self.stats['hedges'] + 1 > self.stats['primary_requests'] * self.max_extra_fraction:
+                self.stats['skipped_budget'] += 1
+                return False
+            self.stats['hedges'] += 1
+            return True
+
+    def cancel_hedge(self):
+        """占用名额后没能发出对冲请求（没有空闲密钥），归还名额"""
+        with self._lock:
+            self.stats['hedges'] -= 1
+            self.stats['skipped_no_key'] += 1
+
+    def record_winner(self, hedge_won):
+        """记录发出对冲后哪一方先成功返回"""
+        with self._lock:
+            self.stats['hedge_wins' if hedge_won else 'primary_wins'] += 1
+
+    def print_stats(self):
+        """打印对冲统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        if not self.enabled or not stats['primary_requests']:
+            return
+
+        print(f"\n🪁 对冲请求统计:")
+        print(f"  📨 主请求: {stats['primary_requests']} 次")
+        print(f"  🪁 发出对冲: {stats['hedges']} 次（{stats['hedges'] / stats['primary_requests'] * 100:.1f}%，"
+              f"上限 {self.max_extra_fraction * 100:.1f}%）")
+        if stats['hedges']:
+            print(f"  🏁 对冲胜出: {stats['hedge_wins']} 次 | 原请求胜出: {stats['primary_wins']} 次")
+        if stats['skipped_budget'] or stats['skipped_no_key']:
+            print(f"  ⏭️ 放弃对冲: 超出预算 {stats['skipped_budget']} 次，没有空闲密钥 {stats['skipped_no_key']} 次")
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API asyncio执行路径
+batch_txt_to_md.py、batch_vtt_to_md.py、batch_md_processor.py 的 --async 模式共用的异步客户端
+
+功能特点：
+- 单进程高并发：基于aiohttp，成百上千个请求可以同时在事件循环中等待，不再占用线程
+- 与同步路径一致：复用 linkai_client 的密钥池、速率限制器、响应缓存、重试判定和统计
+- 非阻塞限速：通过 rate_limiter.reserve() 预约后 asyncio.sleep，不阻塞事件循环
+- 非阻塞取密钥：通过 pool.try_acquire() 获取密钥，满载时在条件变量上等待其他请求归还；与密钥文件的定期同步在线程中执行
+- 对冲请求：与同步路径共用 linkai_client.hedge_policy，超过p95耗时的请求用另一个密钥再发一份
+- 文件读写交给线程：缓存读写、流式追加写入都通过 asyncio.to_thread 执行
+- 可选依赖：未安装aiohttp时 AIOHTTP_AVAILABLE 为False，处理器会提示并回退到同步模式
+
+使用方法：
+    import linkai_async
+    async def main():
+        content = await linkai_async.call_linkai_api_async(messages, model="LinkAI-4.1-nano")
+        async for item, result, error in linkai_async.as_completed_limited(handle, items, limit=100):
+            ...
+    linkai_async.run(main())   # 结束时自动关闭连接
+"""
+
+import time
+import asyncio
+
+import requests
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+import linkai_client
+from linkai_client import (
+    API_TIMEOUT, CONNECT_TIMEOUT, STREAM_IDLE_TIMEOUT, MAX_INPUT_TOKENS,
+    ATTEMPT_SUCCESS, ATTEMPT_FAIL, SSE_DONE, StreamIdleTimeout, ChatResult,
+    build_request_body, handle_result, handle_request_error, note_retry, is_successful_result,
+    record_retry_stat, record_call, parse_completion, parse_sse_line, discard_cached_response
+)
+from retry_policy import parse_retry_after
+from token_counter import count_message_tokens, split_text_into_chunks
+from response_cache import make_cache_key
+from request_packer import split_packed_output
+
+# 异步模式配置
+DEFAULT_ASYNC_CONCURRENCY = 100  # --async 模式下同时处理的文件数上限
+ASYNC_CONNECTION_LIMIT = 100  # aiohttp连接池上限
+KEY_WAIT_INTERVAL = 1.0  # 等待密钥时最长多久重新检查一次（兼顾其他进程新增的密钥）
+
+_session = None
+_key_condition = None
+_background_tasks = set()  # 对冲后仍在进行的落后请求，保留引用直到结束
+
+# --- 会话与连接耗时统计 ---
+
+def _build_trace_config():
+    """记录建连耗时与首字节时间，写入 linkai_client.request_timings"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+        context.connect_time = 0.0
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_start = time.perf_counter()
+
+    async def on_connection_create_end(session, context, params):
+        context.connect_time += time.perf_counter() - context.connect_start
+
+    async def on_request_end(session, context, params):
+        with linkai_client.stats_lock:
+            linkai_client.request_timings.append({
+                'connect_time': context.connect_time,
+                'ttfb': time.perf_counter() - context.start,
+                'new_connection': context.connect_time > 0,
+                'status': params.response.status
+            })
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_request_end.append(on_request_end)
+    return trace_config
+
+def get_session():
+    """获取当前事件循环共享的aiohttp会话"""
+    global _session
+
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_CONNECTION_LIMIT)
+        _session = aiohttp.ClientSession(connector=connector, trace_configs=[_build_trace_config()])
+    return _session
+
+async def close_session():
+    """关闭aiohttp会话"""
+    global _session, _key_condition
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _key_condition = None
+
+def run(coro):
+    """运行异步入口，结束后关闭会话"""
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_session()
+
+    return asyncio.run(runner())
+
+def _to_requests_error(error):
+    """把aiohttp/asyncio异常转换为requests异常，以便复用 handle_request_error 的判定"""
+    if isinstance(error, (StreamIdleTimeout, requests.exceptions.RequestException)):
+        return error
+    if isinstance(error, asyncio.TimeoutError):
+        return requests.exceptions.Timeout(str(error))
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return requests.exceptions.ConnectionError(str(error))
+    return error
+
+# --- 密钥获取 ---
+
+def _get_key_condition():
+    global _key_condition
+
+    if _key_condition is None:
+        _key_condition = asyncio.Condition()
+    return _key_condition
+
+async def acquire_key(pool):
+    """获取一个密钥，所有密钥都满载时等待归还；没有任何可用密钥时返回None"""
+    condition = _get_key_condition()
+    async with condition:
+        while True:
+            if pool.refresh_due():
+                # 同步密钥文件要加跨进程文件锁并读文件，放到线程中执行
+                await asyncio.to_thread(pool.refresh)
+            api_key = pool.try_acquire(refresh=False)
+            if api_key is not None or not len(pool):
+                return api_key
+            try:
+                await asyncio.wait_for(condition.wait(), KEY_WAIT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+async def notify_key_waiters():
+    """密钥被归还或废弃后唤醒等待中的请求"""
+    condition = _get_key_condition()
+    async with condition:
+        condition.notify_all()
+
+# --- 请求 ---
+
+def _headers(api_key):
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+async def request_completion_async(body, api_key):
+    """
+    发送非流式请求
+
+    Returns:
+        ChatResult
+    """
+    timeout = aiohttp.ClientTimeout(total=API_TIMEOUT)
+    async with get_session().post(linkai_client.CHAT_URL, json=body, headers=_headers(api_key),
+                                  timeout=timeout) as response:
+        if response.status != 200:
+            return await _error_result(response)
+        return parse_completion(await response.json(content_type=None))
+
+async def _error_result(response):
+    """非200响应的ChatResult"""
+    return ChatResult(response.status, None, await response.text(),
+                      parse_retry_after(response.headers.get('Retry-After')), None)
+
+def _append_piece(f, piece):
+    f.write(piece)
+    f.flush()
+
+async def stream_chat_to_file_async(body, api_key, part_path, idle_timeout=STREAM_IDLE_TIMEOUT):
+    """
+    发送流式请求，把SSE返回的内容块逐个追加写入part_path（写入在线程中执行）
+
+    两次数据之间超过idle_timeout秒没有新内容时抛出StreamIdleTimeout
+
+    Returns:
+        ChatResult（流式响应不带usage）
+    """
+    stream_body = dict(body, stream=True)
+    timeout = aiohttp.ClientTimeout(total=None, connect=CONNECT_TIMEOUT, sock_read=idle_timeout)
+    async with get_session().post(linkai_client.CHAT_URL, json=stream_body, headers=_headers(api_key),
+                                  timeout=timeout) as response:
+        if response.status != 200:
+            return await _error_result(response)
+
+        pieces = []
+        f = await asyncio.to_thread(open, part_path, 'w', encoding='utf-8')
+        try:
+            async for raw_line in response.content:
+                piece = parse_sse_line(raw_line.decode('utf-8').strip())
+                if piece is SSE_DONE:
+                    break
+                if piece:
+                    pieces.append(piece)
+                    await asyncio.to_thread(_append_piece, f, piece)
+        except asyncio.TimeoutError as e:
+            raise StreamIdleTimeout(
+                f"流式响应超过{idle_timeout}秒没有新内容，已收到 {sum(len(p) for p in pieces)} 字符") from e
+        finally:
+            await asyncio.to_thread(f.close)
+
+    return ChatResult(200, ''.join(pieces), None, None, None)
+
+async def call_linkai_api_async(messages, model, temperature=0.3, stream_to=None):
+    """调用LinkAI API的异步版本，重试退避、密钥切换、限速和缓存行为与 linkai_client.call_linkai_api 一致
+
+    Args:
+        messages: 对话消息列表
+        model: 模型名称
+        temperature: 温度
+        stream_to: 流式模式下接收内容的.part文件路径，None表示非流式
+    """
+    cache = await asyncio.to_thread(linkai_client.get_response_cache)
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(model, temperature, messages)
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            print(f"    💾 命中响应缓存，跳过API调用")
+            linkai_client.telemetry.record_cache_hit()
+            return cached
+
+    pool = linkai_client.get_key_pool()
+    request_tokens = count_message_tokens(messages)
+    body = build_request_body(messages, model, temperature)
+    retry = linkai_client.retry_policy.new_state()
+
+    attempt = 0
+    while True:
+        api_key = None
+        try:
+            note_retry(attempt)
+
+            wait = linkai_client.rate_limiter.reserve(request_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            api_key = await acquire_key(pool)
+            if not api_key:
+                print(f"    ❌ 所有API密钥都已用完积分")
+                record_retry_stat('other_errors')
+                return None
+            hedge_after = None if stream_to else linkai_client.hedge_policy.hedge_delay()
+            if hedge_after is not None:
+                api_key, result = await request_with_hedge_async(
+                    body, api_key, pool, hedge_after, model, request_tokens)
+            else:
+                api_key, result = await timed_request_async(body, api_key, pool, model, request_tokens, stream_to)
+        except Exception as e:
+            outcome, delay = handle_request_error(_to_requests_error(e), retry)
+        else:
+            if isinstance(result, ChatResult) and result.status_code == 406:
+                # 废弃密钥要加跨进程文件锁并落盘，放到线程中执行，不阻塞事件循环上的其他请求
+                outcome, delay = await asyncio.to_thread(handle_result, result, retry, pool, api_key)
+                # 密钥被废弃后可能已无可用密钥，唤醒等待者重新判断
+                await notify_key_waiters()
+            else:
+                outcome, delay = handle_result(result, retry, pool, api_key)
+
+        if outcome == ATTEMPT_SUCCESS:
+            if cache is not None:
+                await asyncio.to_thread(cache.put, cache_key, model, result.content)
+            return result.content
+        if outcome == ATTEMPT_FAIL:
+            return None
+
+        if delay:
+            await asyncio.sleep(delay)
+        attempt += 1
+
+async def timed_request_async(body, api_key, pool, model, request_tokens, stream_to=None, delay=0):
+    """发送一次请求并记入遥测，结束后归还密钥，参数与返回值同 linkai_client.timed_request"""
+    if delay:
+        await asyncio.sleep(delay)
+    started = time.perf_counter()
+    try:
+        if stream_to:
+            result = await stream_chat_to_file_async(body, api_key, stream_to)
+        else:
+            result = await request_completion_async(body, api_key)
+    except Exception as e:
+        result = _to_requests_error(e)
+    finally:
+        pool.release(api_key)
+        await notify_key_waiters()
+
+    latency = time.perf_counter() - started
+    record_call(model, api_key, result, latency, request_tokens, stream_to)
+    if not stream_to and is_successful_result(result):
+        linkai_client.hedge_policy.record_latency(latency)
+    return api_key, result
+
+async def request_with_hedge_async(body, api_key, pool, hedge_after, model, request_tokens):
+    """对冲请求的异步版本，行为与 linkai_client.request_with_hedge 一致"""
+    policy = linkai_client.hedge_policy
+    primary = asyncio.ensure_future(timed_request_async(body, api_key, pool, model, request_tokens))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    if not policy.try_start_hedge():
+        return await primary
+    hedge_key = pool.try_acquire(exclude={api_key}, refresh=False)
+    if hedge_key is None:
+        policy.cancel_hedge()
+        return await primary
+
+    print(f"    🪁 请求超过 {hedge_after:.1f} 秒未返回，使用密钥 {hedge_key[:20]}... 发出对冲请求")
+    delay = linkai_client.rate_limiter.reserve(request_tokens)
+    hedge = asyncio.ensure_future(
+        timed_request_async(body, hedge_key, pool, model, request_tokens, delay=delay))
+
+    pending = {primary, hedge}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            key, result = task.result()
+            if is_successful_result(result):
+                policy.record_winner(hedge_won=task is hedge)
+                for loser in pending:
+                    _background_tasks.add(loser)
+                    loser.add_done_callback(_background_tasks.discard)
+                return key, result
+    return primary.result()
+
+async def call_linkai_api_chunked_async(build_messages, text, model, max_tokens=MAX_INPUT_TOKENS,
+                                        temperature=0.3, stream_to=None):
+    """长文本分片调用的异步版本：各片段同时发出，按原顺序拼接
+
+    参数与 linkai_client.call_linkai_api_chunked 相同
+    """
+    chunks = split_text_into_chunks(text, max_tokens)
+    if len(chunks) == 1:
+        return await call_linkai_api_async(build_messages(text, 1, 1), model, temperature, stream_to=stream_to)
+
+    total = len(chunks)
+    print(f"    ✂️  文本过长，按段落分成 {total} 个片段并发处理")
+    results = await asyncio.gather(*(
+        call_linkai_api_async(build_messages(chunk, index, total), model, temperature)
+        for index, chunk in enumerate(chunks, 1)
+    ))
+
+    failed = [str(index) for index, result in enumerate(results, 1) if not result]
+    if failed:
+        print(f"    ❌ 第 {', '.join(failed)}/{total} 个片段处理失败")
+        return None
+    return '\n\n'.join(result.strip() for result in results)
+
+async def call_linkai_api_packed_async(build_packed_messages, build_messages, items, model, temperature=0.3):
+    """短文本打包调用的异步版本：拆分失败时各篇同时逐篇请求
+
+    参数与 linkai_client.call_linkai_api_packed 相同
+    """
+    if len(items) == 1:
+        return [await call_linkai_api_async(build_messages(items[0]), model, temperature)]
+
+    messages = build_packed_messages(items)
+    outputs = split_packed_output(await call_linkai_api_async(messages, model, temperature), len(items))
+    if outputs is not None:
+        return outputs
+
+    print(f"    ⚠️  打包回复无法按分隔符拆分，改为逐篇请求 {len(items)} 篇")
+    await asyncio.to_thread(discard_cached_response, messages, model, temperature)
+    return list(await asyncio.gather(*(
+        call_linkai_api_async(build_messages(item), model, temperature) for item in items
+    )))
+
+# --- 任务调度 ---
+
+async def as_completed_limited(func, items, limit=DEFAULT_ASYNC_CONCURRENCY):
+    """
+    以最多limit个并发执行 func(item)，按完成顺序产出 (item, 结果, 异常)
+
+    异常不会中断其他任务，由调用方决定如何报告
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_one(item):
+        async with semaphore:
+            try:
+                return item, await func(item), None
+            except Exception as e:
+                return item, None, e
+
+    for next_done in asyncio.as_completed([run_one(item) for item in items]):
+        yield await next_done
@@ -0,0 +1,763 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 公共客户端
+batch_txt_to_md.py、batch_vtt_to_md.py、batch_md_processor.py 共用的API调用模块
+
+功能特点：
+- 连接复用：所有请求共用一个keep-alive的requests.Session，连接池大小与并发数一致，
+  避免每个文件都重新进行TCP+TLS握手
+- 多密钥并行：通过 ApiKeyPool 把请求分摊到所有密钥，积分不足（406）的密钥自动废弃
+- 多进程安全：密钥文件由 ApiKeyManager 加锁并原子写入，多个处理器进程可同时运行
+- 重试策略：按错误类型分别计算重试预算，指数退避 + 完全抖动，遵守服务端的 Retry-After（见 retry_policy.py），
+  406错误自动切换密钥
+- 自适应限速：请求前经过 AdaptiveRateLimiter（RPS + TPM 令牌桶），429/5xx/超时自动降速
+- 响应缓存：相同的（模型、温度、提示词）直接从本地SQLite缓存返回，不重复付费
+- 流式模式：stream_to 指定 .part 文件时按SSE逐块接收并追加写入，使用空闲超时而非总超时，
+  生成完成后由 finalize_part_file 重命名到目标位置
+- 长文本分片：call_linkai_api_chunked 按段落把超长输入切成不超过 max_tokens 的片段，
+  各片段并发请求后按原顺序拼接（每个片段单独缓存，失败后重跑只需补齐缺失的片段）
+- 请求耗时统计：记录每个请求的建连耗时和首字节时间（TTFB），便于观察连接复用的效果
+- 请求级遥测：每次调用的token数、耗时、密钥和状态记入 telemetry，运行结束时生成JSON/CSV报告
+- 对冲请求：configure_hedging 开启后，非流式请求超过历史p95耗时仍未返回时用另一个密钥再发一份，
+  取先成功返回的结果，对冲请求数不超过主请求数的固定比例（见 hedging.py）
+- 短文本打包：call_linkai_api_packed 把多篇短输入合并成一次请求，回复按分隔符拆回各篇，
+  拆分校验失败时丢弃该缓存条目并回退为逐篇请求（见 request_packer.py）
+
+使用方法：
+    import linkai_client
+    linkai_client.configure_pool(4)   # 可选：按并发数设置连接池大小
+    linkai_client.init_key_pool()     # 加载api_keys.txt，返回可用密钥数
+    linkai_client.configure_rate_limit(requests_per_second=2, tokens_per_minute=0)
+    linkai_client.configure_cache(enabled=True)  # --no-cache 时传 False
+    linkai_client.configure_hedging(0.05)        # 可选：最多5%的请求发出对冲
+    content = linkai_client.call_linkai_api(messages, model="LinkAI-4.1-nano")
+    content = linkai_client.call_linkai_api(messages, model="LinkAI-4.1-nano", stream_to="a.md.part")
+    content = linkai_client.call_linkai_api_chunked(build_messages, long_text, model="LinkAI-4.1-nano")
+    contents = linkai_client.call_linkai_api_packed(build_packed_messages, build_messages, jobs, model="LinkAI-4.1-nano")
+    linkai_client.print_retry_stats()
+    linkai_client.print_http_stats()
+    linkai_client.write_run_report("batch_txt_to_md")  # 写入 linkai_reports/ 下的JSON/CSV报告
+"""
+
+import os
+import json
+import time
+import threading
+import requests
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from api_key_pool import ApiKeyPool, DEFAULT_MAX_IN_FLIGHT
+from api_key_manager import ApiKeyManager
+from rate_limiter import AdaptiveRateLimiter, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_TOKENS_PER_MINUTE
+from retry_policy import (
+    RetryPolicy, ERROR_LABELS, ERROR_TIMEOUT, ERROR_CONNECTION, ERROR_RATE_LIMIT, ERROR_SERVER,
+    ERROR_BAD_RESPONSE, ERROR_OTHER, classify_status, parse_retry_after
+)
+from token_counter import count_tokens, count_message_tokens, split_text_into_chunks
+from telemetry import RunTelemetry, load_credit_rates, default_report_prefix, TOKENS_FROM_USAGE, TOKENS_ESTIMATED
+from response_cache import ResponseCache, make_cache_key
+from hedging import HedgePolicy
+from request_packer import split_packed_output
+
+# LinkAI API 配置
+BASE_URL = "https://api.link-ai.tech/v1"
+CHAT_URL = f"{BASE_URL}/chat/completions"
+
+# 超时配置（重试次数和退避时间见 retry_policy.py）
+API_TIMEOUT = 120  # API超时时间（秒）
+
+# 流式模式配置
+CONNECT_TIMEOUT = 15  # 建立连接的超时时间（秒）
+STREAM_IDLE_TIMEOUT = 60  # 流式响应两次数据之间允许的最长间隔（秒）
+
+# 长文本分片配置
+MAX_INPUT_TOKENS = 6000  # 单次请求输入文本的token上限，超过时按段落分片并发处理
+
+# 连接池配置
+DEFAULT_POOL_SIZE = 10  # 默认连接池大小
+
+# 全局统计变量
+retry_stats = {
+    'total_retries': 0,
+    'timeout_errors': 0,
+    'connection_errors': 0,
+    'rate_limit_errors': 0,
+    'server_errors': 0,
+    'other_errors': 0,
+    'backoff_count': 0,
+    'backoff_seconds': 0.0,
+    'retry_after_honored': 0,
+    'budget_exhausted': 0
+}
+
+# 每类错误对应的 retry_stats 计数项
+ERROR_STAT_NAMES = {
+    ERROR_TIMEOUT: 'timeout_errors',
+    ERROR_CONNECTION: 'connection_errors',
+    ERROR_RATE_LIMIT: 'rate_limit_errors',
+    ERROR_SERVER: 'server_errors',
+}
+
+# 每个请求的耗时记录：{'connect_time': 秒, 'ttfb': 秒, 'new_connection': bool, 'status': 状态码}
+request_timings = []
+
+# 并发模式下保护共享状态的锁
+stats_lock = threading.Lock()
+session_lock = threading.Lock()
+
+key_pool = None
+rate_limiter = AdaptiveRateLimiter()
+retry_policy = RetryPolicy(stats=retry_stats, stats_lock=stats_lock)
+telemetry = RunTelemetry(credit_rates=load_credit_rates())
+hedge_policy = HedgePolicy(max_extra_fraction=0)
+response_cache = None
+_cache_enabled = True
+_session = None
+_pool_size = DEFAULT_POOL_SIZE
+_timing_local = threading.local()
+_hedge_executor = None
+
+def record_retry_stat(name):
+    """线程安全地累加重试统计"""
+    with stats_lock:
+        retry_stats[name] += 1
+
+# --- 连接耗时统计 ---
+
+class _TimedConnectionMixin:
+    """记录建立连接（含TLS握手）耗时的连接类，耗时累加到当前线程"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _timing_local.connect_time = getattr(_timing_local, 'connect_time', 0.0) + time.perf_counter() - start
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """使用带耗时统计连接类的HTTPAdapter"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+def configure_pool(size):
+    """按并发数设置连接池大小（会重建Session）"""
+    global _session, _pool_size
+
+    with session_lock:
+        _pool_size = max(1, int(size))
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_session():
+    """获取共享的keep-alive Session"""
+    global _session
+
+    with session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=_pool_size, pool_block=True)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+class StreamIdleTimeout(requests.exceptions.Timeout):
+    """流式响应超过空闲时间没有新数据"""
+
+# 一次请求的结果：状态码为200但响应格式异常时content为None；usage为响应中的token用量（没有时为None）
+ChatResult = namedtuple('ChatResult', ['status_code', 'content', 'error_text', 'retry_after', 'usage'])
+
+def error_result(response):
+    """非200响应的ChatResult"""
+    return ChatResult(response.status_code, None, response.text,
+                      parse_retry_after(response.headers.get('Retry-After')), None)
+
+def post_chat(body, api_key, timeout=API_TIMEOUT, stream=False):
+    """通过共享Session发送一次对话请求，并记录建连耗时与首字节时间"""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+    _timing_local.connect_time = 0.0
+    response = get_session().post(CHAT_URL, json=body, headers=headers, timeout=timeout, stream=stream)
+
+    connect_time = _timing_local.connect_time
+    with stats_lock:
+        request_timings.append({
+            'connect_time': connect_time,
+            'ttfb': response.elapsed.total_seconds(),
+            'new_connection': connect_time > 0,
+            'status': response.status_code
+        })
+    return response
+
+def print_http_stats():
+    """打印连接复用和请求耗时统计"""
+    with stats_lock:
+        timings = list(request_timings)
+    if not timings:
+        return
+
+    new_connections = [t for t in timings if t['new_connection']]
+    avg_ttfb = sum(t['ttfb'] for t in timings) / len(timings)
+
+    print(f"\n🌐 HTTP连接统计:")
+    print(f"  📨 请求数: {len(timings)}")
+    print(f"  🔌 新建连接: {len(new_connections)} 次（复用 {len(timings) - len(new_connections)} 次）")
+    if new_connections:
+        avg_connect = sum(t['connect_time'] for t in new_connections) / len(new_connections)
+        print(f"  🤝 平均建连耗时: {avg_connect * 1000:.0f} 毫秒")
+    print(f"  ⏱️ 平均首字节时间: {avg_ttfb:.2f} 秒")
+
+def configure_rate_limit(requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                         tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+    """设置全局速率限制预算（RPS上限和每分钟token上限，0表示不限制token）"""
+    global rate_limiter
+
+    rate_limiter = AdaptiveRateLimiter(requests_per_second, tokens_per_minute)
+    tpm_text = f"{rate_limiter.tokens_per_minute} token/分钟" if rate_limiter.tokens_per_minute else "token不限"
+    print(f"🚦 速率限制: {rate_limiter.max_rate:g} 请求/秒，{tpm_text}")
+
+def configure_cache(enabled=True):
+    """开启或关闭响应缓存"""
+    global response_cache, _cache_enabled
+
+    _cache_enabled = enabled
+    if not enabled:
+        if response_cache is not None:
+            response_cache.close()
+        response_cache = None
+        print("💾 响应缓存: 已关闭")
+
+def configure_hedging(max_extra_fraction):
+    """开启对冲请求：max_extra_fraction 为对冲请求数占主请求数的比例上限，0表示关闭"""
+    global hedge_policy
+
+    hedge_policy = HedgePolicy(max_extra_fraction=max_extra_fraction)
+    if hedge_policy.enabled:
+        print(f"🪁 对冲请求: 超过p95耗时未返回时用其他密钥重发，最多 {hedge_policy.max_extra_fraction * 100:g}% 的请求")
+
+def get_hedge_executor():
+    """对冲模式下执行各路请求的线程池（每路请求都占用一个密钥，线程数不超过密钥池容量的两倍）"""
+    global _hedge_executor
+
+    with session_lock:
+        if _hedge_executor is None:
+            workers = max(DEFAULT_POOL_SIZE, 2 * key_pool.capacity if key_pool else 0)
+            _hedge_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='linkai-hedge')
+        return _hedge_executor
+
+def get_response_cache():
+    """获取响应缓存，首次使用时打开数据库；缓存关闭或无法打开时返回None"""
+    global response_cache, _cache_enabled
+
+    with session_lock:
+        if response_cache is None and _cache_enabled:
+            try:
+                response_cache = ResponseCache()
+            except Exception as e:
+                print(f"⚠️  无法打开响应缓存，本次运行不使用缓存: {e}")
+                _cache_enabled = False
+        return response_cache
+
+def is_throttle_status(status_code):
+    """429和5xx说明服务端过载，需要降速"""
+    return status_code == 429 or status_code >= 500
+
+def request_completion(body, api_key):
+    """
+    发送非流式请求
+
+    Returns:
+        ChatResult
+    """
+    response = post_chat(body, api_key)
+    if response.status_code != 200:
+        return error_result(response)
+
+    return parse_completion(response.json())
+
+def parse_completion(result):
+    """从非流式响应JSON中取出回复内容和token用量，返回ChatResult"""
+    if 'choices' in result and len(result['choices']) > 0:
+        return ChatResult(200, result['choices'][0]['message']['content'], None, None, result.get('usage'))
+    return ChatResult(200, None, f"API响应格式异常: {result}", None, None)
+
+SSE_DONE = object()  # parse_sse_line 遇到 [DONE] 时的返回值
+
+def parse_sse_line(line):
+    """解析一行SSE数据，返回内容块、SSE_DONE或None（非数据行/空内容）"""
+    if not line or not line.startswith('data:'):
+        return None
+    data = line[len('data:'):].strip()
+    if data == '[DONE]':
+        return SSE_DONE
+
+    choices = json.loads(data).get('choices') or []
+    return (choices[0].get('delta') or {}).get('content') if choices else None
+
+def stream_chat_to_file(body, api_key, part_path, idle_timeout=STREAM_IDLE_TIMEOUT):
+    """
+    发送流式请求，把SSE返回的内容块逐个追加写入part_path
+
+    两次数据之间超过idle_timeout秒没有新内容时抛出StreamIdleTimeout，
+    已经收到的内容保留在part_path中
+
+    Returns:
+        ChatResult（流式响应不带usage，token数由遥测按内容估算）
+    """
+    stream_body = dict(body, stream=True)
+    response = post_chat(stream_body, api_key, timeout=(CONNECT_TIMEOUT, idle_timeout), stream=True)
+
+    with response:
+        if response.status_code != 200:
+            return error_result(response)
+
+        # SSE没有声明charset时requests会按ISO-8859-1解码，这里固定为UTF-8
+        response.encoding = 'utf-8'
+        pieces = []
+        with open(part_path, 'w', encoding='utf-8') as f:
+            try:
+                # chunk_size=None：每收到一个传输块就立即处理，避免默认512字节缓冲拖住小的SSE事件
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    piece = parse_sse_line(line)
+                    if piece is SSE_DONE:
+                        break
+                    if piece:
+                        pieces.append(piece)
+                        f.write(piece)
+                        f.flush()
+            except requests.exceptions.ConnectionError as e:
+                # 读取流时的超时会被requests包装成ConnectionError
+                if 'timed out' in str(e).lower():
+                    raise StreamIdleTimeout(
+                        f"流式响应超过{idle_timeout}秒没有新内容，已收到 {sum(len(p) for p in pieces)} 字符") from e
+                raise
+
+    return ChatResult(200, ''.join(pieces), None, None, None)
+
+def finalize_part_file(part_path, final_path, content):
+    """把最终内容写入.part文件，再原子重命名到目标位置"""
+    with open(part_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(part_path, final_path)
+
+# --- API密钥管理 ---
+
+def init_key_pool(max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """从api_keys.txt加载密钥池
+
+    Args:
+        max_in_flight: 每个密钥同时在途的最大请求数
+
+    Returns:
+        可用密钥数量
+    """
+    global key_pool
+
+    manager = ApiKeyManager()
+    keys = manager.load()
+    key_pool = ApiKeyPool(keys, max_in_flight=max_in_flight, manager=manager)
+    if not keys:
+        print("❌ 错误：没有可用的API密钥")
+    else:
+        print(f"🔑 已加载 {len(keys)} 个API密钥，每个密钥最多 {key_pool.max_in_flight} 个并发请求")
+    return len(keys)
+
+def get_key_pool():
+    """获取全局密钥池，未初始化时按默认配置加载"""
+    if key_pool is None:
+        init_key_pool()
+    return key_pool
+
+# --- API调用 ---
+
+# 单次尝试的处理结果
+ATTEMPT_SUCCESS = 'success'
+ATTEMPT_RETRY = 'retry'
+ATTEMPT_FAIL = 'fail'
+
+def build_request_body(messages, model, temperature):
+    """构造对话请求体"""
+    return {
+        "messages": messages,
+        "stream": False,
+        "temperature": temperature,
+        "model": model
+    }
+
+def retry_or_fail(error_class, retry, retry_after=None):
+    """
+    按重试策略决定是否重试
+
+    Returns:
+        (ATTEMPT_RETRY, 等待秒数) 或 (ATTEMPT_FAIL, None)
+    """
+    delay = retry.next_delay(error_class, retry_after)
+    if delay is None:
+        print(f"    ❌ {ERROR_LABELS[error_class]}重试次数已用完，跳过此文件")
+        return ATTEMPT_FAIL, None
+    if retry_after is not None:
+        print(f"    ⏳ 服务端要求 {retry_after:.0f} 秒后重试")
+    return ATTEMPT_RETRY, delay
+
+def handle_response(result, retry, pool, api_key):
+    """
+    根据一次请求的响应决定下一步（同步和asyncio两种执行路径共用）
+
+    Args:
+        result: 本次请求的ChatResult
+        retry: 本次调用的 RetryState
+
+    Returns:
+        (ATTEMPT_SUCCESS / ATTEMPT_RETRY / ATTEMPT_FAIL, 重试前需要等待的秒数)
+    """
+    status_code, content, error_text, retry_after = result[:4]
+    if status_code == 200:
+        rate_limiter.on_success()
+        if content is not None:
+            if retry.total > 0:
+                print(f"    ✅ 重试成功！")
+            return ATTEMPT_SUCCESS, None
+        print(f"    ❌ {error_text}")
+        record_retry_stat('other_errors')
+        return retry_or_fail(ERROR_BAD_RESPONSE, retry)
+
+    if status_code == 406:
+        print(f"    💳 API密钥积分不足 (406错误)")
+        # 废弃该密钥，下一次尝试会从池中取其他密钥（不占用重试预算）
+        pool.retire(api_key)
+        if len(pool):
+            print(f"    🔄 已切换API密钥，重新尝试...")
+            return ATTEMPT_RETRY, 0
+        print(f"    ❌ 所有API密钥都已用完积分")
+        record_retry_stat('other_errors')
+        return ATTEMPT_FAIL, None
+
+    error_class = classify_status(status_code)
+    if is_throttle_status(status_code):
+        rate_limiter.on_throttle(pause=retry_after)
+    record_retry_stat(ERROR_STAT_NAMES.get(error_class, 'other_errors'))
+    print(f"    ❌ API调用失败: {status_code}")
+    print(f"    错误信息: {error_text}")
+    return retry_or_fail(error_class, retry, retry_after)
+
+def is_successful_result(result):
+    """请求是否拿到了可用的回复（对冲时据此判断哪一路胜出）"""
+    return isinstance(result, ChatResult) and result.status_code == 200 and result.content is not None
+
+def handle_result(result, retry, pool, api_key):
+    """根据 timed_request 的结果（ChatResult或异常）决定下一步"""
+    if isinstance(result, Exception):
+        return handle_request_error(result, retry)
+    return handle_response(result, retry, pool, api_key)
+
+def handle_request_error(error, retry):
+    """
+    处理一次请求抛出的异常（超时、连接错误或其他异常）
+
+    Returns:
+        (ATTEMPT_RETRY / ATTEMPT_FAIL, 重试前需要等待的秒数)
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        rate_limiter.on_throttle()
+        error_class = ERROR_TIMEOUT
+        timeout_text = str(error) if isinstance(error, StreamIdleTimeout) else f"超过{API_TIMEOUT}秒"
+        print(f"    ⏰ API超时 ({timeout_text})")
+    elif isinstance(error, requests.exceptions.ConnectionError):
+        error_class = ERROR_CONNECTION
+        print(f"    🌐 网络连接错误")
+    else:
+        error_class = ERROR_OTHER
+        print(f"    ❌ API调用异常: {error}")
+
+    record_retry_stat(ERROR_STAT_NAMES.get(error_class, 'other_errors'))
+    return retry_or_fail(error_class, retry)
+
+def note_retry(attempt):
+    """第二次及以后的尝试前记录重试"""
+    if attempt > 0:
+        record_retry_stat('total_retries')
+        print(f"    🔄 第 {attempt + 1} 次重试...")
+
+def call_linkai_api(messages, model, temperature=0.3, stream_to=None):
+    """调用LinkAI API，按重试策略退避重试，406时自动切换密钥
+
+    Args:
+        messages: 对话消息列表
+        model: 模型名称
+        temperature: 温度
+        stream_to: 流式模式下接收内容的.part文件路径，None表示非流式
+    """
+    cache = get_response_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(model, temperature, messages)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"    💾 命中响应缓存，跳过API调用")
+            telemetry.record_cache_hit()
+            return cached
+
+    pool = get_key_pool()
+    request_tokens = count_message_tokens(messages)
+    body = build_request_body(messages, model, temperature)
+    retry = retry_policy.new_state()
+
+    attempt = 0
+    while True:
+        api_key = None
+        try:
+            note_retry(attempt)
+
+            rate_limiter.acquire(request_tokens)
+            api_key = pool.acquire()
+            if not api_key:
+                print(f"    ❌ 所有API密钥都已用完积分")
+                record_retry_stat('other_errors')
+                return None
+            hedge_after = None if stream_to else hedge_policy.hedge_delay()
+            if hedge_after is not None:
+                api_key, result = request_with_hedge(body, api_key, pool, hedge_after, model, request_tokens)
+            else:
+                api_key, result = timed_request(body, api_key, pool, model, request_tokens, stream_to)
+        except Exception as e:
+            outcome, delay = handle_request_error(e, retry)
+        else:
+            outcome, delay = handle_result(result, retry, pool, api_key)
+
+        if outcome == ATTEMPT_SUCCESS:
+            if cache is not None:
+                cache.put(cache_key, model, result.content)
+            return result.content
+        if outcome == ATTEMPT_FAIL:
+            return None
+
+        if delay:
+            time.sleep(delay)
+        attempt += 1
+
+def timed_request(body, api_key, pool, model, request_tokens, stream_to=None, delay=0):
+    """
+    发送一次请求并记入遥测，结束后归还密钥
+
+    Args:
+        delay: 发送前等待的秒数（对冲请求的限速预约）
+
+    Returns:
+        (api_key, ChatResult或请求抛出的异常)
+    """
+    if delay:
+        time.sleep(delay)
+    started = time.perf_counter()
+    try:
+        if stream_to:
+            result = stream_chat_to_file(body, api_key, stream_to)
+        else:
+            result = request_completion(body, api_key)
+    except Exception as e:
+        result = e
+    finally:
+        pool.release(api_key)
+
+    latency = time.perf_counter() - started
+    record_call(model, api_key, result, latency, request_tokens, stream_to)
+    if not stream_to and is_successful_result(result):
+        hedge_policy.record_latency(latency)
+    return api_key, result
+
+def request_with_hedge(body, api_key, pool, hedge_after, model, request_tokens):
+    """
+    发送非流式请求，超过hedge_after秒仍未返回时用另一个密钥发出对冲请求，取先成功返回的一路
+
+    落后的一路不会被中断，结束后照常记入遥测并归还密钥
+
+    Returns:
+        (api_key, ChatResult或异常)：两路都失败时返回原请求的结果
+    """
+    executor = get_hedge_executor()
+    primary = executor.submit(timed_request, body, api_key, pool, model, request_tokens)
+    try:
+        return primary.result(timeout=hedge_after)
+    except FutureTimeoutError:
+        pass
+
+    if not hedge_policy.try_start_hedge():
+        return primary.result()
+    hedge_key = pool.try_acquire(exclude={api_key})
+    if hedge_key is None:
+        hedge_policy.cancel_hedge()
+        return primary.result()
+
+    print(f"    🪁 请求超过 {hedge_after:.1f} 秒未返回，使用密钥 {hedge_key[:20]}... 发出对冲请求")
+    delay = rate_limiter.reserve(request_tokens)
+    hedge = executor.submit(timed_request, body, hedge_key, pool, model, request_tokens, delay=delay)
+
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            key, result = future.result()
+            if is_successful_result(result):
+                hedge_policy.record_winner(hedge_won=future is hedge)
+                return key, result
+    return primary.result()
+
+def record_call(model, api_key, result, latency, request_tokens, stream=False):
+    """把一次HTTP调用记入遥测：result为ChatResult或异常"""
+    if isinstance(result, Exception):
+        status = type(result).__name__
+        if isinstance(result, requests.exceptions.Timeout):
+            status = ERROR_TIMEOUT
+        elif isinstance(result, requests.exceptions.ConnectionError):
+            status = ERROR_CONNECTION
+        telemetry.record(model, api_key, status, latency, stream=bool(stream))
+        return
+
+    usage = result.usage or {}
+    if usage.get('prompt_tokens') is not None and usage.get('completion_tokens') is not None:
+        prompt_tokens, completion_tokens = usage['prompt_tokens'], usage['completion_tokens']
+        token_source = TOKENS_FROM_USAGE
+    else:
+        prompt_tokens, completion_tokens = request_tokens, count_tokens(result.content or '')
+        token_source = TOKENS_ESTIMATED
+    telemetry.record(model, api_key, result.status_code, latency, prompt_tokens, completion_tokens,
+                     token_source, stream=bool(stream))
+
+def configure_telemetry(credit_rates_file=None):
+    """重新加载积分单价（--credit-rates 指定的文件），清空已有记录"""
+    global telemetry
+
+    telemetry = RunTelemetry(credit_rates=load_credit_rates(credit_rates_file) if credit_rates_file
+                             else load_credit_rates())
+
+def write_run_report(name, path_prefix=None):
+    """打印遥测摘要并写入JSON/CSV报告，返回 (json路径, csv路径)；没有任何请求时不写入"""
+    telemetry.print_summary()
+    if not telemetry.records and not telemetry.cache_hits:
+        return None
+    try:
+        json_path, csv_path = telemetry.write_report(path_prefix or default_report_prefix(name))
+    except OSError as e:
+        print(f"⚠️  写入运行报告失败: {e}")
+        return None
+    print(f"  📄 运行报告: {json_path}")
+    print(f"  📄 请求明细: {csv_path}")
+    return json_path, csv_path
+
+def print_retry_stats():
+    """打印重试统计"""
+    with stats_lock:
+        stats = dict(retry_stats)
+
+    if stats['total_retries'] > 0:
+        print(f"\n📊 重试统计:")
+        print(f"  🔄 总重试次数: {stats['total_retries']}")
+        print(f"  ⏰ 超时错误: {stats['timeout_errors']}")
+        print(f"  🌐 连接错误: {stats['connection_errors']}")
+        print(f"  🚥 限流(429): {stats['rate_limit_errors']}")
+        print(f"  🔥 服务端错误(5xx): {stats['server_errors']}")
+        print(f"  ❓ 其他错误: {stats['other_errors']}")
+        print(f"  💤 退避: {stats['backoff_count']} 次，累计 {stats['backoff_seconds']:.1f} 秒"
+              f"（其中 {stats['retry_after_honored']} 次按 Retry-After 等待）")
+        if stats['budget_exhausted']:
+            print(f"  🛑 重试预算耗尽: {stats['budget_exhausted']} 次")
+    else:
+        print(f"🎉 所有API调用一次成功，无需重试！")
+
+def call_linkai_api_chunked(build_messages, text, model, max_tokens=MAX_INPUT_TOKENS,
+                            temperature=0.3, stream_to=None):
+    """长文本分片调用：按段落切成不超过max_tokens的片段，并发请求后按原顺序拼接
+
+    Args:
+        build_messages: 构造消息的函数 build_messages(chunk_text, index, total)，index从1开始
+        text: 需要处理的完整文本
+        model: 模型名称
+        max_tokens: 每个片段的token上限
+        temperature: 温度
+        stream_to: 流式模式下接收内容的.part文件路径（只在不需要分片时生效）
+
+    Returns:
+        拼接后的回复内容；任一片段失败时返回None
+    """
+    chunks = split_text_into_chunks(text, max_tokens)
+    if len(chunks) == 1:
+        return call_linkai_api(build_messages(text, 1, 1), model, temperature, stream_to=stream_to)
+
+    total = len(chunks)
+    print(f"    ✂️  文本过长，按段落分成 {total} 个片段并发处理")
+    workers = min(total, max(1, get_key_pool().capacity))
+
+    def process_chunk(item):
+        index, chunk = item
+        return call_linkai_api(build_messages(chunk, index, total), model, temperature)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(process_chunk, enumerate(chunks, 1)))
+
+    failed = [str(index) for index, result in enumerate(results, 1) if not result]
+    if failed:
+        print(f"    ❌ 第 {', '.join(failed)}/{total} 个片段处理失败")
+        return None
+    return '\n\n'.join(result.strip() for result in results)
+
+def discard_cached_response(messages, model, temperature=0.3):
+    """删除某个请求的缓存结果（回复内容不可用时调用，避免下次运行再次命中）"""
+    cache = get_response_cache()
+    if cache is not None:
+        cache.delete(make_cache_key(model, temperature, messages))
+
+def call_linkai_api_packed(build_packed_messages, build_messages, items, model, temperature=0.3):
+    """短文本打包调用：多篇输入合并成一次请求，回复按分隔符拆回各篇
+
+    拆分校验失败（编号缺失、重复或某篇为空）时丢弃该缓存条目，改为逐篇并发请求
+
+    Args:
+        build_packed_messages: 构造打包消息的函数 build_packed_messages(items)
+        build_messages: 构造单篇消息的函数 build_messages(item)，回退时使用
+        items: 同一组的输入（由 request_packer.plan_packs 分组）
+        model: 模型名称
+        temperature: 温度
+
+    Returns:
+        与items顺序一致的回复内容列表，失败的篇目为None
+    """
+    if len(items) == 1:
+        return [call_linkai_api(build_messages(items[0]), model, temperature)]
+
+    messages = build_packed_messages(items)
+    outputs = split_packed_output(call_linkai_api(messages, model, temperature), len(items))
+    if outputs is not None:
+        return outputs
+
+    print(f"    ⚠️  打包回复无法按分隔符拆分，改为逐篇请求 {len(items)} 篇")
+    discard_cached_response(messages, model, temperature)
+    workers = min(len(items), max(1, get_key_pool().capacity))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda item: call_linkai_api(build_messages(item), model, temperature), items))
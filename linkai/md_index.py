@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown元信息索引
+合并工具每次运行都要知道每篇文章的行数、日期和前置数据；索引把这些信息按（路径、大小、修改时间）
+缓存在本地SQLite中，语料没有变化时重跑合并不需要再读取文章内容
+
+功能特点：
+- 单次读取：新文件或有变化的文件只读取和解码一次，同时得到行数、前置数据和正文位置
+- 前置数据：YAML解析后按原顺序存为 [键, 值文本] 列表，合并时直接使用，不再调用 yaml.safe_load
+- 正文定位：记录正文开头的字节偏移，合并时直接 seek 到正文，跳过前置数据
+- 内容哈希：记录文章内容的SHA-256，合并工具据此判断合集的输入是否变化
+- token数：记录整篇文章的token数（见 token_counter.py），按token预算分组时使用；估算值在tiktoken可用后自动重算
+- 自动失效：文件大小或修改时间变化后重新扫描；prune() 删除已不存在的文件的条目
+
+使用方法：
+    from md_index import MarkdownIndex, open_body
+    index = MarkdownIndex()
+    entry = index.get(path)               # 命中时不读取文件
+    entry['lines'], entry['tokens'], entry['frontmatter'], entry['body_offset']
+    with open_body(path, entry) as f:     # 从正文开头逐行读取
+        for line in f: ...
+    index.print_stats()
+"""
+
+import io
+import os
+import json
+import hashlib
+import sqlite3
+import codecs
+import threading
+
+import yaml
+
+from text_reader import read_text, read_text_with_encoding
+from token_counter import count_tokens, get_tokenizer
+
+# 索引配置
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'md_metadata_index.sqlite3')
+INDEX_VERSION = 3  # 扫描逻辑变化时递增，旧条目自动失效
+
+# 可以按字节偏移定位的编码（ASCII兼容、无状态）；(seek后解码用的编码, BOM字节数)
+_SEEKABLE_ENCODINGS = {
+    'utf-8': ('utf-8', 0),
+    'utf-8-sig': ('utf-8', len(codecs.BOM_UTF8)),
+    'gb18030': ('gb18030', 0),
+}
+
+def count_text_lines(text):
+    """按通用换行统计行数（与逐行迭代文本文件的结果一致）"""
+    return sum(1 for _ in io.StringIO(text, newline=None))
+
+def parse_frontmatter(frontmatter):
+    """解析YAML前置数据，返回 [键, 值文本] 列表；不是字典或解析失败时返回None"""
+    try:
+        data = yaml.safe_load(frontmatter)
+    except yaml.YAMLError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return [[str(key), str(value)] for key, value in data.items()]
+
+def split_frontmatter(text):
+    """
+    拆分前置数据：第一行以 --- 开头、到下一行以 --- 开头之间的内容为前置数据，正文从结束标记的 --- 之后开始
+
+    Returns:
+        (前置数据文本或None, 正文在文本中的字符偏移)
+    """
+    if text.startswith('---'):
+        offset = 0
+        for line in io.StringIO(text, newline=''):
+            if offset and line.startswith('---'):
+                return text[3:offset].strip(), offset + 3
+            offset += len(line)
+    return None, 0
+
+def scan_markdown(path):
+    """
+    读取一篇Markdown文件，提取行数、前置数据和正文位置
+
+    前置数据的范围见 split_frontmatter
+
+    Returns:
+        条目字典：lines, sha256（文章内容哈希）, tokens, tokens_exact（是否为tiktoken精确计数）,
+        frontmatter（[键, 值] 列表或None）, has_frontmatter, encoding,
+        body_char（正文在解码文本中的字符偏移）, body_offset（字节偏移，编码不支持定位时为None）
+    """
+    # 保留原始换行符：正文的字节偏移按原文计算
+    text, encoding = read_text_with_encoding(path, newline='')
+    entry = {
+        'lines': count_text_lines(text),
+        'sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        'tokens': count_tokens(text),
+        'tokens_exact': get_tokenizer() is not None,
+        'frontmatter': None,
+        'has_frontmatter': False,
+        'encoding': encoding,
+        'body_char': 0,
+        'body_offset': 0,
+    }
+
+    frontmatter, body_char = split_frontmatter(text)
+    if frontmatter is not None:
+        entry['has_frontmatter'] = True
+        entry['body_char'] = body_char
+        entry['frontmatter'] = parse_frontmatter(frontmatter)
+
+    seekable = _SEEKABLE_ENCODINGS.get(encoding)
+    if seekable:
+        codec, bom = seekable
+        entry['body_offset'] = bom + len(text[:entry['body_char']].encode(codec))
+    else:
+        entry['body_offset'] = None
+    return entry
+
+def open_body(path, entry):
+    """
+    打开文章并定位到正文开头（前置数据之后），返回逐行读取的文本文件对象（通用换行）
+
+    编码不支持按字节定位（UTF-16等）时读入整个文件后从字符偏移处开始
+    """
+    if entry['body_offset'] is None:
+        return io.StringIO(read_text(path, newline='')[entry['body_char']:], newline=None)
+    codec, _ = _SEEKABLE_ENCODINGS[entry['encoding']]
+    f = open(path, 'rb')
+    f.seek(entry['body_offset'])
+    return io.TextIOWrapper(f, encoding=codec)
+
+class MarkdownIndex:
+    """基于SQLite的Markdown元信息索引（线程安全）"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path: SQLite数据库文件路径
+        """
+        self.path = path
+        self.stats = {'hits': 0, 'scanned': 0}
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # 索引丢失只需重新扫描，不必每次提交都落盘
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                entry TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, path):
+        """
+        获取文件的索引条目，大小或修改时间变化时重新扫描
+
+        Raises:
+            OSError: 文件无法读取
+            UnicodeDecodeError: 无法识别文件编码
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, version, entry FROM files WHERE path = ?", (key,)
+            ).fetchone()
+        if row and row[:3] == (stat.st_size, stat.st_mtime_ns, INDEX_VERSION):
+            entry = json.loads(row[3])
+            # 之前没有tiktoken时记录的是估算值，现在可以精确计数时重新扫描
+            if entry['tokens_exact'] or get_tokenizer() is None:
+                with self._lock:
+                    self.stats['hits'] += 1
+                return entry
+
+        entry = scan_markdown(key)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, version, entry) VALUES (?, ?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime_ns, INDEX_VERSION, json.dumps(entry, ensure_ascii=False))
+            )
+            self._conn.commit()
+            self.stats['scanned'] += 1
+        return entry
+
+    def prune(self, folder, existing_paths):
+        """删除 folder 目录下已不在 existing_paths 中的文件的条目，返回删除数量"""
+        folder = os.path.abspath(folder)
+        keep = {os.path.abspath(path) for path in existing_paths}
+        with self._lock:
+            stale = [(path,) for (path,) in self._conn.execute("SELECT path FROM files")
+                     if os.path.dirname(path) == folder and path not in keep]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", stale)
+            self._conn.commit()
+        return len(stale)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        """打印索引命中统计"""
+        stats = dict(self.stats)
+        total = stats['hits'] + stats['scanned']
+        if not total:
+            return
+        print(f"🗂️ 元信息索引: 命中 {stats['hits']} 个，重新扫描 {stats['scanned']} 个（{total} 个文件）")
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown文章全文检索
+把合并后的合集（合集_*.md）按文章拆开，连同逐篇输出的Markdown文件一起建立本地SQLite FTS5索引，
+查询时直接返回按相关度排序的文章标题、日期和摘要，不再需要对整个语料目录 grep
+
+功能特点：
+- 二元分词：中文按相邻两个字切词（"亲子共读" → 亲子 子共 共读），英文和数字按词，不依赖外部分词器
+- 按文章建索引：合集按目录中的文章标题拆分，记录每篇文章所在的文件和起始行号
+- 增量更新：按（路径、大小、修改时间）判断文件是否变化，只重新索引有变化的文件，删除已不存在的文件
+- 相关度排序：FTS5 bm25，标题命中的权重高于正文
+- 去重：同一篇文章同时出现在逐篇输出和合集中时只显示排名最高的一条
+
+使用方法：
+    python md_search.py --update                 # 增量更新索引（默认目录见 DEFAULT_FOLDERS）
+    python md_search.py 亲子共读                  # 查询（多个词之间为"且"）
+    python md_search.py 绘本 刷牙 -n 20           # 返回前20条
+    python md_search.py -u 亲子共读 --folders wechat_huibenmamahaitong_result_merged  # 先更新指定目录再查询
+"""
+
+import os
+import re
+import glob
+import time
+import sqlite3
+import argparse
+
+from md_index import split_frontmatter
+from text_reader import read_text
+
+# 索引配置
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'md_search_index.sqlite3')
+INDEX_VERSION = 1  # 拆分或分词逻辑变化时递增，旧文件自动重新索引
+DEFAULT_FOLDERS = (
+    'wechat_*_result_merged',           # 微信文章合集
+    'wechat_*_result',                  # 微信文章逐篇输出（batch_md_processor.py）
+    '../output_result_md_linkai',       # 视频文稿逐篇输出
+    '../output_result_md_linkai_merged',  # 视频文稿合集
+)
+DEFAULT_LIMIT = 10
+TITLE_WEIGHT = 5.0  # bm25 中标题列相对正文的权重
+SNIPPET_BEFORE = 30  # 摘要中命中位置之前保留的字符数
+SNIPPET_AFTER = 70  # 摘要中命中位置之后保留的字符数
+
+_CJK = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_PATTERN = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+')
+_BUNDLE_TOC_PATTERN = re.compile(r'^(\d+)\. \[(.*)\]\(#.*\) \((.+?), \d+行\)$')
+_NAME_PREFIX_PATTERN = re.compile(r'^(?:\d+_)?(\d{4}-\d{2}-\d{2})[_ ]*')
+_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def bigram_tokens(text):
+    """切词：连续的中文按相邻两个字切分（单个字单独成词），其他文字按词并转小写"""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        run = match.group()
+        if re.match(rf'[{_CJK}]', run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+def bigram_text(text):
+    """切词后以空格连接，交给FTS5的 unicode61 分词器按空格切分"""
+    return ' '.join(bigram_tokens(text))
+
+def build_match_query(query):
+    """
+    把用户输入转换为FTS5查询：每个词的二元切分组成一个短语（必须相邻出现），多个词之间为"且"
+
+    只有一个汉字的词无法组成二元词，按前缀匹配（只能找到以该字开头的二元词）
+
+    Returns:
+        FTS5查询字符串，没有可检索的词时为None
+    """
+    phrases = []
+    for term in query.split():
+        tokens = bigram_tokens(term)
+        if not tokens:
+            continue
+        phrase = '"' + ' '.join(token.replace('"', '""') for token in tokens) + '"'
+        if len(tokens) == 1 and len(tokens[0]) == 1:
+            phrase += '*'
+        phrases.append(phrase)
+    return ' AND '.join(phrases) or None
+
+def _title_from_name(name):
+    """从文件名（不含扩展名）中去掉序号和日期前缀作为标题"""
+    return _NAME_PREFIX_PATTERN.sub('', name) or name
+
+def _first_heading(text, max_lines=20):
+    """正文前几行中的第一个一级标题"""
+    for line in text.split('\n', max_lines)[:max_lines]:
+        if line.startswith('# '):
+            return line[2:].strip()
+    return None
+
+def split_bundle(text):
+    """
+    按目录把合集拆分为文章
+
+    合集格式见 merge_md_files.py：目录项为 "序号. [文件名](#锚点) (日期, 行数行)"，
+    每篇文章以 "## 序号. 文件名" 开头、以 "---" 分隔线结束
+
+    Returns:
+        [(起始行号, 标题, 日期, 正文)]；不是合集格式时返回None
+    """
+    lines = text.split('\n')
+    toc = []
+    for line in lines:
+        match = _BUNDLE_TOC_PATTERN.match(line)
+        if match:
+            toc.append((f"## {match.group(1)}. {match.group(2)}", match.group(2), match.group(3)))
+    if not toc:
+        return None
+
+    # 按目录顺序找到每篇文章的标题行（文章正文中的同名小标题不会被误认，因为只在上一篇之后查找）
+    starts = []
+    position = 0
+    for heading, name, date in toc:
+        try:
+            position = lines.index(heading, position)
+        except ValueError:
+            continue
+        starts.append((position, name, date))
+        position += 1
+
+    articles = []
+    for i, (start, name, date) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(lines)
+        body = '\n'.join(lines[start + 1:end]).strip()
+        if body.endswith('---'):
+            body = body[:-3].rstrip()
+        title = _first_heading(body) or _title_from_name(name)
+        date = date if _DATE_PATTERN.fullmatch(date) else ''
+        articles.append((start + 1, title, date, body))
+    return articles
+
+def split_article(text, filename):
+    """
+    逐篇输出的Markdown文件：标题取前置数据的 title、正文第一个一级标题或文件名，日期取 publish_date 或文件名中的日期
+
+    Returns:
+        [(起始行号, 标题, 日期, 正文)]
+    """
+    name = os.path.splitext(filename)[0]
+    frontmatter, body_char = split_frontmatter(text)
+    fields = {}
+    for line in (frontmatter or '').split('\n'):
+        key, sep, value = line.partition(':')
+        if sep:
+            fields[key.strip()] = value.strip().strip('"\'')
+    body = text[body_char:].strip()
+
+    title = fields.get('title') or _first_heading(body) or _title_from_name(name)
+    date_match = _DATE_PATTERN.search(fields.get('publish_date', '')) or _DATE_PATTERN.search(name)
+    return [(1, title, date_match.group() if date_match else '', body)]
+
+def _strip_heading(body):
+    """去掉正文开头的一级标题行（与标题重复），摘要从正文内容中截取"""
+    if body.startswith('# '):
+        return body.partition('\n')[2].lstrip()
+    return body
+
+def make_snippet(body, terms, before=SNIPPET_BEFORE, after=SNIPPET_AFTER):
+    """截取第一个命中词附近的正文作为摘要，命中词用 ** 标出"""
+    lowered = body.lower()
+    positions = [(lowered.find(term.lower()), term) for term in terms]
+    positions = [(pos, term) for pos, term in positions if pos >= 0]
+    if not positions:
+        snippet = body[:before + after]
+    else:
+        pos, _ = min(positions)
+        start = max(0, pos - before)
+        snippet = ('…' if start else '') + body[start:pos + after] + ('…' if pos + after < len(body) else '')
+    snippet = re.sub(r'\s+', ' ', snippet).strip()
+    for term in sorted(set(terms), key=len, reverse=True):
+        snippet = re.sub(re.escape(term), lambda m: f"**{m.group()}**", snippet, flags=re.I)
+    return snippet
+
+class SearchIndex:
+    """基于SQLite FTS5的文章全文索引"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path: SQLite数据库文件路径
+
+        Raises:
+            RuntimeError: 当前SQLite未编译FTS5
+        """
+        self.path = path
+        self.stats = {'indexed': 0, 'unchanged': 0, 'removed': 0, 'articles': 0}
+
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # 索引丢失只需重建，不必每次提交都落盘
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                date TEXT NOT NULL,
+                body TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS articles_path ON articles(path);
+        """)
+        try:
+            # 无内容表：只存倒排索引，原文在 articles 表中，删除时按原文重新切词
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, body, content='', tokenize='unicode61')"
+            )
+        except sqlite3.OperationalError as e:
+            self._conn.close()
+            raise RuntimeError(f"当前SQLite不支持FTS5: {e}")
+        self._conn.commit()
+
+    def _remove_document(self, path):
+        """删除一个文件的全部文章"""
+        rows = self._conn.execute("SELECT id, title, body FROM articles WHERE path = ?", (path,)).fetchall()
+        self._conn.executemany(
+            "INSERT INTO articles_fts (articles_fts, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+            [(article_id, bigram_text(title), bigram_text(body)) for article_id, title, body in rows]
+        )
+        self._conn.execute("DELETE FROM articles WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+
+    def _index_document(self, path, stat):
+        """读取并索引一个文件（合集按文章拆分），返回文章数"""
+        text = read_text(path)
+        filename = os.path.basename(path)
+        articles = split_bundle(text) if filename.startswith('合集_') else None
+        if articles is None:
+            articles = split_article(text, filename)
+
+        for line, title, date, body in articles:
+            cursor = self._conn.execute(
+                "INSERT INTO articles (path, line, title, date, body) VALUES (?, ?, ?, ?, ?)",
+                (path, line, title, date, body)
+            )
+            self._conn.execute(
+                "INSERT INTO articles_fts (rowid, title, body) VALUES (?, ?, ?)",
+                (cursor.lastrowid, bigram_text(title), bigram_text(body))
+            )
+        self._conn.execute(
+            "INSERT INTO documents (path, size, mtime_ns, version) VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, INDEX_VERSION)
+        )
+        return len(articles)
+
+    def update(self, folders):
+        """
+        增量更新：索引新文件和有变化的文件，删除这些目录下已不存在的文件
+
+        Args:
+            folders: 目录列表（支持通配符），不存在的目录跳过
+        """
+        known = {path: signature for path, *signature in
+                 self._conn.execute("SELECT path, size, mtime_ns, version FROM documents")}
+
+        for pattern in folders:
+            for folder in sorted(glob.glob(pattern)):
+                if not os.path.isdir(folder):
+                    continue
+                folder = os.path.abspath(folder)
+                paths = sorted(glob.glob(os.path.join(folder, '*.md')))
+                print(f"📂 {os.path.relpath(folder)}: {len(paths)} 个文件")
+
+                for path in paths:
+                    stat = os.stat(path)
+                    if known.get(path) == [stat.st_size, stat.st_mtime_ns, INDEX_VERSION]:
+                        self.stats['unchanged'] += 1
+                        continue
+                    try:
+                        with self._conn:
+                            self._remove_document(path)
+                            self.stats['articles'] += self._index_document(path, stat)
+                        self.stats['indexed'] += 1
+                    except (OSError, UnicodeError) as e:
+                        print(f"  ❌ 索引失败 {os.path.relpath(path)}: {e}")
+
+                # 删除该目录下已不存在的文件
+                existing = set(paths)
+                stale = [path for path in known if os.path.dirname(path) == folder and path not in existing]
+                with self._conn:
+                    for path in stale:
+                        self._remove_document(path)
+                self.stats['removed'] += len(stale)
+
+    def search(self, query, limit=DEFAULT_LIMIT, dedupe=True):
+        """
+        查询文章
+
+        Returns:
+            按相关度排序的结果字典列表：title, date, path, line, snippet
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        results = []
+        seen = set()
+        offset = 0
+        while len(results) < limit:
+            # 去重后可能不足 limit 条，按批继续取
+            rows = self._conn.execute(
+                f"""SELECT a.title, a.date, a.path, a.line, a.body
+                    FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+                    WHERE articles_fts MATCH ?
+                    ORDER BY bm25(articles_fts, {TITLE_WEIGHT}, 1.0)
+                    LIMIT ? OFFSET ?""",
+                (match, limit * 2, offset)
+            ).fetchall()
+            if not rows:
+                break
+            offset += len(rows)
+            for title, date, path, line, body in rows:
+                key = (title, date)
+                if dedupe and key in seen:
+                    continue
+                seen.add(key)
+                results.append({
+                    'title': title,
+                    'date': date,
+                    'path': path,
+                    'line': line,
+                    'snippet': make_snippet(_strip_heading(body), query.split()),
+                })
+                if len(results) >= limit:
+                    break
+        return results
+
+    def count(self):
+        """(文件数, 文章数)"""
+        documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        articles = self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        return documents, articles
+
+    def close(self):
+        self._conn.close()
+
+    def print_stats(self):
+        """打印本次更新的统计"""
+        stats = self.stats
+        documents, articles = self.count()
+        print(f"🔎 全文索引: 重新索引 {stats['indexed']} 个文件（{stats['articles']} 篇文章），"
+              f"未变化 {stats['unchanged']} 个，删除 {stats['removed']} 个；共 {documents} 个文件、{articles} 篇文章")
+
+def main():
+    parser = argparse.ArgumentParser(description='Markdown文章全文检索（SQLite FTS5）')
+    parser.add_argument('query', nargs='*', help='查询词（多个词之间为"且"）')
+    parser.add_argument('-u', '--update', action='store_true',
+                       help='查询前增量更新索引')
+    parser.add_argument('--folders', nargs='+', default=list(DEFAULT_FOLDERS),
+                       help='建立索引的目录，支持通配符（默认：微信文章和视频文稿的逐篇输出及合集目录）')
+    parser.add_argument('-n', '--limit', type=int, default=DEFAULT_LIMIT,
+                       help=f'返回结果数（默认: {DEFAULT_LIMIT}）')
+    parser.add_argument('--all', action='store_true',
+                       help='不去重：同一篇文章在逐篇输出和合集中都显示')
+    parser.add_argument('--index', type=str, default=DEFAULT_INDEX_PATH,
+                       help='索引文件路径')
+
+    args = parser.parse_args()
+    if not args.query and not args.update:
+        parser.error('请指定查询词或 --update')
+
+    try:
+        index = SearchIndex(args.index)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+
+    try:
+        if args.update or index.count()[0] == 0:
+            start = time.time()
+            print("=== 更新全文索引 ===")
+            index.update(args.folders)
+            index.print_stats()
+            print(f"⏱️ 用时: {time.time() - start:.2f}秒\n")
+
+        if args.query:
+            query = ' '.join(args.query)
+            start = time.perf_counter()
+            results = index.search(query, limit=args.limit, dedupe=not args.all)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            print(f"🔍 \"{query}\": {len(results)} 条结果（{elapsed:.1f} 毫秒）")
+            for i, result in enumerate(results, 1):
+                print(f"\n{i}. {result['title']}  [{result['date'] or '未知日期'}]")
+                print(f"   📄 {os.path.relpath(result['path'])}:{result['line']}")
+                print(f"   {result['snippet']}")
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
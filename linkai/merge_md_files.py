@@ -2,26 +2,44 @@
 # -*- coding: utf-8 -*-
 """
 Markdown文件合并工具
-按日期范围合并文档，每个合并文件控制在1000行左右
+按日期范围合并文档，每个合并文件控制在1000行左右，或按token预算（--max-tokens）分组以适配LLM上下文窗口
+每篇文章的行数、前置数据和正文位置缓存在元信息索引中（见 md_index.py），语料没有变化时重跑不再读取文章内容来统计
+输出目录中的 .merge_manifest.json 记录每个合集由哪些文章（按内容哈希）组成，重跑时只重写有变化的合集
+每个合集旁边写一个偏移表（合集文件名.offsets.json），用 bundle_reader.py 可以直接读取其中的单篇文章
 
 使用方法：
 python merge_md_files.py           # 预览模式
-python merge_md_files.py -e        # 执行合并
+python merge_md_files.py -e        # 执行合并（增量：只重写有变化的合集）
+python merge_md_files.py -e --full # 全部重写
+python merge_md_files.py -e -j 4   # 4个进程并行生成合集
 python merge_md_files.py -l 800    # 自定义行数限制
+python merge_md_files.py -e --max-tokens 100000  # 按token预算分组，每个合集不超过10万token
 """
 
 import os
 import glob
 import re
+import json
+import time
 import argparse
+from collections import Counter
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
-import yaml
+
+from bundle_reader import has_current_offsets, offsets_path, save_offsets
+from md_index import MarkdownIndex, open_body
+from token_counter import count_tokens
 
 # 配置
 MD_FOLDER = r'../output_result_md_linkai'
 MERGED_FOLDER = r'../output_result_md_linkai_merged'
 DEFAULT_MAX_LINES = 1000
+BUNDLE_HEADER_TOKENS = 80  # 合集头部（合并信息、目录标题）的token数估计
+ARTICLE_OVERHEAD_TOKENS = 20  # 每篇文章在目录和小标题中除文件名外的token数估计（序号、日期、分隔线等）
+MANIFEST_NAME = '.merge_manifest.json'  # 合集清单（位于输出目录）
+MANIFEST_VERSION = 1  # 合集格式变化时递增，旧清单失效、全部重写
 
 def extract_date_from_filename(filename):
     """从文件名中提取日期"""
@@ -35,37 +53,8 @@ def extract_date_from_filename(filename):
             return None
     return None
 
-def count_lines_in_file(file_path):
-    """统计文件行数"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return sum(1 for line in f)
-    except Exception:
-        return 0
-
-def read_md_file(file_path):
-    """读取Markdown文件内容"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
-    except Exception as e:
-        print(f"  ❌ 读取文件失败 {file_path}: {e}")
-        return None
-
-def extract_frontmatter_and_content(content):
-    """分离YAML前置数据和正文内容"""
-    if content.startswith('---'):
-        parts = content.split('---', 2)
-        if len(parts) >= 3:
-            frontmatter = parts[1].strip()
-            main_content = parts[2].strip()
-            return frontmatter, main_content
-    
-    return None, content
-
-def analyze_files():
-    """分析所有Markdown文件"""
+def analyze_files(index):
+    """分析所有Markdown文件（行数和前置数据从元信息索引读取，只有新文件和有变化的文件会被读取）"""
     print("=== 文件分析 ===")
     
     # 获取所有MD文件
@@ -74,26 +63,40 @@ def analyze_files():
     
     file_info = []
     total_lines = 0
+    total_tokens = 0
     
     for md_file in md_files:
         filename = os.path.basename(md_file)
         date = extract_date_from_filename(filename)
-        lines = count_lines_in_file(md_file)
+        try:
+            entry = index.get(md_file)
+        except (OSError, UnicodeError) as e:
+            print(f"  ❌ 读取文件失败 {md_file}: {e}")
+            entry = None
+        lines = entry['lines'] if entry else 0
+        tokens = entry['tokens'] if entry else 0
         
         file_info.append({
             'path': md_file,
             'filename': filename,
             'date': date,
-            'lines': lines
+            'lines': lines,
+            'tokens': tokens,
+            'entry': entry
         })
         
         total_lines += lines
+        total_tokens += tokens
+    
+    index.prune(MD_FOLDER, md_files)
+    index.print_stats()
     
     # 按日期排序
     file_info.sort(key=lambda x: x['date'] if x['date'] else datetime.min)
     
     print(f"总行数: {total_lines}")
     print(f"平均每文件: {total_lines // len(file_info) if file_info else 0} 行")
+    print(f"总token数: {total_tokens}（平均每文件 {total_tokens // len(file_info) if file_info else 0}）")
     
     # 显示日期范围
     dated_files = [f for f in file_info if f['date']]
@@ -128,6 +131,57 @@ def group_files_by_lines(file_info, max_lines_per_group):
     
     return groups
 
+def article_tokens_in_bundle(file_data):
+    """一篇文章放入合集后占用的token数：正文 + 目录项和小标题（都包含文件名）"""
+    return file_data['tokens'] + 2 * count_tokens(file_data['filename']) + ARTICLE_OVERHEAD_TOKENS
+
+def bundle_tokens(group):
+    """估算整个合集的token数"""
+    return BUNDLE_HEADER_TOKENS + sum(article_tokens_in_bundle(f) for f in group)
+
+def group_files_by_tokens(file_info, max_tokens):
+    """
+    按token预算分组：按日期顺序依次装入，装不下时开始新组，每组尽量接近但不超过预算
+    
+    单篇文章超过预算时单独成组（打印分布时会标出）；按顺序贪心装填保证新文章只影响末尾的合集，
+    与增量合并配合时前面的合集保持不变
+    """
+    groups = []
+    current_group = []
+    current_tokens = BUNDLE_HEADER_TOKENS
+    
+    for file_data in file_info:
+        tokens = article_tokens_in_bundle(file_data)
+        if current_group and current_tokens + tokens > max_tokens:
+            groups.append(current_group)
+            current_group = []
+            current_tokens = BUNDLE_HEADER_TOKENS
+        current_group.append(file_data)
+        current_tokens += tokens
+    
+    if current_group:
+        groups.append(current_group)
+    
+    return groups
+
+def print_size_distribution(sizes, limit, unit):
+    """打印合集大小分布：最小/中位数/平均/最大，以及相对上限的分段直方图"""
+    if not sizes:
+        return
+    ordered = sorted(sizes)
+    median = ordered[len(ordered) // 2]
+    print(f"\n📊 合集大小分布（{unit}，上限 {limit}）:")
+    print(f"   最小 {ordered[0]} | 中位数 {median} | 平均 {sum(ordered) // len(ordered)} | 最大 {ordered[-1]}")
+    
+    buckets = [('< 50%', 0, 0.5), ('50-70%', 0.5, 0.7), ('70-90%', 0.7, 0.9), ('90-100%', 0.9, 1.0)]
+    for label, low, high in buckets:
+        count = sum(1 for size in sizes if low * limit <= size < high * limit
+                    or (high == 1.0 and size == limit))
+        print(f"   {label:>8}: {'█' * count} {count}")
+    over = sum(1 for size in sizes if size > limit)
+    if over:
+        print(f"   {'> 100%':>8}: {'█' * over} {over}（单篇文章超过上限）")
+
 def generate_group_filename(group, group_index):
     """生成合并文件的文件名"""
     dated_files = [f for f in group if f['date']]
@@ -148,97 +202,284 @@ def generate_group_filename(group, group_index):
         # 无日期文件
         return f"合集_无日期文件_{group_index+1}_{len(group)}篇.md"
 
-def create_merged_content(group, group_filename):
-    """创建合并文件的内容"""
+def generate_group_filenames(groups):
+    """
+    生成所有合集的文件名
+
+    日期范围和篇数都相同的合集会得到相同的文件名（同一天的文章很多时常见），
+    这些合集在文件名末尾加上组号区分，避免并行生成时写同一个文件、清单条目互相覆盖
+    """
+    names = [generate_group_filename(group, i) for i, group in enumerate(groups)]
+    counts = Counter(names)
+    for i, name in enumerate(names):
+        if counts[name] > 1:
+            stem, ext = os.path.splitext(name)
+            names[i] = f"{stem}_{i+1}{ext}"
+    return names
+
+class LineCountingWriter:
+    """包装文本文件对象（UTF-8），写入时统计行数和已写入的字节数"""
+
+    def __init__(self, f):
+        self._f = f
+        self.newlines = 0
+        self.bytes = 0
+
+    def write(self, text):
+        newlines = text.count('\n')
+        self.newlines += newlines
+        # 文本模式写入时 \n 会转换为 os.linesep（Windows上为 \r\n）
+        self.bytes += len(text.encode('utf-8')) + newlines * (len(os.linesep) - 1)
+        self._f.write(text)
+
+    @property
+    def lines(self):
+        """与 len(content.split('\n')) 的口径一致"""
+        return self.newlines + 1
+
+def build_merged_header(group, group_filename, merged_at=None):
+    """生成合并文件的头部信息和目录（只用到分析阶段的元信息，不读取文章内容）"""
     # 统计信息
     total_files = len(group)
     total_lines = sum(f['lines'] for f in group)
     dated_files = [f for f in group if f['date']]
     
     # 创建文件头部
-    header = f"""# {os.path.splitext(group_filename)[0]}
+    parts = [f"""# {os.path.splitext(group_filename)[0]}
 
 **合并信息:**
 - 文件数量: {total_files} 篇
 - 总行数: {total_lines} 行
-- 合并时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
+- 合并时间: {(merged_at or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')}
+"""]
     
     if dated_files:
         dated_files.sort(key=lambda x: x['date'])
         start_date = dated_files[0]['date']
         end_date = dated_files[-1]['date']
-        header += f"- 日期范围: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}\n"
+        parts.append(f"- 日期范围: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}\n")
     
-    header += f"""
+    parts.append(f"""
 ---
 
 ## 目录
 
-"""
+""")
     
     # 创建目录
     for i, file_data in enumerate(group, 1):
         title = os.path.splitext(file_data['filename'])[0]
         date_str = file_data['date'].strftime('%Y-%m-%d') if file_data['date'] else '未知日期'
-        header += f"{i}. [{title}](#{i}-{title.replace(' ', '-').replace('#', '').replace('?', '').replace('!', '')}) ({date_str}, {file_data['lines']}行)\n"
+        parts.append(f"{i}. [{title}](#{i}-{title.replace(' ', '-').replace('#', '').replace('?', '').replace('!', '')}) ({date_str}, {file_data['lines']}行)\n")
     
-    header += "\n---\n\n"
+    parts.append("\n---\n\n")
+    return ''.join(parts)
+
+def write_frontmatter_info(out, frontmatter):
+    """把前置数据中的关键字段写成信息框（frontmatter 为索引中的 [键, 值] 列表）"""
+    out.write("**文章信息:**\n")
+    for key, value in frontmatter:
+        if key in ['title', 'publish_date', 'topics', 'word_count']:
+            out.write(f"- {key}: {value}\n")
+    out.write("\n")
+
+def write_stripped(out, lines):
+    """逐行写入，跳过开头的空行，末尾的空行和空白不写入（与 str.strip() 一致）"""
+    pending_blank = ''
+    previous = None
+    for line in lines:
+        if not line.strip():
+            if previous is not None:
+                pending_blank += line
+            continue
+        if previous is None:
+            line = line.lstrip()
+        else:
+            out.write(previous + pending_blank)
+        previous = line
+        pending_blank = ''
+    if previous is not None:
+        out.write(previous.rstrip())
+
+def write_article(out, file_data, index):
+    """
+    把一篇文章写入合并文件：前置数据用索引中已解析的字段写成信息框，正文从索引记录的位置开始逐行读取
     
-    # 合并文件内容
-    merged_content = header
+    Returns:
+        文章在合集中的 (字节偏移, 字节长度)，从小标题开始、不含末尾分隔线；文件为空或读取失败时跳过，返回None
+    """
+    entry = file_data['entry']
+    if not entry or not entry['lines']:
+        return None
     
-    for i, file_data in enumerate(group, 1):
-        print(f"    合并: {file_data['filename']}")
-        
-        content = read_md_file(file_data['path'])
-        if not content:
-            continue
-        
-        # 分离前置数据和正文
-        frontmatter, main_content = extract_frontmatter_and_content(content)
-        
-        # 添加文件分隔符和标题
-        merged_content += f"\n\n## {i}. {os.path.splitext(file_data['filename'])[0]}\n\n"
-        
-        # 如果有前置数据，添加为信息框
-        if frontmatter:
-            try:
-                fm_data = yaml.safe_load(frontmatter)
-                if isinstance(fm_data, dict):
-                    merged_content += "**文章信息:**\n"
-                    for key, value in fm_data.items():
-                        if key in ['title', 'publish_date', 'topics', 'word_count']:
-                            merged_content += f"- {key}: {value}\n"
-                    merged_content += "\n"
-            except:
-                pass
-        
-        # 添加正文内容
-        merged_content += main_content
-        merged_content += "\n\n---\n"
+    try:
+        f = open_body(file_data['path'], entry)
+    except (OSError, UnicodeError) as e:
+        print(f"  ❌ 读取文件失败 {file_data['path']}: {e}")
+        return None
     
-    return merged_content
+    # 添加文件分隔符和标题
+    out.write("\n\n")
+    offset = out.bytes
+    out.write(f"## {index}. {os.path.splitext(file_data['filename'])[0]}\n\n")
+    
+    with f:
+        if entry['has_frontmatter']:
+            # 有前置数据时正文去掉首尾空白；没有前置数据时原样写入
+            if entry['frontmatter']:
+                write_frontmatter_info(out, entry['frontmatter'])
+            write_stripped(out, f)
+        else:
+            for line in f:
+                out.write(line)
+    
+    length = out.bytes - offset
+    out.write("\n\n---\n")
+    return offset, length
 
-def merge_files(file_info, max_lines_per_group, dry_run=True):
-    """执行文件合并"""
-    print(f"\n=== {'预览' if dry_run else '执行'}合并操作 ===")
-    print(f"最大行数限制: {max_lines_per_group}")
+def article_offset_entry(file_data, index, offset, length):
+    """偏移表中的一项：index 为目录序号（与 "## 序号." 小标题一致），标题优先取前置数据的 title，没有时用文件名"""
+    frontmatter = dict(file_data['entry']['frontmatter'] or [])
+    return {
+        'index': index,
+        'title': frontmatter.get('title') or os.path.splitext(file_data['filename'])[0],
+        'date': file_data['date'].strftime('%Y-%m-%d') if file_data['date'] else '',
+        'source': file_data['filename'],
+        'offset': offset,
+        'length': length,
+    }
+
+def write_merged_file(group, group_filename, output_path, merged_at=None, verbose=True):
+    """
+    流式写入合并文件：先写头部和目录，再逐篇从磁盘读取文章写入 .part 文件，完成后原子重命名，
+    然后写入记录每篇文章位置的偏移表
+    
+    Args:
+        merged_at: 写入头部的合并时间（同一次运行的所有合集共用，默认当前时间）
+        verbose: 是否逐篇打印（多进程时关闭，避免输出交错）
+    
+    Returns:
+        合并文件的行数
+    """
+    part_path = f"{output_path}.part"
+    try:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            out = LineCountingWriter(f)
+            out.write(build_merged_header(group, group_filename, merged_at))
+            
+            articles = []
+            for i, file_data in enumerate(group, 1):
+                if verbose:
+                    print(f"    合并: {file_data['filename']}")
+                span = write_article(out, file_data, i)
+                if span:
+                    articles.append(article_offset_entry(file_data, i, *span))
+            
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(part_path, output_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    
+    save_offsets(output_path, articles, out.bytes)
+    return out.lines
+
+def build_bundle(job):
+    """
+    生成一个合集（多进程时的工作进程入口）
     
-    # 按行数分组
-    groups = group_files_by_lines(file_info, max_lines_per_group)
-    print(f"将分为 {len(groups)} 个合并文件")
+    Args:
+        job: (分组, 合集文件名, 输出路径, 合并时间, 是否逐篇打印)
+    
+    Returns:
+        (行数, 用时秒数, 错误信息)：成功时错误信息为None，失败时行数为None
+    """
+    group, group_filename, output_path, merged_at, verbose = job
+    start = time.perf_counter()
+    try:
+        lines = write_merged_file(group, group_filename, output_path, merged_at, verbose)
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e)
+    return lines, time.perf_counter() - start, None
+
+def load_manifest(folder):
+    """读取合集清单 {合集文件名: {'files': [[文件名, 内容哈希], ...], 'lines': 行数}}，不存在或版本不符时返回空字典"""
+    try:
+        with open(os.path.join(folder, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('bundles', {})
+
+def save_manifest(folder, bundles):
+    """原子写入合集清单"""
+    path = os.path.join(folder, MANIFEST_NAME)
+    with open(f"{path}.part", 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'bundles': bundles}, f, ensure_ascii=False, indent=1)
+    os.replace(f"{path}.part", path)
+
+def group_signature(group):
+    """合集的输入：按顺序的 [文件名, 内容哈希] 列表"""
+    return [[f['filename'], f['entry']['sha256'] if f['entry'] else None] for f in group]
+
+def merge_files(file_info, max_lines_per_group, dry_run=True, full=False, jobs=1, max_tokens=None):
+    """
+    执行文件合并
+    
+    增量模式（默认）按合集清单比较每个合集的成员和内容哈希，只重写有变化的合集，
+    不再属于任何合集的旧合集文件会被删除；full=True 时全部重写。
+    jobs > 1 时用进程池并行生成合集，输出与串行完全相同（同一次运行共用一个合并时间）。
+    指定 max_tokens 时按token预算分组，否则按行数分组
+    """
+    print(f"\n=== {'预览' if dry_run else '执行'}合并操作 ===")
+    if max_tokens:
+        # 按token预算分组
+        print(f"token预算: {max_tokens}")
+        groups = group_files_by_tokens(file_info, max_tokens)
+        print(f"将分为 {len(groups)} 个合并文件")
+        print_size_distribution([bundle_tokens(group) for group in groups], max_tokens, 'token')
+    else:
+        print(f"最大行数限制: {max_lines_per_group}")
+        
+        # 按行数分组
+        groups = group_files_by_lines(file_info, max_lines_per_group)
+        print(f"将分为 {len(groups)} 个合并文件")
+        print_size_distribution([sum(f['lines'] for f in group) for group in groups], max_lines_per_group, '行')
     
     if not dry_run:
         # 确保输出目录存在
         os.makedirs(MERGED_FOLDER, exist_ok=True)
     
-    for i, group in enumerate(groups):
+    # full 时也读取旧清单：不比较是否变化，但仍用它找出需要删除的过时合集
+    manifest = load_manifest(MERGED_FOLDER)
+    new_manifest = {}
+    planned = set()
+    pending = []  # 需要重写的合集：(合集文件名, 输出路径, 分组, 输入签名)
+    stats = {'written': 0, 'kept': 0, 'removed': 0}
+    
+    for i, (group, group_filename) in enumerate(zip(groups, generate_group_filenames(groups))):
         group_lines = sum(f['lines'] for f in group)
-        group_filename = generate_group_filename(group, i)
+        output_path = os.path.join(MERGED_FOLDER, group_filename)
+        signature = group_signature(group)
+        planned.add(group_filename)
+        
+        # 成员和内容都没变、合集和当前版本的偏移表也都还在时保留原合集
+        previous = manifest.get(group_filename)
+        unchanged = (not full and previous and previous.get('files') == signature
+                     and os.path.exists(output_path) and has_current_offsets(output_path))
         
-        print(f"\n📁 合并文件 {i+1}/{len(groups)}: {group_filename}")
-        print(f"   包含 {len(group)} 个文件，共 {group_lines} 行")
+        print(f"\n📁 合并文件 {i+1}/{len(groups)}: {group_filename}{'（未变化）' if unchanged else ''}")
+        if max_tokens:
+            print(f"   包含 {len(group)} 个文件，共 {group_lines} 行，约 {bundle_tokens(group)} token")
+        else:
+            print(f"   包含 {len(group)} 个文件，共 {group_lines} 行")
+        
+        if unchanged:
+            stats['kept'] += 1
         
         if dry_run:
             # 预览模式：只显示文件列表
@@ -247,26 +488,54 @@ def merge_files(file_info, max_lines_per_group, dry_run=True):
                 print(f"   - {file_data['filename'][:50]}... ({date_str}, {file_data['lines']}行)")
             if len(group) > 5:
                 print(f"   ... 还有 {len(group) - 5} 个文件")
+        elif unchanged:
+            new_manifest[group_filename] = previous
+            print(f"   ⏭️ 成员和内容未变化，保留现有文件")
         else:
-            # 执行模式：实际合并
-            try:
-                merged_content = create_merged_content(group, group_filename)
-                output_path = os.path.join(MERGED_FOLDER, group_filename)
-                
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(merged_content)
-                
-                actual_lines = len(merged_content.split('\n'))
+            pending.append((group_filename, output_path, group, signature))
+    
+    if pending:
+        # 执行模式：实际合并（各合集互不依赖，jobs > 1 时在进程池中并行生成）
+        jobs = max(1, min(jobs, len(pending)))
+        merged_at = datetime.now()
+        bundle_jobs = [(group, group_filename, output_path, merged_at, jobs == 1)
+                       for group_filename, output_path, group, _ in pending]
+        print(f"\n✍️ 生成 {len(pending)} 个合集{f'（{jobs} 个进程）' if jobs > 1 else ''}")
+        start = time.perf_counter()
+        
+        with ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext() as executor:
+            results = executor.map(build_bundle, bundle_jobs) if executor else map(build_bundle, bundle_jobs)
+            for (group_filename, output_path, _, signature), (actual_lines, seconds, error) in zip(pending, results):
+                if error:
+                    print(f"   ❌ 合并失败: {group_filename}: {error}")
+                    continue
+                new_manifest[group_filename] = {'files': signature, 'lines': actual_lines}
+                stats['written'] += 1
                 print(f"   ✅ 成功创建: {output_path}")
-                print(f"   📄 实际行数: {actual_lines}")
-                
-            except Exception as e:
-                print(f"   ❌ 合并失败: {e}")
+                print(f"   📄 实际行数: {actual_lines} | ⏱️ 用时: {seconds:.2f}秒")
+        
+        print(f"⏱️ 生成合集总用时: {time.perf_counter() - start:.2f}秒")
+    
+    # 清单中有、本次不再生成的旧合集（例如末尾合集加入新文章后文件名变化）
+    stale = sorted(set(manifest) - planned)
+    for stale_filename in stale:
+        stale_path = os.path.join(MERGED_FOLDER, stale_filename)
+        if dry_run:
+            print(f"\n🗑️ 将删除过时的合集: {stale_filename}")
+        elif os.path.exists(stale_path):
+            os.remove(stale_path)
+            if os.path.exists(offsets_path(stale_path)):
+                os.remove(offsets_path(stale_path))
+            stats['removed'] += 1
+            print(f"\n🗑️ 已删除过时的合集: {stale_filename}")
     
     if not dry_run:
+        save_manifest(MERGED_FOLDER, new_manifest)
         print(f"\n🎉 合并完成！")
         print(f"📁 输出目录: {MERGED_FOLDER}")
-        print(f"📊 生成 {len(groups)} 个合并文件")
+        print(f"📊 共 {len(groups)} 个合并文件：重写 {stats['written']} 个，保留 {stats['kept']} 个，删除过时 {stats['removed']} 个")
+    elif manifest and not full:
+        print(f"\n📊 增量合并：{stats['kept']} 个合集未变化，{len(groups) - stats['kept']} 个需要重写")
 
 def main():
     """主函数"""
@@ -275,6 +544,12 @@ def main():
                        help='执行合并（默认为预览模式）')
     parser.add_argument('-l', '--lines', type=int, default=DEFAULT_MAX_LINES,
                        help=f'每个合并文件的最大行数（默认{DEFAULT_MAX_LINES}）')
+    parser.add_argument('--max-tokens', type=int, default=None,
+                       help='按token预算分组：每个合集不超过该token数（指定后忽略 -l）')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='并行生成合集的进程数（默认1，即串行）')
+    parser.add_argument('--full', action='store_true',
+                       help='忽略合集清单，重写全部合集（默认只重写成员或内容有变化的合集）')
     
     args = parser.parse_args()
     
@@ -285,22 +560,29 @@ def main():
     print("=" * 50)
     
     # 分析文件
-    file_info, total_lines = analyze_files()
+    index = MarkdownIndex()
+    file_info, total_lines = analyze_files(index)
     
     if not file_info:
         print("\n❌ 没有找到Markdown文件。")
         return
     
     # 预估合并后的文件数
-    estimated_groups = (total_lines + args.lines - 1) // args.lines
+    if args.max_tokens:
+        total_tokens = sum(f['tokens'] for f in file_info)
+        estimated_groups = (total_tokens + args.max_tokens - 1) // args.max_tokens
+    else:
+        estimated_groups = (total_lines + args.lines - 1) // args.lines
     print(f"\n📊 预估将生成 {estimated_groups} 个合并文件")
     
     # 执行合并
-    merge_files(file_info, args.lines, dry_run=not args.execute)
+    merge_files(file_info, args.lines, dry_run=not args.execute, full=args.full, jobs=args.jobs,
+                max_tokens=args.max_tokens)
     
     if not args.execute:
         print(f"\n💡 如需执行合并，请运行: python merge_md_files.py -e")
         print(f"💡 自定义行数限制: python merge_md_files.py -e -l 800")
+        print(f"💡 按token预算分组: python merge_md_files.py -e --max-tokens 100000")
 
 if __name__ == "__main__":
     main()
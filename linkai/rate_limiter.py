@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 自适应速率限制器
+用令牌桶替代固定的请求间隔/批次间隔/重试间隔
+
+功能特点：
+- 双预算：每秒请求数（RPS）和每分钟token数（TPM）两个令牌桶同时生效
+- AIMD自适应：遇到429/5xx/超时时速率减半（乘性减少），每次成功后逐步加回（加性增加），
+  最高不超过配置的RPS预算
+- 线程安全：并发模式下所有工作线程共用一个限制器
+- 非阻塞预约：reserve() 只返回需要等待的秒数，便于在asyncio中使用
+
+使用方法：
+    limiter = AdaptiveRateLimiter(requests_per_second=2, tokens_per_minute=60000)
+    limiter.acquire(tokens=1200)   # 阻塞直到两个预算都允许
+    limiter.on_success()           # 请求成功
+    limiter.on_throttle()          # 429/5xx/超时
+    limiter.on_throttle(pause=30)  # 服务端返回 Retry-After: 30
+"""
+
+import time
+import threading
+
+# 默认预算
+DEFAULT_REQUESTS_PER_SECOND = 2.0  # 每秒请求数上限
+DEFAULT_TOKENS_PER_MINUTE = 0  # 每分钟token上限，0表示不限制
+
+# AIMD参数
+MIN_REQUESTS_PER_SECOND = 0.05  # 速率下限（最慢20秒一个请求）
+DECREASE_FACTOR = 0.5  # 被限流时速率乘以该系数
+INCREASE_RATIO = 0.1  # 每次成功增加预算的10%
+
+class AdaptiveRateLimiter:
+    """RPS + TPM 双令牌桶，按AIMD调整RPS"""
+
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        """
+        初始化速率限制器
+
+        Args:
+            requests_per_second: 每秒请求数预算（也是AIMD的上限）
+            tokens_per_minute: 每分钟token预算，0表示不限制
+        """
+        self.max_rate = max(MIN_REQUESTS_PER_SECOND, float(requests_per_second))
+        self.rate = self.max_rate
+        self.tokens_per_minute = max(0, int(tokens_per_minute or 0))
+
+        self._request_bucket = 1.0
+        self._token_bucket = float(self.tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'throttle_events': 0,
+            'total_wait': 0.0,
+            'min_rate': self.rate
+        }
+
+    @property
+    def burst(self):
+        """请求桶容量：允许的瞬时突发请求数"""
+        return max(1.0, self.rate)
+
+    def _refill(self, now):
+        """按流逝时间补充两个令牌桶"""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_bucket = min(self.burst, self._request_bucket + elapsed * self.rate)
+        if self.tokens_per_minute:
+            self._token_bucket = min(float(self.tokens_per_minute),
+                                     self._token_bucket + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens=0):
+        """
+        预约一次请求（不阻塞）
+
+        Args:
+            tokens: 本次请求预计消耗的token数
+
+        Returns:
+            调用方需要等待的秒数
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            # 允许桶余额为负：负数部分代表已经排队的预约
+            self._request_bucket -= 1
+            wait = max(0.0, -self._request_bucket / self.rate)
+
+            if self.tokens_per_minute and tokens:
+                self._token_bucket -= min(tokens, self.tokens_per_minute)
+                wait = max(wait, -self._token_bucket / (self.tokens_per_minute / 60))
+
+            self.stats['requests'] += 1
+            self.stats['total_wait'] += wait
+            return wait
+
+    def acquire(self, tokens=0):
+        """阻塞直到请求和token预算都允许发送"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        """请求成功：加性增加速率"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * INCREASE_RATIO)
+
+    def on_throttle(self, pause=None):
+        """
+        遇到429/5xx/超时：乘性减少速率，并清空突发额度
+
+        Args:
+            pause: 服务端通过Retry-After要求暂停的秒数，期间所有请求都会排队
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(MIN_REQUESTS_PER_SECOND, self.rate * DECREASE_FACTOR)
+            self._request_bucket = min(self._request_bucket, 0.0)
+            if pause:
+                # 桶余额为负即表示排队，-pause × rate 相当于暂停pause秒
+                self._request_bucket = min(self._request_bucket, -pause * self.rate)
+            self.stats['throttle_events'] += 1
+            self.stats['min_rate'] = min(self.stats['min_rate'], self.rate)
+
+    def print_stats(self):
+        """打印限速统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            rate = self.rate
+        if not stats['requests']:
+            return
+
+        print(f"\n🚦 速率限制统计:")
+        print(f"  📨 放行请求: {stats['requests']} 次")
+        print(f"  ⏳ 累计等待: {stats['total_wait']:.1f} 秒")
+        print(f"  🐢 限流降速: {stats['throttle_events']} 次（最低 {stats['min_rate']:.2f} 请求/秒）")
+        print(f"  ⚡ 当前速率: {rate:.2f} 请求/秒（上限 {self.max_rate:.2f}）")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+短文本打包
+把多个短输入合并进一次LLM请求，共用一份系统提示词和一次往返，再把回复按分隔符拆回各个文件
+
+功能特点：
+- 按token预算分组：只打包不超过 SHORT_INPUT_TOKENS 的短文本，每组合计不超过预算、最多 MAX_ITEMS_PER_PACK 篇
+- 分隔符回显：每篇输入用 <<<ARTICLE n>>> ... <<<END n>>> 包裹，要求模型原样用同样的分隔符包裹每篇输出
+- 拆分校验：编号必须恰好是 1..n 且每篇内容非空，否则视为拆分失败，由调用方回退为逐篇请求
+
+使用方法：
+    from request_packer import plan_packs, format_packed_input, split_packed_output
+    groups = plan_packs([count_tokens(text) for text in texts], max_tokens=3000)
+    packed_text = format_packed_input([texts[i] for i in groups[0]])
+    outputs = split_packed_output(content, len(groups[0]))  # 校验失败返回None
+"""
+
+import re
+
+# 打包配置
+DEFAULT_PACK_TOKENS = 3000  # 每个打包请求的输入token预算
+SHORT_INPUT_TOKENS = 800  # 不超过该token数的输入才参与打包
+MAX_ITEMS_PER_PACK = 5  # 每个打包请求最多合并的篇数（回复长度随篇数增长，过多容易超时）
+
+ARTICLE_START = "<<<ARTICLE {index}>>>"
+ARTICLE_END = "<<<END {index}>>>"
+
+_SECTION_PATTERN = re.compile(r'<<<ARTICLE (\d+)>>>(.*?)<<<END \1>>>', re.S)
+
+# 追加在用户提示词末尾的输出格式说明
+PACK_INSTRUCTIONS = """注意：以上共有 {count} 篇相互独立的内容，每篇都用 <<<ARTICLE 编号>>> 和 <<<END 编号>>> 包裹。
+请分别整理每一篇，互不合并，并按原编号顺序输出；每篇输出都必须以 <<<ARTICLE 编号>>> 单独一行开头、以 <<<END 编号>>> 单独一行结尾，
+分隔符之外不要输出任何内容。"""
+
+def plan_packs(token_counts, max_tokens=DEFAULT_PACK_TOKENS, short_tokens=SHORT_INPUT_TOKENS,
+               max_items=MAX_ITEMS_PER_PACK):
+    """
+    按输入顺序把短输入分组，长输入单独成组
+
+    Args:
+        token_counts: 每个输入的token数
+        max_tokens: 每组合计token上限
+        short_tokens: 超过该token数的输入不参与打包
+        max_items: 每组最多几篇
+
+    Returns:
+        分组列表，每组是输入下标的列表（单篇的组按普通请求处理）
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+
+    for index, tokens in enumerate(token_counts):
+        if tokens > short_tokens or tokens > max_tokens:
+            groups.append([index])
+            continue
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+
+    # 长输入提前成组，按各组第一篇的位置恢复原顺序
+    groups.sort(key=lambda group: group[0])
+    return groups
+
+def format_packed_input(sections):
+    """用编号分隔符包裹每篇输入，并在末尾追加输出格式说明"""
+    parts = [f"{ARTICLE_START.format(index=index)}\n{section.strip()}\n{ARTICLE_END.format(index=index)}"
+             for index, section in enumerate(sections, 1)]
+    parts.append(PACK_INSTRUCTIONS.format(count=len(sections)))
+    return '\n\n'.join(parts)
+
+def split_packed_output(content, count):
+    """
+    按分隔符把打包回复拆回各篇
+
+    Returns:
+        按编号顺序的内容列表；编号不是恰好 1..count、有重复或某篇为空时返回None
+    """
+    if not content:
+        return None
+
+    outputs = {}
+    for match in _SECTION_PATTERN.finditer(content):
+        index = int(match.group(1))
+        text = match.group(2).strip()
+        if index in outputs or not text:
+            return None
+        outputs[index] = text
+
+    if sorted(outputs) != list(range(1, count + 1)):
+        return None
+    return [outputs[index] for index in range(1, count + 1)]
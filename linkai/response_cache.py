@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存
+按（模型、温度、系统提示词、用户提示词）的哈希缓存API返回结果，存储在本地SQLite中
+
+功能特点：
+- 内容寻址：缓存键只取决于请求内容，与文件名无关，重命名文件或中断后重跑都能直接命中
+- 淘汰策略：超过 max_age_days 未使用的条目被删除；总大小超过 max_size_mb 时按最近使用时间淘汰
+- 线程安全：并发模式下多个工作线程共用一个连接
+- 可关闭：各处理器均支持 --no-cache 参数
+
+使用方法：
+    cache = ResponseCache()
+    key = make_cache_key(model, temperature, messages)
+    content = cache.get(key)
+    if content is None:
+        content = ...  # 调用API
+        cache.put(key, model, content)
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# 缓存配置
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_response_cache.sqlite3')
+DEFAULT_MAX_SIZE_MB = 500  # 缓存总大小上限（MB）
+DEFAULT_MAX_AGE_DAYS = 90  # 超过该天数未使用的条目会被淘汰
+EVICT_EVERY_PUTS = 100  # 每写入多少条检查一次淘汰
+
+def make_cache_key(model, temperature, messages):
+    """根据模型、温度和全部消息（系统提示词 + 用户提示词）生成缓存键"""
+    payload = json.dumps({
+        'model': model,
+        'temperature': temperature,
+        'messages': [[m.get('role'), m.get('content')] for m in messages]
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """基于SQLite的LLM响应缓存"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_size_mb=DEFAULT_MAX_SIZE_MB,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite数据库文件路径
+            max_size_mb: 缓存总大小上限（MB）
+            max_age_days: 条目最长未使用天数
+        """
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evicted': 0}
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """读取缓存，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, last_access FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.stats['misses'] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats['hits'] += 1
+            return row[0]
+
+    def put(self, key, model, response):
+        """写入缓存（空响应不缓存）"""
+        if not response:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+            self.stats['writes'] += 1
+            self._puts_since_evict += 1
+            need_evict = self._puts_since_evict >= EVICT_EVERY_PUTS
+        if need_evict:
+            self.evict()
+
+    def delete(self, key):
+        """删除一条缓存（例如打包回复拆分失败，避免下次再命中同一个无效结果）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def evict(self):
+        """按年龄和总大小淘汰条目，返回淘汰数量"""
+        with self._lock:
+            self._puts_since_evict = 0
+            cutoff = time.time() - self.max_age_seconds
+            removed = self._conn.execute("DELETE FROM responses WHERE last_access < ?", (cutoff,)).rowcount
+
+            total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total_size > self.max_size_bytes:
+                # 按最近使用时间从旧到新删除，直到总大小回到上限以内
+                excess = total_size - self.max_size_bytes
+                stale_keys = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    if excess <= 0:
+                        break
+                    stale_keys.append((key,))
+                    excess -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+                removed += len(stale_keys)
+
+            self._conn.commit()
+            self.stats['evicted'] += removed
+            return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        """打印缓存命中统计"""
+        stats = dict(self.stats)
+        if not stats['hits'] and not stats['misses']:
+            return
+
+        total = stats['hits'] + stats['misses']
+        print(f"\n💾 响应缓存统计:")
+        print(f"  ✅ 命中: {stats['hits']} 次（{stats['hits'] / total * 100:.1f}%）")
+        print(f"  ➖ 未命中: {stats['misses']} 次")
+        if stats['evicted']:
+            print(f"  🧹 淘汰: {stats['evicted']} 条")
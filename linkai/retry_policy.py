@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 重试策略
+取代固定间隔重试：按错误类型分别计算重试预算，指数退避 + 完全抖动，并遵守服务端的 Retry-After
+
+功能特点：
+- 错误分类：超时、连接错误、限流(429)、服务端错误(5xx)、客户端错误(其他4xx)、响应格式异常、其他异常
+- 分类预算：每类错误有独立的最大重试次数，另有单次调用的总重试上限
+- 完全抖动：等待时间在 [0, min(上限, 基数 × 2^n)] 内均匀随机，避免大量请求同时重试形成重试风暴
+- Retry-After：服务端给出等待时间（秒数或HTTP日期）时以它为准，不低于服务端要求
+- 统计：退避次数、累计退避时间、采用Retry-After次数、预算耗尽次数写入 retry_stats
+
+使用方法：
+    policy = RetryPolicy()
+    state = policy.new_state()
+    delay = state.next_delay('rate_limit', retry_after=parse_retry_after(headers.get('Retry-After')))
+    if delay is None:
+        ...  # 该类错误的重试预算已用完
+    else:
+        time.sleep(delay)
+"""
+
+import time
+import random
+from email.utils import parsedate_to_datetime
+
+# 错误类型
+ERROR_TIMEOUT = 'timeout'
+ERROR_CONNECTION = 'connection'
+ERROR_RATE_LIMIT = 'rate_limit'
+ERROR_SERVER = 'server'
+ERROR_CLIENT = 'client'
+ERROR_BAD_RESPONSE = 'bad_response'
+ERROR_OTHER = 'other'
+
+ERROR_LABELS = {
+    ERROR_TIMEOUT: '超时',
+    ERROR_CONNECTION: '连接错误',
+    ERROR_RATE_LIMIT: '限流(429)',
+    ERROR_SERVER: '服务端错误(5xx)',
+    ERROR_CLIENT: '客户端错误(4xx)',
+    ERROR_BAD_RESPONSE: '响应格式异常',
+    ERROR_OTHER: '其他错误',
+}
+
+# 每类错误的最大重试次数（不含第一次请求）
+DEFAULT_RETRY_BUDGETS = {
+    ERROR_TIMEOUT: 2,
+    ERROR_CONNECTION: 2,
+    ERROR_RATE_LIMIT: 5,
+    ERROR_SERVER: 2,
+    ERROR_CLIENT: 1,
+    ERROR_BAD_RESPONSE: 2,
+    ERROR_OTHER: 2,
+}
+MAX_TOTAL_RETRIES = 6  # 单次调用的总重试上限
+
+# 退避参数
+BASE_DELAY = 1.0  # 第一次重试的退避上限（秒）
+MAX_DELAY = 60.0  # 单次退避上限（秒）
+MAX_RETRY_AFTER = 300.0  # 服务端要求的等待时间超过该值时按该值处理
+
+def classify_status(status_code):
+    """按HTTP状态码判断错误类型"""
+    if status_code == 429:
+        return ERROR_RATE_LIMIT
+    if status_code >= 500:
+        return ERROR_SERVER
+    if 400 <= status_code < 500:
+        return ERROR_CLIENT
+    return ERROR_OTHER
+
+def parse_retry_after(value):
+    """解析Retry-After头（秒数或HTTP日期），无法解析时返回None"""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+    return min(MAX_RETRY_AFTER, max(0.0, seconds))
+
+class RetryPolicy:
+    """指数退避 + 完全抖动的重试策略"""
+
+    def __init__(self, budgets=None, max_total_retries=MAX_TOTAL_RETRIES,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY, stats=None, stats_lock=None):
+        """
+        初始化重试策略
+
+        Args:
+            budgets: 各类错误的最大重试次数，未给出的类型使用默认值
+            max_total_retries: 单次调用的总重试上限
+            base_delay: 退避基数（秒）
+            max_delay: 单次退避上限（秒）
+            stats: 统计字典（一般传入 linkai_client.retry_stats）
+            stats_lock: 保护统计字典的锁
+        """
+        self.budgets = dict(DEFAULT_RETRY_BUDGETS, **(budgets or {}))
+        self.max_total_retries = max_total_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = stats
+        self.stats_lock = stats_lock
+
+    def new_state(self):
+        """为一次API调用创建重试状态"""
+        return RetryState(self)
+
+    def backoff(self, retry_index):
+        """完全抖动：在 [0, min(max_delay, base_delay × 2^retry_index)] 内随机取值"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** retry_index))
+        return random.uniform(0, ceiling)
+
+    def record(self, name, amount=1):
+        """累加统计"""
+        if self.stats is None:
+            return
+        if self.stats_lock is not None:
+            with self.stats_lock:
+                self.stats[name] = self.stats.get(name, 0) + amount
+        else:
+            self.stats[name] = self.stats.get(name, 0) + amount
+
+class RetryState:
+    """单次API调用的重试计数"""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.counts = {}
+        self.total = 0
+
+    def exhausted(self, error_class):
+        """该类错误或总重试次数是否已用完"""
+        budget = self.policy.budgets.get(error_class, 0)
+        return self.counts.get(error_class, 0) >= budget or self.total >= self.policy.max_total_retries
+
+    def next_delay(self, error_class, retry_after=None):
+        """
+        登记一次失败并计算重试前的等待时间
+
+        Returns:
+            等待秒数；预算已用完时返回None
+        """
+        if self.exhausted(error_class):
+            self.policy.record('budget_exhausted')
+            return None
+
+        retry_index = self.counts.get(error_class, 0)
+        self.counts[error_class] = retry_index + 1
+        self.total += 1
+
+        delay = self.policy.backoff(retry_index)
+        if retry_after is not None:
+            # 服务端给出的等待时间是下限，再加少量抖动把重试错开
+            delay = retry_after + random.uniform(0, self.policy.base_delay)
+            self.policy.record('retry_after_honored')
+
+        self.policy.record('backoff_count')
+        self.policy.record('backoff_seconds', delay)
+        return delay
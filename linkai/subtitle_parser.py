@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VTT/SRT字幕解析器
+逐行读取一遍字幕，同时取出 run_channel_downloader.py 写在文件开头的元信息和全部字幕条目，
+不再借助临时文件和 webvtt 库二次读取
+
+功能特点：
+- 单遍流式解析：按行消费文件对象，边读边产出字幕条目，不需要把整个文件读进内存
+- 元信息：第一条字幕之前的 "# 视频发布时间: ..."、"# 视频标题: ..." 行解析为 publish_date / title
+- 兼容输入：UTF-8 BOM、CRLF 换行；文件路径输入时由 text_reader 检测编码（UTF-8/GBK/UTF-16等）
+- VTT：去掉 <c>、<00:00:01.000> 等行内标签并还原 &amp; 等HTML实体，跳过 NOTE / STYLE / REGION 块
+- SRT：序号行可有可无，只有紧跟时间轴的纯数字行才视为序号
+- 缺少空行：块内再次出现时间轴行时开始新的字幕（紧挨着的纯数字行作为新字幕的序号）
+
+使用方法：
+    from subtitle_parser import parse_subtitle_file, parse_subtitle_string
+    cues, metadata = parse_subtitle_file("video.vtt")   # metadata 没有元信息时为None
+    cues, metadata = parse_subtitle_string(content, fmt='srt')
+    text = '\\n'.join(' '.join(cue.lines) for cue in cues)
+"""
+
+import io
+import os
+import re
+import html
+from collections import namedtuple
+
+from text_reader import open_text, read_text
+
+FORMAT_VTT = 'vtt'
+FORMAT_SRT = 'srt'
+
+# run_channel_downloader.py 写入的元信息行
+METADATA_PREFIXES = {
+    '# 视频发布时间:': 'publish_date',
+    '# 视频标题:': 'title',
+}
+
+_VTT_TAG_PATTERN = re.compile(r'<[^>]*>')
+
+# 一条字幕：start/end 为时间轴文本（如 "00:00:01.000"），lines 为去掉首尾空白后的非空文本行
+Cue = namedtuple('Cue', ['start', 'end', 'lines'])
+
+def detect_format(path):
+    """按扩展名判断字幕格式，无法判断时按VTT处理"""
+    return FORMAT_SRT if os.path.splitext(path)[1].lower() == '.srt' else FORMAT_VTT
+
+def _parse_timing(line):
+    """解析时间轴行 "开始 --> 结束 [VTT设置]"，返回 (开始, 结束)"""
+    start, _, rest = line.partition('-->')
+    end = rest.split()
+    return start.strip(), end[0] if end else ''
+
+def _clean_vtt_line(line):
+    return html.unescape(_VTT_TAG_PATTERN.sub('', line)).strip()
+
+def _block_to_cue(block, fmt):
+    """把一个以空行分隔的块转换为Cue；时间轴只能出现在第1行或第2行（第1行为序号/标识），否则不是字幕块"""
+    for index, line in enumerate(block[:2]):
+        if '-->' not in line:
+            continue
+        if index == 1 and fmt == FORMAT_SRT and not block[0].isdigit():
+            return None
+        start, end = _parse_timing(line)
+        lines = block[index + 1:]
+        if fmt == FORMAT_VTT:
+            lines = [cleaned for cleaned in map(_clean_vtt_line, lines) if cleaned]
+        return Cue(start, end, tuple(lines))
+    return None
+
+def _timing_index(block):
+    """块的前两行中时间轴行的位置，没有时为None"""
+    for index, line in enumerate(block[:2]):
+        if '-->' in line:
+            return index
+    return None
+
+def iter_cues(lines, fmt=FORMAT_VTT, metadata=None):
+    """
+    逐行解析字幕，按顺序产出Cue
+
+    Args:
+        lines: 可迭代的文本行（文件对象、列表等），行尾的 \\r\\n 会被去掉
+        fmt: FORMAT_VTT 或 FORMAT_SRT
+        metadata: 传入字典时，把第一条字幕之前的元信息写入其中
+
+    Raises:
+        ValueError: VTT格式但找不到 WEBVTT 标记
+    """
+    seen_header = fmt != FORMAT_VTT
+    in_preamble = True
+    block = []
+
+    for raw_line in lines:
+        line = raw_line.strip()
+        if in_preamble and not block:
+            line = line.lstrip('\ufeff')
+            if line.startswith('#'):
+                # 第一条字幕之前的 "# 键: 值" 为元信息（SRT文件开头也可能有）
+                if metadata is not None:
+                    for prefix, key in METADATA_PREFIXES.items():
+                        if line.startswith(prefix):
+                            metadata[key] = line[len(prefix):].strip()
+                continue
+
+        if not seen_header:
+            seen_header = line.startswith('WEBVTT')
+            continue
+
+        if line:
+            timing = _timing_index(block) if '-->' in line else None
+            if timing is not None:
+                # 字幕之间缺少空行：时间轴行开始新的字幕，前一行是纯数字的字幕文本时作为新字幕的序号
+                carry = [block.pop()] if len(block) - 1 > timing and block[-1].isdigit() else []
+                cue = _block_to_cue(block, fmt)
+                block = carry
+                if cue is not None:
+                    in_preamble = False
+                    yield cue
+            block.append(line)
+            continue
+        if block:
+            cue = _block_to_cue(block, fmt)
+            block = []
+            if cue is not None:
+                in_preamble = False
+                yield cue
+
+    if not seen_header:
+        raise ValueError("找不到WEBVTT标记")
+    if block:
+        cue = _block_to_cue(block, fmt)
+        if cue is not None:
+            yield cue
+
+def parse_subtitle_stream(f, fmt=FORMAT_VTT):
+    """
+    从文本文件对象或缓冲区解析字幕
+
+    Returns:
+        (Cue列表, 元信息字典)：没有元信息时字典为None
+    """
+    metadata = {}
+    cues = list(iter_cues(f, fmt, metadata))
+    return cues, metadata or None
+
+def parse_subtitle_string(content, fmt=FORMAT_VTT):
+    """从字符串解析字幕，返回值同 parse_subtitle_stream"""
+    return parse_subtitle_stream(io.StringIO(content), fmt)
+
+def parse_subtitle_file(path, fmt=None):
+    """
+    解析字幕文件，fmt为None时按扩展名判断格式，编码由 text_reader 检测
+
+    Returns:
+        (Cue列表, 元信息字典)：没有元信息时字典为None
+
+    Raises:
+        UnicodeDecodeError: 所有候选编码都无法解码
+        ValueError: VTT格式但找不到 WEBVTT 标记
+    """
+    fmt = fmt or detect_format(path)
+    try:
+        with open_text(path) as f:
+            return parse_subtitle_stream(f, fmt)
+    except UnicodeDecodeError:
+        # 探测范围之后才出现非法字节：整体读入后换用其他编码
+        return parse_subtitle_string(read_text(path), fmt)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LinkAI API 请求级遥测
+记录每次LLM调用的token数、耗时、所用密钥和状态，运行结束时生成JSON/CSV报告
+
+功能特点：
+- 逐请求记录：提示词/回复token数（优先取响应中的usage，没有时用token_counter估算）、耗时、密钥、状态
+- 延迟分布：成功请求的 p50 / p95 / p99 延迟
+- 吞吐：每秒生成token数（按请求耗时）和整体每秒token数（按运行总时长）
+- 积分统计：按密钥和模型汇总消耗的积分，单价从 credit_rates.json 读取（不配置则只统计token）
+- 耗时预估：读取最近一次运行报告的中位延迟，替代固定的"每个文件20秒"估算
+
+积分单价文件（credit_rates.json，按 https://docs.link-ai.tech/platform/funds/price 填写）：
+    {
+        "LinkAI-4.1-nano": {"per_request": 0, "prompt_per_1k": 0.0, "completion_per_1k": 0.0}
+    }
+
+使用方法：
+    telemetry = RunTelemetry(credit_rates=load_credit_rates())
+    telemetry.record(model, api_key, 200, latency=3.2, prompt_tokens=1200, completion_tokens=800)
+    telemetry.print_summary()
+    telemetry.write_report("linkai_reports/run_20250101_120000")  # 生成 .json 和 .csv
+"""
+
+import os
+import csv
+import glob
+import json
+import math
+import time
+import threading
+from datetime import datetime
+
+# 报告与单价文件位置
+DEFAULT_REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linkai_reports')
+DEFAULT_CREDIT_RATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'credit_rates.json')
+DEFAULT_SECONDS_PER_CALL = 20  # 没有历史报告时的单次调用耗时估算
+
+# token数来源
+TOKENS_FROM_USAGE = 'usage'
+TOKENS_ESTIMATED = 'estimate'
+
+CSV_FIELDS = ['time', 'model', 'key', 'status', 'latency', 'prompt_tokens', 'completion_tokens',
+              'token_source', 'stream', 'credits']
+
+def mask_key(api_key):
+    """报告中只保留密钥前缀"""
+    return f"{api_key[:20]}..." if api_key else ''
+
+def percentile(sorted_values, pct):
+    """最近秩法求百分位数（输入需已排序）"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def load_credit_rates(path=DEFAULT_CREDIT_RATES_FILE):
+    """读取积分单价文件，不存在或格式错误时返回空字典"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            rates = json.load(f)
+        return rates if isinstance(rates, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  读取积分单价文件失败 {path}: {e}")
+        return {}
+
+def estimate_seconds_per_call(report_dir=DEFAULT_REPORT_DIR, default=DEFAULT_SECONDS_PER_CALL):
+    """用最近一次运行报告的中位延迟估算单次调用耗时"""
+    reports = sorted(glob.glob(os.path.join(report_dir, '*.json')), key=os.path.getmtime)
+    for path in reversed(reports):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                p50 = json.load(f).get('latency', {}).get('p50')
+            if p50:
+                return p50
+        except (OSError, ValueError):
+            continue
+    return default
+
+def default_report_prefix(name, report_dir=DEFAULT_REPORT_DIR):
+    """默认报告路径前缀：linkai_reports/<脚本名>_<时间>"""
+    return os.path.join(report_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+class RunTelemetry:
+    """一次运行中所有LLM调用的记录与汇总（线程安全）"""
+
+    def __init__(self, credit_rates=None):
+        """
+        Args:
+            credit_rates: {模型: {"per_request": 积分, "prompt_per_1k": 积分, "completion_per_1k": 积分}}
+        """
+        self.credit_rates = credit_rates or {}
+        self.records = []
+        self.cache_hits = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def credits_for(self, model, prompt_tokens, completion_tokens):
+        """按单价计算一次成功调用的积分，未配置该模型时返回None"""
+        rate = self.credit_rates.get(model)
+        if not rate:
+            return None
+        return (rate.get('per_request', 0)
+                + prompt_tokens / 1000 * rate.get('prompt_per_1k', 0)
+                + completion_tokens / 1000 * rate.get('completion_per_1k', 0))
+
+    def record(self, model, api_key, status, latency, prompt_tokens=0, completion_tokens=0,
+               token_source=TOKENS_ESTIMATED, stream=False):
+        """
+        记录一次HTTP调用
+
+        Args:
+            status: HTTP状态码，异常时为错误类型（如 'timeout'）
+            latency: 从发出请求到读完响应的秒数
+        """
+        success = status == 200
+        credits = self.credits_for(model, prompt_tokens, completion_tokens) if success else None
+        with self._lock:
+            self.records.append({
+                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'model': model,
+                'key': mask_key(api_key),
+                'status': status,
+                'latency': round(latency, 3),
+                'prompt_tokens': prompt_tokens if success else 0,
+                'completion_tokens': completion_tokens if success else 0,
+                'token_source': token_source,
+                'stream': stream,
+                'credits': credits
+            })
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def summary(self):
+        """汇总延迟分布、吞吐和各密钥/模型的消耗"""
+        with self._lock:
+            records = list(self.records)
+            cache_hits = self.cache_hits
+        wall_seconds = time.time() - self.started_at
+
+        successes = [r for r in records if r['status'] == 200]
+        latencies = sorted(r['latency'] for r in successes)
+        prompt_tokens = sum(r['prompt_tokens'] for r in successes)
+        completion_tokens = sum(r['completion_tokens'] for r in successes)
+        busy_seconds = sum(latencies)
+
+        status_counts = {}
+        for r in records:
+            status_counts[str(r['status'])] = status_counts.get(str(r['status']), 0) + 1
+
+        def group_by(field):
+            groups = {}
+            for r in records:
+                group = groups.setdefault(r[field], {
+                    'requests': 0, 'successes': 0, 'prompt_tokens': 0,
+                    'completion_tokens': 0, 'credits': 0.0, 'unpriced_requests': 0
+                })
+                group['requests'] += 1
+                if r['status'] == 200:
+                    group['successes'] += 1
+                    group['prompt_tokens'] += r['prompt_tokens']
+                    group['completion_tokens'] += r['completion_tokens']
+                    if r['credits'] is None:
+                        group['unpriced_requests'] += 1
+                    else:
+                        group['credits'] += r['credits']
+            for group in groups.values():
+                group['credits'] = round(group['credits'], 4)
+            return groups
+
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).strftime('%Y-%m-%d %H:%M:%S'),
+            'wall_seconds': round(wall_seconds, 1),
+            'requests': len(records),
+            'successes': len(successes),
+            'cache_hits': cache_hits,
+            'status_counts': status_counts,
+            'latency': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'mean': round(busy_seconds / len(latencies), 3) if latencies else None,
+                'max': latencies[-1] if latencies else None
+            },
+            'tokens': {
+                'prompt': prompt_tokens,
+                'completion': completion_tokens,
+                'total': prompt_tokens + completion_tokens,
+                'completion_per_second': round(completion_tokens / busy_seconds, 1) if busy_seconds else None,
+                'throughput_per_second': round((prompt_tokens + completion_tokens) / wall_seconds, 1)
+                                         if wall_seconds else None,
+                'estimated_requests': sum(1 for r in successes if r['token_source'] == TOKENS_ESTIMATED)
+            },
+            'credits_total': round(sum(r['credits'] or 0 for r in successes), 4),
+            'credit_rates_configured': bool(self.credit_rates),
+            'keys': group_by('key'),
+            'models': group_by('model')
+        }
+
+    def write_report(self, path_prefix):
+        """写入 <前缀>.json（汇总）和 <前缀>.csv（逐请求明细），返回两个文件路径"""
+        directory = os.path.dirname(os.path.abspath(path_prefix))
+        os.makedirs(directory, exist_ok=True)
+
+        json_path = f"{path_prefix}.json"
+        csv_path = f"{path_prefix}.csv"
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            records = list(self.records)
+        with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+
+        return json_path, csv_path
+
+    def print_summary(self):
+        """打印运行报告摘要"""
+        summary = self.summary()
+        if not summary['requests'] and not summary['cache_hits']:
+            return
+
+        latency = summary['latency']
+        tokens = summary['tokens']
+        print(f"\n📈 请求遥测:")
+        print(f"  📨 请求: {summary['requests']} 次（成功 {summary['successes']} 次，缓存命中 {summary['cache_hits']} 次）")
+        if latency['p50'] is not None:
+            print(f"  ⏱️ 延迟: p50 {latency['p50']:.1f}秒 | p95 {latency['p95']:.1f}秒 | p99 {latency['p99']:.1f}秒")
+        print(f"  🔤 Token: 提示词 {tokens['prompt']} | 回复 {tokens['completion']}"
+              + (f"（其中 {tokens['estimated_requests']} 次为估算）" if tokens['estimated_requests'] else ""))
+        if tokens['completion_per_second'] is not None:
+            print(f"  ⚡ 生成速度: {tokens['completion_per_second']} token/秒（单请求） | "
+                  f"整体吞吐 {tokens['throughput_per_second']} token/秒")
+        if summary['credit_rates_configured']:
+            print(f"  💰 消耗积分: {summary['credits_total']}")
+            for key, stats in summary['keys'].items():
+                print(f"    {key}: {stats['credits']} 积分（{stats['successes']}/{stats['requests']} 次成功）")
+        else:
+            print(f"  💰 未配置积分单价（{os.path.basename(DEFAULT_CREDIT_RATES_FILE)}），只统计token")
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""linkai 下的模块按脚本方式互相导入（from token_counter import ...），测试时把 linkai 目录加入搜索路径"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+import api_key_pool
+from api_key_pool import ApiKeyPool
+
+
+class FakeManager:
+    """记录 refresh 调用，并检查调用时其他线程能否拿到密钥池的锁"""
+
+    def __init__(self, removed=(), added=()):
+        self.pool = None
+        self.calls = 0
+        self.lock_was_free = None
+        self.changes = (list(removed), list(added))
+
+    def refresh(self):
+        self.calls += 1
+        result = []
+
+        def probe():
+            acquired = self.pool._cond.acquire(blocking=False)
+            if acquired:
+                self.pool._cond.release()
+            result.append(acquired)
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        self.lock_was_free = result[0]
+        changes, self.changes = self.changes, ([], [])
+        return changes
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    monkeypatch.setattr(api_key_pool, 'REFRESH_INTERVAL', 0)
+
+    def make(keys, **changes):
+        manager = FakeManager(**changes)
+        manager.pool = ApiKeyPool(keys, max_in_flight=1, manager=manager)
+        return manager.pool, manager
+
+    return make
+
+
+def test_refresh_reads_key_file_without_holding_the_pool_lock(make_pool):
+    pool, manager = make_pool(['a', 'b'], removed=['a'], added=['c'])
+    assert pool.refresh_due()
+    pool.refresh()
+    assert manager.calls == 1
+    assert manager.lock_was_free
+    assert pool.keys == ['b', 'c']
+    assert pool.retired == ['a']
+
+
+def test_try_acquire_can_skip_the_refresh(make_pool):
+    pool, manager = make_pool(['a'])
+    assert pool.try_acquire(refresh=False) == 'a'
+    assert manager.calls == 0
+    assert pool.try_acquire(refresh=False) is None
+    pool.release('a')
+    assert pool.acquire() == 'a'
+    assert manager.calls == 1
+
+
+def test_refresh_is_throttled(make_pool, monkeypatch):
+    pool, manager = make_pool(['a'])
+    monkeypatch.setattr(api_key_pool, 'REFRESH_INTERVAL', 3600)
+    assert not pool.refresh_due()
+    pool.refresh()
+    assert manager.calls == 0
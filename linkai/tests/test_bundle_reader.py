@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import merge_md_files
+from bundle_reader import BundleReader, offsets_path
+from md_index import MarkdownIndex
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+
+
+@pytest.fixture
+def bundle(tmp_path, monkeypatch):
+    """三篇文章中第二篇为空文件：合并时被跳过，但目录序号仍然计入"""
+    md_folder = tmp_path / 'md'
+    md_folder.mkdir()
+    write(md_folder / '2020-05-01_first.md', "---\ntitle: 第一篇\n---\n\n第一篇正文\n")
+    write(md_folder / 'empty_2020-05-05.md', "")
+    write(md_folder / '2020-05-09_third.md', "# 第三篇\n\n第三篇正文\n")
+    monkeypatch.setattr(merge_md_files, 'MD_FOLDER', str(md_folder))
+
+    index = MarkdownIndex(str(tmp_path / 'index.sqlite3'))
+    file_info, _ = merge_md_files.analyze_files(index)
+    index.close()
+
+    output_path = str(tmp_path / 'bundle.md')
+    merge_md_files.write_merged_file(file_info, 'bundle.md', output_path, verbose=False)
+    return output_path
+
+
+def test_articles_are_looked_up_by_toc_number(bundle):
+    with BundleReader(bundle) as reader:
+        assert [article['index'] for article in reader.articles] == [1, 3]
+        assert reader.article(1).startswith("## 1. 2020-05-01_first\n")
+        assert reader.article(3).startswith("## 3. 2020-05-09_third\n")
+        assert reader.article(3).rstrip().endswith("第三篇正文")
+        with pytest.raises(IndexError):
+            reader.article(2)
+
+
+def test_offsets_match_bundle_content(bundle):
+    with open(bundle, 'rb') as f:
+        content = f.read()
+    with BundleReader(bundle) as reader:
+        for article in reader.articles:
+            raw = reader.article_bytes(article['index'])
+            assert content[article['offset']:article['offset'] + article['length']] == raw
+            assert content[article['offset'] + article['length']:].startswith(b"\n\n---\n")
+
+
+def test_article_by_source_and_metadata(bundle):
+    with BundleReader(bundle) as reader:
+        first = reader.articles[0]
+        assert first['title'] == '第一篇'
+        assert first['date'] == '2020-05-01'
+        assert reader.article_by_source('2020-05-09_third.md') == reader.article(3)
+
+
+def test_modified_bundle_is_rejected(bundle):
+    with open(bundle, 'a', encoding='utf-8') as f:
+        f.write("extra")
+    with pytest.raises(ValueError):
+        BundleReader(bundle)
+
+
+def test_old_offsets_version_is_rejected(bundle):
+    path = offsets_path(bundle)
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    data['version'] = 1
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    with pytest.raises(ValueError):
+        BundleReader(bundle)
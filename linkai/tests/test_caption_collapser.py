@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from caption_collapser import (
+    collapse_caption_text, collapse_cues_and_report, collapse_rolling_captions, collapse_rolling_cues,
+)
+from subtitle_parser import Cue
+
+
+def cue(start, end, *lines):
+    return Cue(start, end, tuple(lines))
+
+
+def test_rolling_english_lines_are_collapsed():
+    lines = [
+        "so today we are going",
+        "so today we are going",
+        "so today we are going to talk about",
+        "to talk about caching",
+    ]
+    assert collapse_rolling_captions(lines) == ["so today we are going", "to talk about", "caching"]
+
+
+def test_rolling_chinese_lines_are_collapsed():
+    lines = ["今天我们来聊一聊", "今天我们来聊一聊缓存的设计", "缓存的设计非常重要"]
+    assert collapse_rolling_captions(lines) == ["今天我们来聊一聊", "缓存的设计", "非常重要"]
+
+
+def test_non_rolling_chinese_keeps_repeated_phrases():
+    lines = ["大家看一下这个图", "这个图很重要", "看一下这个图", "很重要"]
+    assert collapse_rolling_captions(lines) == lines
+
+
+def test_non_rolling_english_keeps_repeated_phrases():
+    lines = ["we need to check the logs", "check the logs first", "then check the logs again", "the logs"]
+    assert collapse_rolling_captions(lines) == lines
+
+
+def test_short_prefix_is_not_treated_as_rolling():
+    assert collapse_rolling_captions(["这个", "这个图很重要"]) == ["这个", "这个图很重要"]
+
+
+def test_exact_repeat_of_previous_line_is_dropped():
+    assert collapse_caption_text("好的\n好的\n我们开始") == "好的\n我们开始"
+
+
+def test_overlapping_cues_collapse_suffix_prefix_overlap():
+    cues = [
+        cue("00:00:01.000", "00:00:04.000", "we are going to talk about"),
+        cue("00:00:03.000", "00:00:06.000", "to talk about caching today"),
+    ]
+    assert collapse_rolling_cues(cues) == ["we are going to talk about", "caching today"]
+
+
+def test_sequential_cues_keep_suffix_prefix_overlap():
+    cues = [
+        cue("00:00:01,000", "00:00:03,000", "我们先看一下这个图"),
+        cue("00:00:03,000", "00:00:05,000", "看一下这个图的右边"),
+    ]
+    assert collapse_rolling_cues(cues) == ["我们先看一下这个图", "看一下这个图的右边"]
+
+
+def test_overlapping_cues_rolling_chinese():
+    cues = [
+        cue("00:00:01.000", "00:00:03.500", "今天我们来聊一聊"),
+        cue("00:00:03.000", "00:00:06.000", "来聊一聊缓存的设计"),
+    ]
+    assert collapse_rolling_cues(cues) == ["今天我们来聊一聊", "缓存的设计"]
+
+
+def test_collapse_cues_and_report_counts_tokens(capsys):
+    cues = [
+        cue("00:00:01.000", "00:00:04.000", "so today we are going to talk"),
+        cue("00:00:03.000", "00:00:06.000", "we are going to talk about the weather"),
+    ]
+    text, before, after = collapse_cues_and_report(cues)
+    assert text == "so today we are going to talk\nabout the weather"
+    assert after < before
+    assert "滚动字幕去重" in capsys.readouterr().out
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import merge_md_files
+from bundle_reader import offsets_path
+from md_index import MarkdownIndex
+
+
+def write(path, text):
+    path.write_text(text, encoding='utf-8')
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    """三篇文章，每篇两行；max_lines_per_group=2 时每篇单独成一个合集"""
+    md_folder = tmp_path / 'md'
+    merged_folder = tmp_path / 'merged'
+    md_folder.mkdir()
+    write(md_folder / '2020-05-01_a.md', "第一篇\n正文\n")
+    write(md_folder / '2020-05-02_b.md', "第二篇\n正文\n")
+    write(md_folder / '2020-05-03_c.md', "第三篇\n正文\n")
+    monkeypatch.setattr(merge_md_files, 'MD_FOLDER', str(md_folder))
+    monkeypatch.setattr(merge_md_files, 'MERGED_FOLDER', str(merged_folder))
+    return md_folder, merged_folder, str(tmp_path / 'index.sqlite3')
+
+
+@pytest.fixture
+def built(monkeypatch):
+    """记录每次运行实际生成的合集"""
+    names = []
+    build_bundle = merge_md_files.build_bundle
+
+    def recording_build_bundle(job):
+        names.append(job[1])
+        return build_bundle(job)
+
+    monkeypatch.setattr(merge_md_files, 'build_bundle', recording_build_bundle)
+    return names
+
+
+def run_merge(index_path, **kwargs):
+    index = MarkdownIndex(index_path)
+    try:
+        file_info, _ = merge_md_files.analyze_files(index)
+    finally:
+        index.close()
+    merge_md_files.merge_files(file_info, 2, dry_run=False, **kwargs)
+
+
+BUNDLES = ['合集_2020-05-01_1篇.md', '合集_2020-05-02_1篇.md', '合集_2020-05-03_1篇.md']
+
+
+def test_unchanged_bundles_are_kept(folders, built):
+    _, merged_folder, index_path = folders
+    run_merge(index_path)
+    assert built == BUNDLES
+    assert sorted(merge_md_files.load_manifest(str(merged_folder))) == BUNDLES
+
+    built.clear()
+    run_merge(index_path)
+    assert built == []
+
+
+def test_only_the_changed_bundle_is_rewritten(folders, built):
+    md_folder, _, index_path = folders
+    run_merge(index_path)
+    write(md_folder / '2020-05-02_b.md', "第二篇\n改过的正文\n")
+
+    built.clear()
+    run_merge(index_path)
+    assert built == ['合集_2020-05-02_1篇.md']
+
+
+def test_bundle_without_offsets_is_rewritten(folders, built):
+    _, merged_folder, index_path = folders
+    run_merge(index_path)
+    os.remove(offsets_path(str(merged_folder / BUNDLES[0])))
+
+    built.clear()
+    run_merge(index_path)
+    assert built == [BUNDLES[0]]
+
+
+def test_full_rewrites_everything(folders, built):
+    _, _, index_path = folders
+    run_merge(index_path)
+
+    built.clear()
+    run_merge(index_path, full=True)
+    assert built == BUNDLES
+
+
+def test_stale_bundles_and_offsets_are_removed(folders, built):
+    md_folder, merged_folder, index_path = folders
+    run_merge(index_path)
+    os.remove(md_folder / '2020-05-03_c.md')
+
+    built.clear()
+    run_merge(index_path)
+    assert built == []
+    stale = merged_folder / BUNDLES[2]
+    assert not stale.exists()
+    assert not os.path.exists(offsets_path(str(stale)))
+    assert sorted(merge_md_files.load_manifest(str(merged_folder))) == BUNDLES[:2]
+
+
+def test_full_rewrite_still_removes_stale_bundles(folders, built):
+    md_folder, merged_folder, index_path = folders
+    run_merge(index_path)
+    os.remove(md_folder / '2020-05-03_c.md')
+
+    built.clear()
+    run_merge(index_path, full=True)
+    assert built == BUNDLES[:2]
+    assert not (merged_folder / BUNDLES[2]).exists()
+    assert not os.path.exists(offsets_path(str(merged_folder / BUNDLES[2])))
+
+
+def test_manifest_round_trip_and_version_check(tmp_path):
+    bundles = {'合集.md': {'files': [['a.md', 'abc']], 'lines': 10}}
+    merge_md_files.save_manifest(str(tmp_path), bundles)
+    assert merge_md_files.load_manifest(str(tmp_path)) == bundles
+
+    write(tmp_path / merge_md_files.MANIFEST_NAME, '{"version": 0, "bundles": {"x": {}}}')
+    assert merge_md_files.load_manifest(str(tmp_path)) == {}
+    write(tmp_path / merge_md_files.MANIFEST_NAME, 'not json')
+    assert merge_md_files.load_manifest(str(tmp_path)) == {}
+
+
+def test_groups_with_the_same_name_are_disambiguated(folders, built):
+    md_folder, merged_folder, index_path = folders
+    # 同一天的两篇文章各自成组，日期范围和篇数相同
+    write(md_folder / '2020-05-03_d.md', "第四篇\n正文\n")
+    run_merge(index_path)
+    assert built == BUNDLES[:2] + ['合集_2020-05-03_1篇_3.md', '合集_2020-05-03_1篇_4.md']
+    assert len(merge_md_files.load_manifest(str(merged_folder))) == 4
+
+
+def test_group_signature():
+    group = [
+        {'filename': 'a.md', 'entry': {'sha256': 'abc'}},
+        {'filename': 'b.md', 'entry': None},
+    ]
+    assert merge_md_files.group_signature(group) == [['a.md', 'abc'], ['b.md', None]]
+
+
+def test_group_files_by_tokens_fills_groups_in_order():
+    def article(name, tokens):
+        return {'filename': name, 'tokens': tokens}
+
+    file_info = [article('a', 100), article('b', 100), article('c', 100), article('d', 5000)]
+    budget = merge_md_files.bundle_tokens(file_info[:2])
+    groups = merge_md_files.group_files_by_tokens(file_info, budget)
+    assert [[f['filename'] for f in group] for group in groups] == [['a', 'b'], ['c'], ['d']]
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+import pytest
+
+import linkai_client
+from request_packer import format_packed_input, plan_packs, split_packed_output
+
+
+def packed(*sections):
+    """按 (编号, 内容) 拼出模型回复"""
+    return '\n'.join(f"<<<ARTICLE {index}>>>\n{text}\n<<<END {index}>>>" for index, text in sections)
+
+
+def test_split_returns_sections_in_order():
+    content = packed((1, "第一篇"), (2, "第二篇"), (3, "第三篇"))
+    assert split_packed_output(content, 3) == ["第一篇", "第二篇", "第三篇"]
+
+
+def test_split_ignores_text_outside_delimiters():
+    content = "好的，以下是整理结果：\n" + packed((1, "甲"), (2, "乙")) + "\n以上。"
+    assert split_packed_output(content, 2) == ["甲", "乙"]
+
+
+def test_split_restores_order_of_reordered_sections():
+    content = packed((2, "乙"), (1, "甲"))
+    assert split_packed_output(content, 2) == ["甲", "乙"]
+
+
+def test_split_fails_when_a_section_is_dropped():
+    assert split_packed_output(packed((1, "甲"), (3, "丙")), 3) is None
+    assert split_packed_output(packed((1, "甲"), (2, "乙")), 3) is None
+
+
+def test_split_fails_on_duplicate_or_extra_sections():
+    assert split_packed_output(packed((1, "甲"), (1, "甲"), (2, "乙")), 2) is None
+    assert split_packed_output(packed((1, "甲"), (2, "乙"), (3, "丙")), 2) is None
+
+
+def test_split_fails_on_empty_section_or_content():
+    assert split_packed_output(packed((1, "甲"), (2, "  ")), 2) is None
+    assert split_packed_output("", 2) is None
+    assert split_packed_output(None, 2) is None
+
+
+def test_split_fails_on_mismatched_end_delimiter():
+    content = "<<<ARTICLE 1>>>\n甲\n<<<END 2>>>\n" + packed((2, "乙"))
+    assert split_packed_output(content, 2) is None
+
+
+def test_format_round_trips_through_split():
+    sections = ["  第一篇\n", "第二篇\n第二行", "第三篇"]
+    text = format_packed_input(sections)
+    assert "共有 3 篇" in text
+    assert split_packed_output(text, 3) == ["第一篇", "第二篇\n第二行", "第三篇"]
+
+
+def test_plan_packs_groups_short_inputs_within_budget():
+    assert plan_packs([100, 100, 100], max_tokens=250) == [[0, 1], [2]]
+
+
+def test_plan_packs_limits_items_per_pack():
+    assert plan_packs([10] * 5, max_items=2) == [[0, 1], [2, 3], [4]]
+
+
+def test_plan_packs_keeps_long_inputs_alone_sorted_by_first_index():
+    assert plan_packs([100, 900, 100, 100], short_tokens=800) == [[0, 2, 3], [1]]
+    assert plan_packs([900, 100], short_tokens=800) == [[0], [1]]
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """替换网络请求：打包请求返回预设回复，单篇请求返回 "整理:输入"，并记录被丢弃的缓存条目"""
+    calls = {'packed_reply': None, 'single': [], 'discarded': []}
+
+    def call_linkai_api(messages, model, temperature=0.3):
+        if messages[0] == 'packed':
+            return calls['packed_reply']
+        calls['single'].append(messages[1])
+        return f"整理:{messages[1]}"
+
+    monkeypatch.setattr(linkai_client, 'call_linkai_api', call_linkai_api)
+    monkeypatch.setattr(linkai_client, 'discard_cached_response',
+                        lambda messages, model, temperature=0.3: calls['discarded'].append(messages))
+    monkeypatch.setattr(linkai_client, 'get_key_pool', lambda: SimpleNamespace(capacity=2))
+    return calls
+
+
+def call_packed(items):
+    return linkai_client.call_linkai_api_packed(
+        lambda group: ['packed', format_packed_input(group)], lambda item: ['single', item], items, 'model')
+
+
+def test_packed_call_splits_reply(fake_api):
+    fake_api['packed_reply'] = packed((2, "乙"), (1, "甲"))
+    assert call_packed(["a", "b"]) == ["甲", "乙"]
+    assert fake_api['single'] == []
+    assert fake_api['discarded'] == []
+
+
+def test_packed_call_falls_back_when_a_section_is_dropped(fake_api):
+    fake_api['packed_reply'] = packed((1, "甲"))
+    assert call_packed(["a", "b"]) == ["整理:a", "整理:b"]
+    assert sorted(fake_api['single']) == ["a", "b"]
+    assert len(fake_api['discarded']) == 1
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+import retry_policy
+from retry_policy import (ERROR_CLIENT, ERROR_OTHER, ERROR_RATE_LIMIT, ERROR_SERVER, ERROR_TIMEOUT,
+                          MAX_RETRY_AFTER, RetryPolicy, classify_status, parse_retry_after)
+
+
+@pytest.fixture
+def upper_bound(monkeypatch):
+    """让 random.uniform 总是取上限，退避时间变成确定值"""
+    monkeypatch.setattr(retry_policy.random, 'uniform', lambda low, high: high)
+
+
+@pytest.mark.parametrize('status, expected', [
+    (429, ERROR_RATE_LIMIT),
+    (500, ERROR_SERVER),
+    (503, ERROR_SERVER),
+    (400, ERROR_CLIENT),
+    (404, ERROR_CLIENT),
+    (302, ERROR_OTHER),
+])
+def test_classify_status(status, expected):
+    assert classify_status(status) == expected
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after(3) == 3.0
+
+
+def test_parse_retry_after_is_clamped():
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after("100000") == MAX_RETRY_AFTER
+
+
+def test_parse_retry_after_http_date():
+    seconds = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+    assert 25 <= seconds <= 31
+    assert parse_retry_after(formatdate(time.time() - 3600, usegmt=True)) == 0.0
+
+
+@pytest.mark.parametrize('value', [None, "", "soon", "Mon, 99 Foo 2020"])
+def test_parse_retry_after_rejects_bad_values(value):
+    assert parse_retry_after(value) is None
+
+
+def test_backoff_stays_within_full_jitter_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    for retry_index in range(8):
+        ceiling = min(10.0, 2 ** retry_index)
+        for _ in range(50):
+            assert 0 <= policy.backoff(retry_index) <= ceiling
+
+
+def test_backoff_ceiling_doubles_up_to_max_delay(upper_bound):
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    assert [policy.backoff(i) for i in range(5)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_each_error_class_has_its_own_budget(upper_bound):
+    state = RetryPolicy(budgets={ERROR_TIMEOUT: 2, ERROR_SERVER: 1}).new_state()
+    assert state.next_delay(ERROR_TIMEOUT) == 1.0
+    assert state.next_delay(ERROR_TIMEOUT) == 2.0
+    assert state.next_delay(ERROR_TIMEOUT) is None
+    # 超时的预算用完不影响服务端错误，且退避从头计算
+    assert state.next_delay(ERROR_SERVER) == 1.0
+    assert state.next_delay(ERROR_SERVER) is None
+
+
+def test_total_retries_are_capped_across_classes():
+    policy = RetryPolicy(budgets={ERROR_TIMEOUT: 5, ERROR_SERVER: 5}, max_total_retries=3, base_delay=0)
+    state = policy.new_state()
+    assert state.next_delay(ERROR_TIMEOUT) is not None
+    assert state.next_delay(ERROR_SERVER) is not None
+    assert state.next_delay(ERROR_TIMEOUT) is not None
+    assert state.next_delay(ERROR_SERVER) is None
+    assert state.exhausted(ERROR_TIMEOUT)
+
+
+def test_unknown_error_class_is_not_retried():
+    assert RetryPolicy().new_state().next_delay('unknown') is None
+
+
+def test_retry_after_is_a_floor(upper_bound):
+    state = RetryPolicy(base_delay=2.0).new_state()
+    # 第二次重试的退避上限是4秒，服务端要求30秒时以服务端为准，再加不超过 base_delay 的抖动
+    state.next_delay(ERROR_RATE_LIMIT)
+    assert state.next_delay(ERROR_RATE_LIMIT, retry_after=30.0) == 32.0
+
+
+def test_retry_after_jitter_is_bounded():
+    state = RetryPolicy(base_delay=1.0).new_state()
+    for _ in range(5):
+        assert 10.0 <= state.next_delay(ERROR_RATE_LIMIT, retry_after=10.0) <= 11.0
+
+
+def test_stats_are_recorded(upper_bound):
+    stats = {}
+    policy = RetryPolicy(budgets={ERROR_RATE_LIMIT: 2}, stats=stats, stats_lock=threading.Lock())
+    state = policy.new_state()
+    state.next_delay(ERROR_RATE_LIMIT)
+    state.next_delay(ERROR_RATE_LIMIT, retry_after=5.0)
+    state.next_delay(ERROR_RATE_LIMIT)
+    assert stats == {
+        'backoff_count': 2,
+        'backoff_seconds': 1.0 + 6.0,
+        'retry_after_honored': 1,
+        'budget_exhausted': 1,
+    }
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from subtitle_parser import FORMAT_SRT, FORMAT_VTT, detect_format, parse_subtitle_file, parse_subtitle_string
+
+
+def test_srt_basic():
+    content = "1\n00:00:01,000 --> 00:00:02,000\n第一句\n\n2\n00:00:02,000 --> 00:00:03,500\n第二句\n第二行\n"
+    cues, metadata = parse_subtitle_string(content, FORMAT_SRT)
+    assert metadata is None
+    assert [(c.start, c.end, c.lines) for c in cues] == [
+        ("00:00:01,000", "00:00:02,000", ("第一句",)),
+        ("00:00:02,000", "00:00:03,500", ("第二句", "第二行")),
+    ]
+
+
+def test_srt_without_blank_lines_between_cues():
+    content = ("1\n00:00:01,000 --> 00:00:02,000\n第一句\n"
+               "2\n00:00:02,000 --> 00:00:03,000\n第二句\n"
+               "00:00:03,000 --> 00:00:04,000\n第三句\n")
+    cues, _ = parse_subtitle_string(content, FORMAT_SRT)
+    assert [c.lines for c in cues] == [("第一句",), ("第二句",), ("第三句",)]
+    assert [c.start for c in cues] == ["00:00:01,000", "00:00:02,000", "00:00:03,000"]
+
+
+def test_srt_cue_without_text_followed_by_next_cue():
+    content = "1\n00:00:01,000 --> 00:00:02,000\n2\n00:00:02,000 --> 00:00:03,000\n第二句\n"
+    cues, _ = parse_subtitle_string(content, FORMAT_SRT)
+    assert [c.lines for c in cues] == [(), ("第二句",)]
+
+
+def test_srt_number_only_text_is_kept():
+    content = "1\n00:00:01,000 --> 00:00:02,000\n2024\n\n2\n00:00:02,000 --> 00:00:03,000\n好\n"
+    cues, _ = parse_subtitle_string(content, FORMAT_SRT)
+    assert [c.lines for c in cues] == [("2024",), ("好",)]
+
+
+def test_vtt_metadata_tags_and_notes():
+    content = ("# 视频发布时间: 2024-01-02\n# 视频标题: 测试\nWEBVTT\n\n"
+               "NOTE 这是注释\n\n"
+               "00:00:01.000 --> 00:00:02.000 align:start\n<c>Tom</c> &amp; Jerry<00:00:01.500>\n\n"
+               "id-2\n00:00:02.000 --> 00:00:03.000\nsecond\n")
+    cues, metadata = parse_subtitle_string(content, FORMAT_VTT)
+    assert metadata == {'publish_date': '2024-01-02', 'title': '测试'}
+    assert [c.lines for c in cues] == [("Tom & Jerry",), ("second",)]
+    assert cues[0].end == "00:00:02.000"
+
+
+def test_vtt_requires_header():
+    with pytest.raises(ValueError):
+        parse_subtitle_string("00:00:01.000 --> 00:00:02.000\ntext\n", FORMAT_VTT)
+
+
+def test_parse_file_with_bom_crlf_and_gbk(tmp_path):
+    path = tmp_path / 'video.srt'
+    path.write_bytes("1\r\n00:00:01,000 --> 00:00:02,000\r\n中文字幕\r\n".encode('gbk'))
+    assert detect_format(str(path)) == FORMAT_SRT
+    cues, _ = parse_subtitle_file(str(path))
+    assert cues[0].lines == ("中文字幕",)
+
+    path = tmp_path / 'video.vtt'
+    path.write_bytes("\ufeffWEBVTT\r\n\r\n00:00:01.000 --> 00:00:02.000\r\nhello\r\n".encode('utf-8'))
+    cues, _ = parse_subtitle_file(str(path))
+    assert cues[0].lines == ("hello",)
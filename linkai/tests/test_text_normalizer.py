@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import text_normalizer
+from text_normalizer import (
+    ALL_STEPS, STEP_FILLERS, STEP_SPACE, TextNormalizer, compact_punctuation, compact_whitespace,
+    parse_steps, remove_fillers, to_simplified,
+)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("你好吗？嗯，我很好。", "你好吗？我很好。"),
+    ("他说，呃，这个方案不错", "他说，这个方案不错"),
+    ("嗯，今天开始。", "今天开始。"),
+    ("然后然后我们就走了", "然后我们就走了"),
+    ("uh, we start now", "we start now"),
+])
+def test_remove_fillers(text, expected):
+    assert remove_fillers(text) == expected
+
+
+@pytest.mark.parametrize('text', ["好啊，走吧", "额度不够了", "这个问题很重要", "umbrella and hum"])
+def test_remove_fillers_keeps_words(text):
+    assert remove_fillers(text) == text
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("我们 今天 开始", "我们今天开始"),
+    ("你好 ， 世界", "你好，世界"),
+    ("我们 … 开始吧", "我们…开始吧"),
+    ("wait… then we go", "wait… then we go"),
+    ("ok , right", "ok, right"),
+    ("a　\tb\n\n\n\nc", "a b\n\nc"),
+])
+def test_compact_whitespace(text, expected):
+    assert compact_whitespace(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("真的吗？？？", "真的吗？"),
+    ("然后。。。", "然后…"),
+    ("好的，。", "好的。"),
+    ("，开头的逗号", "开头的逗号"),
+])
+def test_compact_punctuation(text, expected):
+    assert compact_punctuation(text) == expected
+
+
+def test_to_simplified():
+    assert to_simplified("這個問題") == "这个问题"
+    assert to_simplified("这个问题") == "这个问题"
+
+
+def test_builtin_table_keeps_valid_simplified_characters(monkeypatch):
+    monkeypatch.setattr(text_normalizer, 'opencc', None)
+    monkeypatch.setattr(text_normalizer, '_converter', None)
+    # "於" 在简体中也是规范字（姓氏），不能转换成 "于"
+    assert to_simplified("於先生說") == "於先生说"
+
+
+def test_parse_steps():
+    assert parse_steps("all") == ALL_STEPS
+    assert parse_steps("none") == ()
+    assert parse_steps("space, fillers") == (STEP_SPACE, STEP_FILLERS)
+    with pytest.raises(ValueError):
+        parse_steps("space,bogus")
+
+
+def test_normalizer_runs_enabled_steps_only():
+    assert TextNormalizer(()).normalize("嗯，這個 問題") == "嗯，這個 問題"
+    assert TextNormalizer((STEP_SPACE,)).normalize("嗯，這個 問題") == "嗯，這個問題"
+    assert TextNormalizer(ALL_STEPS).normalize("你好吗？嗯，這個 問題很重要！！") == "你好吗？这个问题很重要！"
+
+
+def test_normalizer_is_disabled_by_default():
+    assert not TextNormalizer().enabled
+    assert TextNormalizer().normalize("嗯，這個 問題") == "嗯，這個 問題"
+
+
+def test_normalize_and_report_counts_tokens():
+    normalizer = TextNormalizer(ALL_STEPS)
+    normalizer.normalize_and_report("嗯，嗯，我们 今天 开始。。。")
+    assert normalizer.stats['files'] == 1
+    assert normalizer.stats['tokens_after'] <= normalizer.stats['tokens_before']
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from md_index import open_body, scan_markdown
+from text_reader import SNIFF_BYTES, detect_encoding, open_text, read_text, read_text_with_encoding
+
+TEXT = "第一行 line one\n第二行 line two\n"
+
+
+@pytest.mark.parametrize('encoding, expected', [
+    ('utf-8', 'utf-8'),
+    ('utf-8-sig', 'utf-8-sig'),
+    ('gbk', 'gb18030'),
+    ('utf-16', 'utf-16'),
+    ('utf-16-le', 'utf-16-le'),
+    ('utf-16-be', 'utf-16-be'),
+    ('utf-32', 'utf-32'),
+])
+def test_detect_and_read(tmp_path, encoding, expected):
+    path = tmp_path / 'sample.txt'
+    path.write_bytes(TEXT.encode(encoding))
+    assert detect_encoding(str(path)) == expected
+    assert read_text(str(path)) == TEXT
+    with open_text(str(path)) as f:
+        assert f.read() == TEXT
+
+
+def test_invalid_bytes_after_sniff_window_fall_back(tmp_path):
+    path = tmp_path / 'late_gbk.txt'
+    text = 'a' * SNIFF_BYTES + '中文'
+    path.write_bytes(text.encode('gbk'))
+    assert read_text_with_encoding(str(path)) == (text, 'gb18030')
+
+
+def test_crlf_is_translated_like_text_mode(tmp_path):
+    path = tmp_path / 'crlf.txt'
+    path.write_bytes("一\r\n二\r三\n".encode('utf-8'))
+    assert read_text(str(path)) == "一\n二\n三\n"
+    assert read_text(str(path), newline='') == "一\r\n二\r三\n"
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'gbk', 'utf-16'])
+def test_markdown_body_offset_with_crlf(tmp_path, encoding):
+    path = tmp_path / 'article.md'
+    path.write_bytes("---\r\ntitle: 标题\r\n---\r\n\r\n正文第一行\r\n正文第二行\r\n".encode(encoding))
+    entry = scan_markdown(str(path))
+    assert entry['frontmatter'] == [['title', '标题']]
+    assert entry['lines'] == 6
+    with open_body(str(path), entry) as f:
+        assert f.read() == "\n\n正文第一行\n正文第二行\n"
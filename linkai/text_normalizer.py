@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发送给LLM之前的文本预处理
+系统提示词要求模型去掉"这个/那个"之类的口头语、整理空白和标点、输出简体中文，
+这些确定性的工作在本地先做掉，输入token更少，模型也不用再花输出token处理
+
+功能特点：
+- fillers：去掉独立出现的语气词（嗯、呃、啊、um、uh），句首犹豫用的"这个，""那个，"，以及"然后然后""就是就是"之类的连续重复，
+  删除后留在其他标点后面的逗号一并去掉
+- space：全角空格/制表符统一为空格，合并连续空白，去掉中文字符之间和中文标点两侧（另一侧也是中文时）的空格，去掉多余空行
+- punct：合并重复标点（"。。。"→"…"、"！！！"→"！"），逗号紧跟句号时只留句号，去掉行首的逗号
+- t2s：繁体转简体，优先使用opencc，未安装时按内置的常用字对照表转换（只收录简体中不会出现的繁体字）
+- 统计：每个文件打印预处理前后的token数，运行结束打印总计
+
+使用方法：
+    from text_normalizer import TextNormalizer, parse_steps
+    normalizer = TextNormalizer(parse_steps("fillers,space,punct,t2s"))  # 或 "all" / "none"
+    text = normalizer.normalize_and_report(text)  # 打印本文件减少的token数
+    normalizer.print_stats()                       # 打印整次运行的统计
+"""
+
+import re
+import threading
+
+from token_counter import count_tokens
+
+try:
+    import opencc
+except ImportError:
+    opencc = None
+
+STEP_FILLERS = 'fillers'
+STEP_SPACE = 'space'
+STEP_PUNCT = 'punct'
+STEP_T2S = 't2s'
+ALL_STEPS = (STEP_FILLERS, STEP_SPACE, STEP_PUNCT, STEP_T2S)
+
+_CJK = r'\u3400-\u4dbf\u4e00-\u9fff'
+_BOUNDARY = r'(?:(?<=^)|(?<=[\s，。！？；：、…,.!?;:]))'  # 行首、空白或标点之后
+_END = r'(?=[\s，。！？；：、…,.!?;:]|$)'  # 空白、标点或行尾之前
+
+# 语气词：只删除独立成词的（前后都是边界），"好啊"、"额度"等不受影响
+_HESITATION_PATTERN = re.compile(rf'{_BOUNDARY}(?:嗯|呃|额|啊)+[，,、…\s]*{_END}', re.M)
+_ENGLISH_FILLER_PATTERN = re.compile(r'\b(?:u+m+|u+h+|e+r+m+|h+m+)\b[,\s]*', re.I)
+# 句首犹豫用的"这个，""那个，"（后面紧跟停顿才算口头语，"这个问题"不受影响）
+_DEMONSTRATIVE_PATTERN = re.compile(rf'{_BOUNDARY}(?:这个|那个|這個|那個)[，,、…]+', re.M)
+# 连续重复的口头语只保留一次
+_REPEATED_FILLER_PATTERN = re.compile(r'(这个|那个|就是|然后|其实|所以|我觉得|对吧)(?:[，,、\s]*\1)+')
+# 删掉口头语后留下的逗号：紧跟在其他标点或行首之后的逗号/顿号（"好吗？嗯，我" -> "好吗？我"）
+_STRAY_COMMA_PATTERN = re.compile(r'(^|[，。！？；：、…,!?;:])[ \t]*[，,、]+', re.M)
+
+_SPACES_PATTERN = re.compile(r'[ \t\u3000\xa0]+')
+_CJK_SPACE_PATTERN = re.compile(rf'(?<=[{_CJK}]) (?=[{_CJK}])')
+_CJK_PUNCT = '，。！？；：、…“”‘’（）《》'
+# 中文标点两侧的空格只在另一侧也是中文字符或中文标点时去掉（英文的 "wait… then" 保持不变）
+_SPACE_BEFORE_PUNCT_PATTERN = re.compile(rf'(?<=[{_CJK}{_CJK_PUNCT}]) +(?=[{_CJK_PUNCT}])')
+_SPACE_AFTER_PUNCT_PATTERN = re.compile(rf'(?<=[{_CJK_PUNCT}]) +(?=[{_CJK}{_CJK_PUNCT}])')
+_ASCII_PUNCT_SPACE_PATTERN = re.compile(r' +(?=[,.!?;:](?:\s|$))')  # "ok , right" -> "ok, right"
+_BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+_ELLIPSIS_PATTERN = re.compile(r'(?:\.{3,}|。{2,}|…+)')
+_REPEATED_PUNCT_PATTERN = re.compile(r'([，。！？；：、,;!?])\1+')
+_COMMA_BEFORE_STOP_PATTERN = re.compile(r'[，,、]+([。！？!?…])')
+_LEADING_PUNCT_PATTERN = re.compile(r'^[，,、。；;：:]+', re.M)
+
+# 常用繁体字 -> 简体字（每两个字符一组；只收录简体文本中不会出现的繁体字，已是简体的文本转换后不变）
+_T2S_PAIRS = (
+    "這这個个們们說说話话來来為为對对時时會会後后過过還还問问題题現现實实點点經经麼么從从與与"
+    "學学習习開开關关電电網网頁页圖图書书機机長长見见覺觉讓让認认識识應应該该變变當当將将無无"
+    "體体頭头樣样國国際际動动產产業业歷历錢钱價价買买賣卖貨货幣币銀银資资給给質质費费員员組组"
+    "織织專专選选擇择條条務务須须義义語语調调請请讀读寫写聽听記记錄录論论設设計计區区別别總总"
+    "結结歡欢聯联復复雜杂難难簡简單单據据處处幾几萬万億亿種种類类東东車车馬马鳥鸟魚鱼門门間间"
+    "鐘钟視视號号碼码數数庫库絡络軟软內内風风險险雙双邊边帶带氣气樂乐觀观愛爱謝谢進进運运連连"
+    "達达遠远錯错鏈链幫帮嗎吗啟启師师辦办顯显顧顾額额願愿養养餘余飯饭館馆髮发發发參参雖虽標标"
+    "準准確确係系戶户帳账賬账證证詞词試试詳详誰谁課课談谈講讲議议護护財财貴贵貸贷賺赚虧亏賠赔"
+    "損损購购銷销鐵铁閱阅隊队陽阳陰阴陸陆隨随雲云靈灵韓韩順顺預预領领頻频顏颜飛飞驗验黨党齊齐"
+    "龍龙醫医華华嚴严圍围報报場场壞坏夢梦奮奋孫孙寶宝導导屬属歲岁島岛廣广張张彈弹態态憂忧戰战"
+    "擁拥擊击擔担攝摄斷断極极構构槍枪樓楼權权橫横歐欧殺杀況况測测減减湯汤滿满滅灭漲涨潛潜"
+    "濟济災灾熱热營营爭争牆墙獨独獲获環环畫画異异療疗盡尽監监盤盘眾众礎础禮礼稅税穩稳窮穷競竞"
+    "筆笔節节範范簽签籌筹紀纪約约紅红純纯級级紙纸細细終终統统絕绝維维綜综緊紧線线練练縣县績绩"
+    "續续罰罚聖圣聲声腦脑興兴舉举舊旧藝艺蘭兰蟲虫補补製制複复規规親亲觸触訊讯許许診诊評评誤误"
+    "説说貝贝負负責责貿贸賽赛趨趋跡迹輕轻輸输轉转農农鄉乡鄰邻釋释針针鍵键閉闭陳陈離离響响頂顶"
+    "項项飲饮驚惊髒脏鬆松魯鲁麥麦黃黄齒齿裡里裏里麵面臺台颱台錶表"
+)
+_T2S_TABLE = str.maketrans(dict(zip(_T2S_PAIRS[0::2], _T2S_PAIRS[1::2])))
+
+def parse_steps(spec):
+    """
+    解析预处理步骤，如 "fillers,space,punct,t2s"、"all"、"none"
+
+    Raises:
+        ValueError: 包含未知的步骤名
+    """
+    spec = (spec or '').strip().lower()
+    if spec in ('', 'none'):
+        return ()
+    if spec == 'all':
+        return ALL_STEPS
+    steps = tuple(step.strip() for step in spec.split(',') if step.strip())
+    unknown = [step for step in steps if step not in ALL_STEPS]
+    if unknown:
+        raise ValueError(f"未知的预处理步骤: {', '.join(unknown)}（可选：{', '.join(ALL_STEPS)}）")
+    return steps
+
+def remove_fillers(text):
+    """去掉独立的语气词、句首犹豫的"这个/那个"和连续重复的口头语，再去掉因此留在其他标点后面的逗号"""
+    text = _REPEATED_FILLER_PATTERN.sub(r'\1', text)
+    text = _DEMONSTRATIVE_PATTERN.sub('', text)
+    text = _HESITATION_PATTERN.sub('', text)
+    text = _ENGLISH_FILLER_PATTERN.sub('', text)
+    return _STRAY_COMMA_PATTERN.sub(r'\1', text)
+
+def compact_whitespace(text):
+    """合并空白：中文字符之间和中文标点两侧（另一侧也是中文时）不留空格，行首尾不留空格，最多保留一个空行"""
+    text = _SPACES_PATTERN.sub(' ', text.replace('\r\n', '\n'))
+    text = _CJK_SPACE_PATTERN.sub('', text)
+    text = _SPACE_BEFORE_PUNCT_PATTERN.sub('', text)
+    text = _SPACE_AFTER_PUNCT_PATTERN.sub('', text)
+    text = _ASCII_PUNCT_SPACE_PATTERN.sub('', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return _BLANK_LINES_PATTERN.sub('\n\n', text).strip()
+
+def compact_punctuation(text):
+    """合并重复标点，逗号紧跟句末标点时只留句末标点，去掉行首的逗号/句号"""
+    text = _ELLIPSIS_PATTERN.sub('…', text)
+    text = _REPEATED_PUNCT_PATTERN.sub(r'\1', text)
+    text = _COMMA_BEFORE_STOP_PATTERN.sub(r'\1', text)
+    return _LEADING_PUNCT_PATTERN.sub('', text)
+
+_converter = None
+_converter_failed = False
+
+def to_simplified(text):
+    """繁体转简体：优先opencc，不可用时使用内置对照表"""
+    global _converter, _converter_failed
+
+    if _converter is None and not _converter_failed and opencc is not None:
+        for config in ('t2s', 't2s.json'):
+            try:
+                _converter = opencc.OpenCC(config)
+                break
+            except Exception:
+                continue
+        else:
+            print("⚠️  初始化 opencc 失败，改用内置繁简对照表")
+            _converter_failed = True
+    if _converter is not None:
+        return _converter.convert(text)
+    return text.translate(_T2S_TABLE)
+
+class TextNormalizer:
+    """按配置的步骤预处理文本，并累计整次运行减少的token数（线程安全）"""
+
+    def __init__(self, steps=()):
+        """
+        Args:
+            steps: 要执行的步骤（ALL_STEPS 的子集），默认为空，即不做预处理
+        """
+        self.steps = tuple(step for step in ALL_STEPS if step in steps)
+        self.stats = {'files': 0, 'tokens_before': 0, 'tokens_after': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.steps)
+
+    def normalize(self, text):
+        """按固定顺序执行已启用的步骤（先繁转简，口头语规则只需匹配简体）"""
+        if not text or not self.enabled:
+            return text
+        if STEP_T2S in self.steps:
+            text = to_simplified(text)
+        if STEP_FILLERS in self.steps:
+            text = remove_fillers(text)
+        if STEP_PUNCT in self.steps:
+            text = compact_punctuation(text)
+        if STEP_SPACE in self.steps:
+            text = compact_whitespace(text)
+        return text
+
+    def normalize_and_report(self, text):
+        """预处理并打印本文件减少的token数，同时计入运行统计"""
+        if not text or not self.enabled:
+            return text
+        normalized = self.normalize(text)
+        before, after = count_tokens(text), count_tokens(normalized)
+        with self._lock:
+            self.stats['files'] += 1
+            self.stats['tokens_before'] += before
+            self.stats['tokens_after'] += after
+        if after < before:
+            print(f"  ✂️ 文本预处理: {before} → {after} token（减少 {(before - after) / before * 100:.1f}%）")
+        return normalized
+
+    def print_stats(self):
+        """打印整次运行的预处理统计"""
+        with self._lock:
+            stats = dict(self.stats)
+        if not stats['files'] or not stats['tokens_before']:
+            return
+
+        saved = stats['tokens_before'] - stats['tokens_after']
+        print(f"\n✂️ 文本预处理统计（{', '.join(self.steps)}）:")
+        print(f"  📄 文件: {stats['files']} 个")
+        print(f"  🔢 token: {stats['tokens_before']} → {stats['tokens_after']}"
+              f"（节省 {saved}，{saved / stats['tokens_before'] * 100:.1f}%）")
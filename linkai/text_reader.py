@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本文件编码检测与读取
+先看BOM、再试解码文件开头的一段字节来判断编码，整个文件只读取和解码一次，
+检测结果按（路径、大小、修改时间）缓存，同一个文件再次读取时不再检测
+
+功能特点：
+- BOM识别：UTF-8 BOM、UTF-16/UTF-32 BOM，无BOM的UTF-16按零字节分布识别
+- 有界探测：只解码开头 SNIFF_BYTES 字节判断 UTF-8 还是 GB18030（兼容GBK/GB2312）
+- 单次解码：读入全部字节后只按检测结果解码一次；探测范围之后才出现的非法字节会在内存中依次改用其他编码
+- 检测缓存：文件大小或修改时间变化后自动重新检测，多线程共用
+- 换行：与文本模式的 open() 一致，默认把 \r\n 和 \r 转换为 \n（newline='' 时保留原样）
+
+使用方法：
+    from text_reader import read_text, open_text, detect_encoding
+    text = read_text("transcript.txt")        # 无法解码时抛出 UnicodeDecodeError
+    with open_text("video.srt") as f:         # 流式读取
+        for line in f: ...
+    detect_encoding("article.md")             # 'utf-8' / 'utf-8-sig' / 'gb18030' / 'utf-16' ...
+"""
+
+import os
+import codecs
+import threading
+
+SNIFF_BYTES = 64 * 1024  # 探测编码时读取的字节数
+
+# 无BOM时按顺序尝试的编码（GB18030 是 GBK/GB2312 的超集）
+FALLBACK_ENCODINGS = ('utf-8', 'gb18030')
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),  # 必须在 UTF-16 LE 之前判断，二者前两个字节相同
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+_cache = {}  # 绝对路径 -> ((大小, 修改时间), 编码)
+_cache_lock = threading.Lock()
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def _sniff(prefix, complete):
+    """根据文件开头的字节判断编码；complete 表示 prefix 就是整个文件"""
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding
+
+    # 无BOM的UTF-16：ASCII字符的高位字节为0，零字节集中在奇数位或偶数位
+    sample = prefix[:4096]
+    if len(sample) >= 4:
+        even_zeros = sample[0::2].count(0)
+        odd_zeros = sample[1::2].count(0)
+        half = len(sample) // 2
+        if odd_zeros > half * 0.3 and even_zeros < half * 0.05:
+            return 'utf-16-le'
+        if even_zeros > half * 0.3 and odd_zeros < half * 0.05:
+            return 'utf-16-be'
+
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            # 开头的字节可能截断在多字节字符中间，未读完整个文件时不要求最后一个字符完整
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=complete)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return FALLBACK_ENCODINGS[-1]
+
+def _cached_encoding(path, signature):
+    with _cache_lock:
+        cached = _cache.get(os.path.abspath(path))
+    return cached[1] if cached and cached[0] == signature else None
+
+def _remember(path, signature, encoding):
+    with _cache_lock:
+        _cache[os.path.abspath(path)] = (signature, encoding)
+
+def detect_encoding(path):
+    """
+    检测文本文件编码（结果按路径、大小、修改时间缓存）
+
+    Returns:
+        可直接传给 open() 的编码名
+    """
+    signature = _file_signature(path)
+    encoding = _cached_encoding(path, signature)
+    if encoding:
+        return encoding
+
+    with open(path, 'rb') as f:
+        prefix = f.read(SNIFF_BYTES)
+    encoding = _sniff(prefix, complete=len(prefix) >= signature[0])
+    _remember(path, signature, encoding)
+    return encoding
+
+def decode_bytes(data, encoding):
+    """
+    按检测出的编码解码；失败时依次改用其他候选编码
+
+    Returns:
+        (文本, 实际使用的编码)
+
+    Raises:
+        UnicodeDecodeError: 所有候选编码都无法解码
+    """
+    candidates = [encoding] + [name for name in FALLBACK_ENCODINGS if name != encoding]
+    for index, name in enumerate(candidates):
+        try:
+            return data.decode(name), name
+        except UnicodeDecodeError:
+            if index == len(candidates) - 1:
+                raise
+
+def translate_newlines(text):
+    """把 \r\n 和单独的 \r 转换为 \n（与文本模式 open() 的通用换行一致）"""
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+def read_text(path, newline=None):
+    """
+    读取整个文本文件，自动检测编码
+
+    Args:
+        newline: None 时转换换行符为 \n；'' 时保留原样（需要按原文计算偏移时使用）
+
+    Raises:
+        OSError: 文件无法读取
+        UnicodeDecodeError: 所有候选编码都无法解码
+    """
+    return read_text_with_encoding(path, newline)[0]
+
+def read_text_with_encoding(path, newline=None):
+    """读取整个文本文件，返回 (文本, 实际使用的编码)，参数和异常同 read_text"""
+    signature = _file_signature(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    # 未缓存时直接用已读入的字节探测，不再单独读一次开头
+    encoding = _cached_encoding(path, signature) or _sniff(data[:SNIFF_BYTES], complete=len(data) <= SNIFF_BYTES)
+    text, actual = decode_bytes(data, encoding)
+    _remember(path, signature, actual)
+    if newline is None:
+        text = translate_newlines(text)
+    return text, actual
+
+def open_text(path):
+    """按检测出的编码打开文本文件用于流式读取（探测范围之后出现非法字节时读取会抛出 UnicodeDecodeError）"""
+    return open(path, 'r', encoding=detect_encoding(path))
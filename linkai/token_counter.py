@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token计数工具
+优先使用tiktoken（cl100k_base）精确计数；未安装tiktoken时按字符类型粗略估算
+
+使用方法：
+    from token_counter import count_tokens, count_message_tokens, split_text_into_chunks
+    count_tokens("一段文本")
+    count_message_tokens([{"role": "user", "content": "..."}])
+    split_text_into_chunks(long_text, max_tokens=6000)  # 按段落切分长文本
+"""
+
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+ENCODING_NAME = "cl100k_base"
+MESSAGE_OVERHEAD_TOKENS = 4  # 每条消息的角色/分隔符开销
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+_SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?；;.])')
+_encoding = None
+_encoding_failed = False
+
+def get_tokenizer():
+    """获取tiktoken编码器，不可用时返回None"""
+    global _encoding, _encoding_failed
+
+    if _encoding is None and not _encoding_failed and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            print(f"⚠️  获取 tokenizer 失败，改用估算: {e}")
+            _encoding_failed = True
+    return _encoding
+
+def count_tokens(text):
+    """统计文本的token数"""
+    if not text:
+        return 0
+
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+
+    # 估算：中日韩字符约1个token，其余字符约4个字符1个token
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+def count_message_tokens(messages):
+    """统计对话消息列表的token数"""
+    return sum(count_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+               for message in messages)
+
+def _split_oversized(paragraph, max_tokens):
+    """把超过max_tokens的单个段落按句子切开，单句仍然超长时按字符硬切"""
+    pieces = []
+    for sentence in _SENTENCE_END_PATTERN.split(paragraph):
+        if not sentence:
+            continue
+        sentence_tokens = count_tokens(sentence)
+        if sentence_tokens <= max_tokens:
+            pieces.append((sentence, sentence_tokens))
+            continue
+        # 按token密度估算每段可容纳的字符数
+        step = max(1, len(sentence) * max_tokens // sentence_tokens)
+        for start in range(0, len(sentence), step):
+            piece = sentence[start:start + step]
+            pieces.append((piece, count_tokens(piece)))
+    return pieces
+
+def split_text_into_chunks(text, max_tokens):
+    """
+    按段落边界把长文本切成若干片段，每个片段不超过max_tokens个token
+
+    段落以换行分隔（字幕、转写文本每行一句）；单个段落超长时再按句子切分。
+    文本本身不超过max_tokens时原样返回单个片段。
+
+    Returns:
+        片段列表（按原文顺序）
+    """
+    if not text or count_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append('\n'.join(current))
+            current = []
+            current_tokens = 0
+
+    for paragraph in text.split('\n'):
+        if not paragraph.strip():
+            continue
+        paragraph_tokens = count_tokens(paragraph) + 1  # 换行符
+        if paragraph_tokens > max_tokens:
+            # 超长段落单独切分，同一段落内的句子直接拼接，不插入换行
+            flush()
+            piece_text = ''
+            for piece, piece_tokens in _split_oversized(paragraph, max_tokens):
+                if piece_text and current_tokens + piece_tokens > max_tokens:
+                    chunks.append(piece_text)
+                    piece_text = ''
+                    current_tokens = 0
+                piece_text += piece
+                current_tokens += piece_tokens
+            current = [piece_text]
+            continue
+        if current_tokens + paragraph_tokens > max_tokens:
+            flush()
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+    flush()
+
+    return chunks